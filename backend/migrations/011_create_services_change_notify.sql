@@ -0,0 +1,22 @@
+-- Migration: Publish service catalog changes over LISTEN/NOTIFY
+-- Description: Statement-level triggers on public.services that NOTIFY the Prometheus manager's change feed
+-- Date: 2026-10-16
+
+-- Notify listeners that the services table changed. Notifications with the same
+-- payload inside one transaction are collapsed by PostgreSQL, so bulk imports
+-- produce a single event per operation type.
+CREATE OR REPLACE FUNCTION notify_services_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify('services_changed', TG_OP);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS services_change_notify ON public.services;
+CREATE TRIGGER services_change_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.services
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_services_changed();
+
+-- Comments for documentation
+COMMENT ON FUNCTION notify_services_changed() IS 'Sends a services_changed notification consumed by the Prometheus manager change feed';
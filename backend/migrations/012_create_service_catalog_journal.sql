@@ -0,0 +1,132 @@
+-- Migration: Versioned service catalog with a change journal
+-- Description: Records every catalog-visible change to public.services with a monotonically increasing version
+-- Date: 2026-10-16
+
+-- Change journal: one row per upsert or tombstone, ordered by version
+CREATE TABLE IF NOT EXISTS public.service_catalog_changes (
+    version BIGSERIAL PRIMARY KEY,
+    op TEXT NOT NULL,
+    service_id TEXT NOT NULL,
+    organization_id UUID,
+    row_data JSONB,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    -- Constraints
+    CONSTRAINT service_catalog_changes_op_check CHECK (op IN ('upsert', 'delete')),
+    CONSTRAINT service_catalog_changes_row_data_check CHECK (op = 'delete' OR row_data IS NOT NULL)
+);
+
+CREATE INDEX IF NOT EXISTS idx_service_catalog_changes_service_id
+    ON public.service_catalog_changes(service_id, version DESC);
+CREATE INDEX IF NOT EXISTS idx_service_catalog_changes_changed_at
+    ON public.service_catalog_changes(changed_at);
+
+-- Single-row bookkeeping: clients whose version is older than pruned_through
+-- may have missed pruned tombstones and must resync the full catalog
+CREATE TABLE IF NOT EXISTS public.service_catalog_meta (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE,
+    pruned_through BIGINT NOT NULL DEFAULT 0,
+
+    CONSTRAINT service_catalog_meta_single_row CHECK (id)
+);
+
+INSERT INTO public.service_catalog_meta (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- Journal writer. Writers are serialized with a transaction-scoped advisory
+-- lock so versions become visible in commit order and a reader can never
+-- skip a lower version that commits later.
+CREATE OR REPLACE FUNCTION record_service_catalog_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'UPDATE'
+     AND (to_jsonb(NEW) - 'updated_at' - 'created_at') = (to_jsonb(OLD) - 'updated_at' - 'created_at') THEN
+    -- Only timestamps changed; nothing a catalog consumer can see
+    RETURN NULL;
+  END IF;
+
+  PERFORM pg_advisory_xact_lock(hashtext('service_catalog_changes'));
+
+  IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND NEW.service_id IS DISTINCT FROM OLD.service_id) THEN
+    INSERT INTO public.service_catalog_changes (op, service_id, organization_id)
+    VALUES ('delete', OLD.service_id, OLD.organization_id);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO public.service_catalog_changes (op, service_id, organization_id, row_data)
+    VALUES ('upsert', NEW.service_id, NEW.organization_id, to_jsonb(NEW));
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TRUNCATE has no per-row trigger, so record tombstones before the rows disappear
+CREATE OR REPLACE FUNCTION record_service_catalog_truncate()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('service_catalog_changes'));
+
+  INSERT INTO public.service_catalog_changes (op, service_id, organization_id)
+  SELECT 'delete', service_id, organization_id FROM public.services;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS services_catalog_journal ON public.services;
+CREATE TRIGGER services_catalog_journal
+    AFTER INSERT OR UPDATE OR DELETE ON public.services
+    FOR EACH ROW EXECUTE FUNCTION record_service_catalog_change();
+
+DROP TRIGGER IF EXISTS services_catalog_journal_truncate ON public.services;
+CREATE TRIGGER services_catalog_journal_truncate
+    BEFORE TRUNCATE ON public.services
+    FOR EACH STATEMENT EXECUTE FUNCTION record_service_catalog_truncate();
+
+-- Seed the journal with the current catalog so version 0 means "everything"
+INSERT INTO public.service_catalog_changes (op, service_id, organization_id, row_data)
+SELECT 'upsert', s.service_id, s.organization_id, to_jsonb(s)
+FROM public.services s
+WHERE NOT EXISTS (SELECT 1 FROM public.service_catalog_changes)
+ORDER BY s.organization_id, s.service_id;
+
+-- Remove journal entries older than the retention window that are no longer
+-- needed: upserts superseded by a newer entry, and tombstones. Returns the
+-- number of rows deleted.
+CREATE OR REPLACE FUNCTION prune_service_catalog_changes(retention INTERVAL DEFAULT INTERVAL '7 days')
+RETURNS BIGINT AS $$
+DECLARE
+  max_pruned_tombstone BIGINT;
+  deleted_count BIGINT;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('service_catalog_changes'));
+
+  WITH deleted AS (
+    DELETE FROM public.service_catalog_changes c
+    WHERE c.changed_at < NOW() - retention
+      AND (
+        c.op = 'delete'
+        OR EXISTS (
+          SELECT 1 FROM public.service_catalog_changes newer
+          WHERE newer.service_id = c.service_id AND newer.version > c.version
+        )
+      )
+    RETURNING c.version, c.op
+  )
+  SELECT COUNT(*), MAX(version) FILTER (WHERE op = 'delete')
+  INTO deleted_count, max_pruned_tombstone
+  FROM deleted;
+
+  IF max_pruned_tombstone IS NOT NULL THEN
+    UPDATE public.service_catalog_meta
+    SET pruned_through = GREATEST(pruned_through, max_pruned_tombstone);
+  END IF;
+
+  RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Comments for documentation
+COMMENT ON TABLE public.service_catalog_changes IS 'Append-only journal of service catalog upserts and tombstones; version is the catalog version';
+COMMENT ON TABLE public.service_catalog_meta IS 'Catalog journal bookkeeping; versions at or below pruned_through require a full resync';
+COMMENT ON FUNCTION prune_service_catalog_changes(INTERVAL) IS 'Drops superseded upserts and old tombstones from the catalog journal';
@@ -0,0 +1,36 @@
+-- Migration: Per-service scrape policy
+-- Description: Adds entity_type (if missing) and nullable scrape policy overrides to public.services for the Prometheus manager
+-- Date: 2026-10-16
+
+-- entity_type comes from 009; create it here for databases where public.services predates it
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'entity_type') THEN
+    CREATE TYPE entity_type AS ENUM ('service', 'database', 'api', 'custom');
+  END IF;
+END $$;
+
+-- NULL overrides inherit the value of the service's entity_type tier
+ALTER TABLE public.services
+ADD COLUMN IF NOT EXISTS entity_type entity_type NOT NULL DEFAULT 'service',
+ADD COLUMN IF NOT EXISTS scrape_interval TEXT,
+ADD COLUMN IF NOT EXISTS scrape_timeout TEXT,
+ADD COLUMN IF NOT EXISTS sample_limit INTEGER,
+ADD COLUMN IF NOT EXISTS label_limit INTEGER;
+
+-- Prometheus durations such as 15s, 1m or 1m30s; an invalid value would break the whole config
+ALTER TABLE public.services DROP CONSTRAINT IF EXISTS services_scrape_interval_check;
+ALTER TABLE public.services ADD CONSTRAINT services_scrape_interval_check
+    CHECK (scrape_interval IS NULL OR scrape_interval ~ '^([0-9]+(ms|s|m|h|d|w|y))+$');
+ALTER TABLE public.services DROP CONSTRAINT IF EXISTS services_scrape_timeout_check;
+ALTER TABLE public.services ADD CONSTRAINT services_scrape_timeout_check
+    CHECK (scrape_timeout IS NULL OR scrape_timeout ~ '^([0-9]+(ms|s|m|h|d|w|y))+$');
+ALTER TABLE public.services DROP CONSTRAINT IF EXISTS services_scrape_limits_check;
+ALTER TABLE public.services ADD CONSTRAINT services_scrape_limits_check
+    CHECK ((sample_limit IS NULL OR sample_limit >= 0) AND (label_limit IS NULL OR label_limit >= 0));
+
+-- Comments for documentation
+COMMENT ON COLUMN public.services.scrape_interval IS 'Scrape interval override (Prometheus duration); NULL uses the entity_type tier';
+COMMENT ON COLUMN public.services.scrape_timeout IS 'Scrape timeout override (Prometheus duration, capped at the interval); NULL uses the entity_type tier';
+COMMENT ON COLUMN public.services.sample_limit IS 'Samples per scrape above which the scrape fails (0 = unlimited); NULL uses the entity_type tier';
+COMMENT ON COLUMN public.services.label_limit IS 'Labels per series above which the scrape fails (0 = unlimited); NULL uses the entity_type tier';
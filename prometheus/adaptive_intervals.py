@@ -0,0 +1,222 @@
+"""
+Adaptive scrape intervals: stretch slow or heavy targets, tighten flapping ones, with hysteresis
+"""
+
+import threading
+import time
+from collections import deque
+
+
+def format_interval(seconds):
+    """Prometheus duration for a whole number of seconds"""
+    return f'{int(seconds)}s'
+
+
+class AdaptiveIntervalController:
+    """
+    Periodically re-evaluates per-target scrape intervals from observed scrape cost.
+
+    collect() returns {target: {'duration': s, 'samples': n, 'flaps': n}} (or
+    None when Prometheus can't be queried) and targets() returns
+    {target: base interval seconds} for the current catalog. A target whose
+    scrapes are slow or heavy moves to twice its interval, one that flaps to
+    half of it, and a cheap, stable target steps back towards its base
+    interval, always within [min_interval, max_interval].
+
+    Hysteresis keeps jobs from thrashing: the same verdict must come out of
+    `confirmations` consecutive evaluations, a target keeps a new interval for
+    at least hold_seconds, and "cheap" means below half of the slow/heavy
+    thresholds. on_change(decisions) runs after every evaluation that changed
+    an interval.
+    """
+
+    def __init__(self, collect, targets, on_change=None, min_interval=15, max_interval=300,
+                 slow_seconds=5, heavy_samples=100000, flap_changes=4, confirmations=3,
+                 hold_seconds=900, evaluation_interval=60, history=200):
+        self.collect = collect
+        self.targets = targets
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.slow_seconds = slow_seconds
+        self.heavy_samples = heavy_samples
+        self.flap_changes = flap_changes
+        self.confirmations = confirmations
+        self.hold_seconds = hold_seconds
+        self.evaluation_interval = evaluation_interval
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._overrides = {}  # target -> interval seconds
+        # Copy of _overrides replaced (never mutated) after each evaluation, so config generation
+        # reads it without taking the lock
+        self._published = {}
+        self._state = {}  # target -> {'pending': verdict, 'count': n, 'changed_at': t}
+        self._decisions = deque(maxlen=history)
+        self.generation = 0  # Bumped whenever an override changes; part of the config cache key
+        self._stats = {
+            'evaluations': 0,
+            'skipped': 0,
+            'changes': 0,
+            'last_evaluated_at': None,
+            'last_error': None,
+        }
+
+    def start(self):
+        """Start the controller thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='adaptive-intervals')
+        self._thread.start()
+
+    def stop(self):
+        """Stop the controller thread (overrides are kept)"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.evaluation_interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"❌ Adaptive interval evaluation failed: {e}")
+                with self._lock:
+                    self._stats['last_error'] = str(e)
+
+    def _verdict(self, cost, interval, base):
+        """Direction the interval should move in: 'longer', 'shorter' or None"""
+        duration = cost.get('duration') or 0
+        samples = cost.get('samples') or 0
+        flaps = cost.get('flaps') or 0
+
+        if duration >= self.slow_seconds or samples >= self.heavy_samples:
+            return ('longer', 'expensive') if interval < self.max_interval else (None, None)
+        if flaps >= self.flap_changes:
+            return ('shorter', 'flapping') if interval > self.min_interval else (None, None)
+        cheap = duration < self.slow_seconds / 2 and samples < self.heavy_samples / 2
+        if cheap and flaps == 0 and interval != base:
+            return ('longer' if interval < base else 'shorter'), 'recovered'
+        return None, None
+
+    def evaluate(self, now=None):
+        """Run one evaluation; returns the decisions it made"""
+        now = time.time() if now is None else now
+        costs = self.collect()
+        if costs is None:
+            with self._lock:
+                self._stats['skipped'] += 1
+            return []
+        bases = self.targets()
+
+        decisions = []
+        with self._lock:
+            # Forget targets that left the catalog
+            for target in [t for t in self._state if t not in bases]:
+                del self._state[target]
+                self._overrides.pop(target, None)
+
+            for target, base in bases.items():
+                cost = costs.get(target)
+                if cost is None:
+                    continue
+                interval = self._overrides.get(target, base)
+                direction, reason = self._verdict(cost, interval, base)
+
+                state = self._state.setdefault(target, {'pending': None, 'count': 0, 'changed_at': None})
+                if direction is None or direction != state['pending']:
+                    state['pending'], state['count'] = direction, 0
+                if direction is None:
+                    continue
+                state['count'] += 1
+                if state['count'] < self.confirmations:
+                    continue
+                if state['changed_at'] is not None and now - state['changed_at'] < self.hold_seconds:
+                    continue
+
+                if direction == 'longer':
+                    new_interval = min(interval * 2, self.max_interval)
+                    if reason == 'recovered':
+                        new_interval = min(new_interval, base)
+                else:
+                    new_interval = max(interval // 2, self.min_interval)
+                    if reason == 'recovered':
+                        new_interval = max(new_interval, base)
+                if new_interval == interval:
+                    continue
+
+                if new_interval == base:
+                    self._overrides.pop(target, None)
+                else:
+                    self._overrides[target] = new_interval
+                state.update(pending=None, count=0, changed_at=now)
+                decision = {
+                    'target': target,
+                    'from': format_interval(interval),
+                    'to': format_interval(new_interval),
+                    'base': format_interval(base),
+                    'reason': reason,
+                    'duration_seconds': cost.get('duration'),
+                    'samples': cost.get('samples'),
+                    'flaps': cost.get('flaps'),
+                    'at': now,
+                }
+                self._decisions.append(decision)
+                decisions.append(decision)
+
+            self._published = dict(self._overrides)
+            self._stats['evaluations'] += 1
+            self._stats['last_evaluated_at'] = now
+            self._stats['last_error'] = None
+            if decisions:
+                self.generation += 1
+                self._stats['changes'] += len(decisions)
+
+        for decision in decisions:
+            print(f"⏱️  {decision['target']}: scrape interval {decision['from']} -> {decision['to']} ({decision['reason']})")
+        if decisions and self.on_change:
+            self.on_change(decisions)
+        return decisions
+
+    def interval_for(self, target):
+        """Overridden interval in seconds for a target, or None"""
+        return self._published.get(target)
+
+    def has_overrides(self):
+        return bool(self._published)
+
+    def overrides(self):
+        """{target: interval} for every target away from its base interval"""
+        with self._lock:
+            return {target: format_interval(seconds) for target, seconds in sorted(self._overrides.items())}
+
+    def decisions(self, target=None):
+        """Recent decisions, newest first"""
+        with self._lock:
+            decisions = list(self._decisions)
+        if target is not None:
+            decisions = [d for d in decisions if d['target'] == target]
+        return decisions[::-1]
+
+    def stats(self):
+        """Evaluation counters and the thresholds in force"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'generation': self.generation,
+                'overridden_targets': len(self._overrides),
+                'pending_targets': sum(1 for s in self._state.values() if s['pending']),
+            })
+        stats.update({
+            'evaluation_interval': self.evaluation_interval,
+            'min_interval': format_interval(self.min_interval),
+            'max_interval': format_interval(self.max_interval),
+            'slow_seconds': self.slow_seconds,
+            'heavy_samples': self.heavy_samples,
+            'flap_changes': self.flap_changes,
+            'confirmations': self.confirmations,
+            'hold_seconds': self.hold_seconds,
+        })
+        return stats
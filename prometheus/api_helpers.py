@@ -0,0 +1,130 @@
+"""
+Helpers for the manager's read endpoints: keyset cursors, field projection, streamed JSON and ETags
+"""
+
+import base64
+import hashlib
+import json
+
+from flask import Response, request
+
+JSON_CHUNK_SIZE = 500  # Records encoded per yielded chunk
+
+
+def encode_cursor(key):
+    """Opaque, URL-safe cursor for a keyset position"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('cursor is malformed')
+    if not isinstance(key, list) or not key or not all(isinstance(part, str) for part in key):
+        raise ValueError('cursor is malformed')
+    return tuple(key)
+
+
+def parse_fields(value, allowed):
+    """Validate a comma-separated fields= projection; None means all fields"""
+    if value is None:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if not fields or unknown:
+        raise ValueError(f"fields must be a comma-separated subset of: {', '.join(allowed)}")
+    return fields
+
+
+def parse_limit(value, maximum):
+    """Validate limit=; None means no limit was requested"""
+    if value is None:
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= maximum:
+        raise ValueError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+def index_after(records, key, key_func):
+    """Index of the first record whose key sorts after key (records are sorted by key_func)"""
+    lo, hi = 0, len(records)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if key_func(records[mid]) <= key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def project(record, fields):
+    """Record as a dict, limited to fields when a projection was requested"""
+    if fields is None:
+        return record._asdict()
+    return {field: getattr(record, field) for field in fields}
+
+
+def iter_json_items(records, fields):
+    """Comma-separated JSON encodings of records, yielded in chunks"""
+    encode = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+    for start in range(0, len(records), JSON_CHUNK_SIZE):
+        chunk = ','.join(encode(project(r, fields)) for r in records[start:start + JSON_CHUNK_SIZE])
+        yield (',' if start else '') + chunk
+
+
+def iter_json_array(records, fields=None):
+    """Stream records as a JSON array"""
+    yield '['
+    yield from iter_json_items(records, fields)
+    yield ']'
+
+
+def iter_json_page(records, fields, limit, next_cursor, key='services'):
+    """Stream one page as {"limit", "next_cursor", key: [...]}"""
+    yield json.dumps({'limit': limit, 'next_cursor': next_cursor})[:-1] + f', "{key}": ['
+    yield from iter_json_items(records, fields)
+    yield ']}'
+
+
+def paginate(records, key_func, limit, after=None):
+    """Keyset page of sorted records: (page, next cursor or None)"""
+    start = index_after(records, after, key_func) if after is not None else 0
+    page = records[start:start + limit]
+    has_more = start + limit < len(records)
+    next_cursor = encode_cursor(key_func(page[-1])) if page and has_more else None
+    return page, next_cursor
+
+
+def make_etag(*parts):
+    """Strong ETag value (unquoted) derived from the given parts"""
+    raw = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_response(etag, build, cache_control=None):
+    """
+    Answer 304 if the client already has etag, otherwise build() the response.
+
+    build is only called on a miss, so a matching If-None-Match costs neither
+    database work nor serialization. Error tuples from build are passed through
+    without validators.
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if not isinstance(response, Response):
+            return response
+    if etag is not None:
+        response.set_etag(etag)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
@@ -4,18 +4,44 @@ Simple Flask app that configures Prometheus server based on services in PostgreS
 """
 
 import os
-import yaml
-import psycopg2
 import subprocess
 import signal
-import psutil
 import time
 import threading
-import hashlib
-from urllib.parse import urlparse
-from flask import Flask, jsonify, render_template_string
+import itertools
+import json
+import uuid
+from flask import Flask, Response, jsonify, render_template_string, request
 from dotenv import load_dotenv
 
+from db_pool import ConnectionPool, PoolError
+from db_router import ReplicaRouter
+from change_feed import ChangeFeedListener
+from catalog import (
+    SERVICE_COLUMNS, CatalogCache, apply_catalog_changes, catalog_order, detect_catalog_columns,
+    fetch_catalog_changes, fetch_full_catalog, fetch_services, format_hash, iter_catalog, services_hash_value, services_to_json, sorted_services
+)
+from config_stream import (
+    CONFIG_FORMATS, iter_org_jobs, render_grouped_job, render_target_groups, write_config_atomic
+)
+from config_fragments import FragmentCache
+from reload_scheduler import ReloadScheduler
+from prometheus_instances import build_instances, federation_job, shard_job
+from prometheus_api import PrometheusAPIError, instant_query, is_ready, metric_values, reload_config, vector_by_label
+from duration_histogram import DurationHistogram
+from target_dedup import DedupPlan, SharedService, owner_label
+from scrape_policy import PolicyResolver, job_suffix, load_tiers, parse_duration, policy_job_fields
+from adaptive_intervals import AdaptiveIntervalController, format_interval
+from metric_allowlist import allowlist_relabel_configs, load_allowlists
+from metric_url import param_labels, parse_metric_url
+from port_cleanup import free_port
+from log_pump import LEVELS as LOG_LEVELS
+from prometheus_supervisor import Supervisor
+from api_helpers import (
+    conditional_response, decode_cursor, iter_json_array, iter_json_page, make_etag, paginate,
+    parse_fields, parse_limit
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -23,83 +49,308 @@ app = Flask(__name__)
 
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL')
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')  # Optional read replica for read-only queries
 PROMETHEUS_CONFIG_PATH = os.getenv('PROMETHEUS_CONFIG_PATH', './prometheus.yml')
 PROMETHEUS_BINARY_PATH = os.getenv('PROMETHEUS_BINARY_PATH', 'prometheus')
 PROMETHEUS_DATA_DIR = os.getenv('PROMETHEUS_DATA_DIR', './prometheus_data')
 FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
 FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 PROMETHEUS_PORT = int(os.getenv('PROMETHEUS_PORT', 9090))
+PROMETHEUS_SHARDS = max(1, int(os.getenv('PROMETHEUS_SHARDS', 1)))  # Shards listen on PROMETHEUS_PORT, +1, ...
+PROMETHEUS_FEDERATION_ENABLED = os.getenv('PROMETHEUS_FEDERATION_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROMETHEUS_FEDERATION_PORT = int(os.getenv('PROMETHEUS_FEDERATION_PORT', PROMETHEUS_PORT + PROMETHEUS_SHARDS))
+PROMETHEUS_FEDERATION_MATCH = os.getenv('PROMETHEUS_FEDERATION_MATCH', '{job=~".+"}')
 MONITOR_INTERVAL = int(os.getenv('MONITOR_INTERVAL', 30))  # Check every 30 seconds by default
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_MAX_AGE = int(os.getenv('DB_POOL_MAX_AGE', 1800))  # Recycle connections after 30 minutes
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 10))
+DB_POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', 30))  # Ping connections idle longer than this
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 10))  # Seconds of replica lag before reads fall back to the primary
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+CHANGE_FEED_CHANNEL = 'services_changed'  # Hard-coded in migration 011's trigger, so not configurable
+CHANGE_FEED_SAFETY_INTERVAL = int(os.getenv('CHANGE_FEED_SAFETY_INTERVAL', 300))  # Fallback poll while the feed is connected
+CATALOG_JOURNAL_ENABLED = os.getenv('CATALOG_JOURNAL_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+CATALOG_CACHE_MAX_AGE = float(os.getenv('CATALOG_CACHE_MAX_AGE', 60))  # Max staleness of catalog reads served from memory
+ORG_CACHE_TTL = float(os.getenv('ORG_CACHE_TTL', 300))
+CONFIG_STREAMING_ENABLED = os.getenv('CONFIG_STREAMING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+CONFIG_STREAM_BATCH_SIZE = int(os.getenv('CONFIG_STREAM_BATCH_SIZE', 2000))  # Rows per server-side cursor fetch
+PROMETHEUS_CONFIG_FORMAT = os.getenv('PROMETHEUS_CONFIG_FORMAT', 'yaml').lower()
+API_DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+API_CACHE_CONTROL = os.getenv('API_CACHE_CONTROL', 'no-cache')  # Sent with ETag'd read responses
+API_MAX_BATCH_IDS = int(os.getenv('API_MAX_BATCH_IDS', 500))  # IDs accepted by the bulk organization lookup
+PROMETHEUS_JOB_LAYOUT = os.getenv('PROMETHEUS_JOB_LAYOUT', 'per_org').lower()  # 'per_org' jobs or 'consolidated'
+SERVICE_DISCOVERY_MODE = os.getenv('SERVICE_DISCOVERY_MODE', 'static').lower()  # 'static' targets in prometheus.yml or 'http' SD
+HTTP_SD_URL = os.getenv('HTTP_SD_URL', f'http://localhost:{FLASK_PORT}/api/prometheus/sd')  # As reachable from Prometheus
+HTTP_SD_REFRESH_INTERVAL = os.getenv('HTTP_SD_REFRESH_INTERVAL', '30s')
+SCRAPE_INTERVAL = os.getenv('SCRAPE_INTERVAL', '30s')  # Every tier's default, like the per-organization jobs
+SCRAPE_TIMEOUT = os.getenv('SCRAPE_TIMEOUT', '10s')
+SCRAPE_POLICY_TIERS = os.getenv('SCRAPE_POLICY_TIERS', '')  # JSON overrides of the entity_type tiers
+SCRAPE_DEFAULT_TIER = os.getenv('SCRAPE_DEFAULT_TIER', 'service')  # Tier for unknown entity types
+METRIC_ALLOWLIST_ENABLED = os.getenv('METRIC_ALLOWLIST_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+METRIC_ALLOWLISTS = os.getenv('METRIC_ALLOWLISTS', '')  # JSON {entity_type tier: [metric name regex, ...]} overrides
+METRIC_FULL_FIDELITY_ORGS = [o.strip() for o in os.getenv('METRIC_FULL_FIDELITY_ORGS', '').split(',') if o.strip()]
+ADAPTIVE_INTERVALS_ENABLED = os.getenv('ADAPTIVE_INTERVALS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+ADAPTIVE_EVALUATION_INTERVAL = float(os.getenv('ADAPTIVE_EVALUATION_INTERVAL', 60))  # Seconds between scrape cost evaluations
+ADAPTIVE_MIN_INTERVAL = os.getenv('ADAPTIVE_MIN_INTERVAL', '15s')  # Shortest interval a flapping target is moved to
+ADAPTIVE_MAX_INTERVAL = os.getenv('ADAPTIVE_MAX_INTERVAL', '300s')  # Longest interval an expensive target is moved to
+ADAPTIVE_SLOW_SECONDS = float(os.getenv('ADAPTIVE_SLOW_SECONDS', 5))  # scrape_duration_seconds that counts as slow
+ADAPTIVE_HEAVY_SAMPLES = int(os.getenv('ADAPTIVE_HEAVY_SAMPLES', 100000))  # scrape_samples_scraped that counts as heavy
+ADAPTIVE_FLAP_CHANGES = int(os.getenv('ADAPTIVE_FLAP_CHANGES', 4))  # changes(up) within the window that count as flapping
+ADAPTIVE_FLAP_WINDOW = os.getenv('ADAPTIVE_FLAP_WINDOW', '15m')
+ADAPTIVE_CONFIRMATIONS = int(os.getenv('ADAPTIVE_CONFIRMATIONS', 3))  # Consecutive evaluations before an interval moves
+ADAPTIVE_HOLD_SECONDS = float(os.getenv('ADAPTIVE_HOLD_SECONDS', 900))  # Minimum time between moves of one target
+TARGET_DEDUP_ENABLED = os.getenv('TARGET_DEDUP_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # Scrape shared endpoints once
+TARGET_DEDUP_ORGS = {o.strip() for o in os.getenv('TARGET_DEDUP_ORGS', '').split(',') if o.strip()}  # Opted-in organizations ('*' = all)
+PROMETHEUS_READY_TIMEOUT = float(os.getenv('PROMETHEUS_READY_TIMEOUT', 60))  # Seconds start waits for /-/ready (WAL replay can take longer)
+PROMETHEUS_READY_MAX_BACKOFF = float(os.getenv('PROMETHEUS_READY_MAX_BACKOFF', 2))  # Longest pause between /-/ready polls
+PROMETHEUS_RELOAD_TIMEOUT = float(os.getenv('PROMETHEUS_RELOAD_TIMEOUT', 60))  # Seconds to wait for POST /-/reload to finish
+PROMETHEUS_LOG_BUFFER_LINES = int(os.getenv('PROMETHEUS_LOG_BUFFER_LINES', 1000))  # Output lines kept in memory per instance
+PROMETHEUS_LOG_DIR = os.getenv('PROMETHEUS_LOG_DIR', '')  # Also write each instance's output to <dir>/<name>.log ('' = memory only)
+PROMETHEUS_LOG_MAX_BYTES = int(os.getenv('PROMETHEUS_LOG_MAX_BYTES', 10 * 1024 * 1024))  # Rotate log files at this size
+PROMETHEUS_LOG_BACKUPS = int(os.getenv('PROMETHEUS_LOG_BACKUPS', 3))  # Rotated log files kept
+PROMETHEUS_SUPERVISOR_ENABLED = os.getenv('PROMETHEUS_SUPERVISOR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PROMETHEUS_RESTART_BACKOFF = float(os.getenv('PROMETHEUS_RESTART_BACKOFF', 1))  # First restart delay after a crash, doubled per crash
+PROMETHEUS_RESTART_MAX_BACKOFF = float(os.getenv('PROMETHEUS_RESTART_MAX_BACKOFF', 60))
+PROMETHEUS_CRASH_LOOP_LIMIT = int(os.getenv('PROMETHEUS_CRASH_LOOP_LIMIT', 5))  # Crashes within the window before giving up
+PROMETHEUS_CRASH_LOOP_WINDOW = float(os.getenv('PROMETHEUS_CRASH_LOOP_WINDOW', 300))
+PORT_CLEANUP_TIMEOUT = float(os.getenv('PORT_CLEANUP_TIMEOUT', 5))  # Seconds to wait after SIGTERM (and again after SIGKILL)
+RELOAD_DEBOUNCE_SECONDS = float(os.getenv('RELOAD_DEBOUNCE_SECONDS', 2))  # Quiet period that ends a burst of changes
+RELOAD_MIN_INTERVAL = float(os.getenv('RELOAD_MIN_INTERVAL', 10))  # At most one reload per this many seconds
+RELOAD_MAX_DELAY = float(os.getenv('RELOAD_MAX_DELAY', 30))  # Reload even if changes keep coming after this long
 
 # Global variables
-prometheus_process = None
 monitoring_thread = None
 monitoring_active = False
 last_services_hash = None
+service_change_event = threading.Event()
+change_feed = None
+catalog_notified_at = 0  # When the change feed last reported a change (or reconnected)
+catalog_version = None
+catalog_services_by_id = {}
+catalog_hash_value = 0
+config_cache = {}  # shard -> (catalog key, generated config)
+config_write_stats = {}  # instance name -> stats of its last config write
+sd_cache = {}  # tier (None = all) -> (catalog key, rendered HTTP SD response body)
+dedup_cache = {}  # opted_in -> (catalog key, DedupPlan)
+scrape_view_cache = (None, None, {})  # (config key, {(organization_id, policy): services}, per-organization splits)
+metric_allowlists = load_allowlists(METRIC_ALLOWLISTS)
+scrape_policies = PolicyResolver(
+    load_tiers(SCRAPE_POLICY_TIERS, SCRAPE_INTERVAL, SCRAPE_TIMEOUT),
+    SCRAPE_DEFAULT_TIER,
+    metric_allowlists=metric_allowlists if METRIC_ALLOWLIST_ENABLED else None
+)
+# metric_relabel_configs per allowlist tier, shared by every job of that tier
+metric_relabel_configs = {
+    tier: allowlist_relabel_configs(patterns, METRIC_FULL_FIDELITY_ORGS)
+    for tier, patterns in metric_allowlists.items()
+}
+reload_counters = {'reloaded': 0, 'failed': 0, 'skipped_unchanged': 0}
+reload_durations = DurationHistogram(
+    'prometheus_manager_reload_duration_seconds',
+    'Time from POST /-/reload until Prometheus confirmed the new configuration',
+    ('instance', 'result')
+)
+
+# Prometheus processes: one per shard, plus the federation aggregator when enabled
+prometheus_instances = build_instances(
+    PROMETHEUS_CONFIG_PATH,
+    PROMETHEUS_DATA_DIR,
+    PROMETHEUS_PORT,
+    shards=PROMETHEUS_SHARDS,
+    federation=PROMETHEUS_FEDERATION_ENABLED,
+    federation_port=PROMETHEUS_FEDERATION_PORT,
+    log_options={
+        'capacity': PROMETHEUS_LOG_BUFFER_LINES,
+        'max_bytes': PROMETHEUS_LOG_MAX_BYTES,
+        'backups': PROMETHEUS_LOG_BACKUPS
+    },
+    log_dir=PROMETHEUS_LOG_DIR
+)
+shard_instances = [instance for instance in prometheus_instances if instance.role == 'shard']
+
+# Shared connection pool used by every database path in the manager
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    max_age=DB_POOL_MAX_AGE,
+    acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+    validate_after=DB_POOL_VALIDATE_AFTER
+)
+
+# Optional replica pool; read-only paths go through db_router, everything else stays on the primary
+replica_pool = ConnectionPool(
+    DATABASE_REPLICA_URL,
+    name='replica',
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    max_age=DB_POOL_MAX_AGE,
+    acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+    validate_after=DB_POOL_VALIDATE_AFTER
+) if DATABASE_REPLICA_URL else None
+
+db_router = ReplicaRouter(
+    db_pool,
+    replica_pool,
+    max_lag=REPLICA_MAX_LAG,
+    lag_check_interval=REPLICA_LAG_CHECK_INTERVAL
+)
 
 def get_db_connection():
-    """Get database connection"""
+    """Check out a pooled primary database connection (use as a context manager)"""
+    return db_pool.connection()
+
+def get_read_connection(primary=False):
+    """Connection for read-only queries: the replica while it is within REPLICA_MAX_LAG, else the primary"""
+    return db_router.connection(primary=primary)
+
+def load_services(read_primary=False):
+    """Load all services from database, raising on failure"""
+    with get_read_connection(read_primary) as conn:
+        return fetch_services(conn, CONFIG_STREAM_BATCH_SIZE)
+
+def get_services_hash(services):
+    """Generate a hash of the services list to detect changes"""
+    # Hashed record by record, independent of order, so nothing is sorted or stringified as a whole
+    return format_hash(services_hash_value(services))
+
+def load_catalog(read_primary=False):
+    """Catalog cache loader: (services, hash, version) read straight from the database"""
+    version = None
+    if CATALOG_JOURNAL_ENABLED:
+        with get_read_connection(read_primary) as conn:
+            version, services = fetch_full_catalog(conn, CONFIG_STREAM_BATCH_SIZE)
+    else:
+        services = load_services(read_primary)
+    return services, get_services_hash(services), version
+
+def normalize_organization_id(organization_id):
+    """Canonical lowercase UUID string, or None if the ID is not a valid UUID"""
+    try:
+        return str(uuid.UUID(str(organization_id)))
+    except ValueError:
+        return None
+
+def load_organization_names(organization_ids):
+    """Organization cache loader: {id: name} for the IDs that exist"""
+    valid_ids = [org_id for org_id in organization_ids if normalize_organization_id(org_id)]
+    if not valid_ids:
+        return {}
+
+    query = """
+    SELECT id, name
+    FROM organizations
+    WHERE id = ANY(%s::uuid[])
+    """
+    with get_read_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (valid_ids,))
+            return {str(row[0]): row[1] for row in cursor.fetchall()}
+
+# In-process catalog snapshot shared by the monitor loop and every read route
+catalog_cache = CatalogCache(
+    load_catalog,
+    max_age=CATALOG_CACHE_MAX_AGE,
+    org_loader=load_organization_names,
+    org_ttl=ORG_CACHE_TTL
+)
+
+def get_catalog_snapshot():
+    """Current catalog snapshot (bounded staleness), or None if it cannot be loaded"""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
+        return catalog_cache.get()
     except Exception as e:
-        print(f"Database connection error: {e}")
+        print(f"Error loading service catalog: {e}")
         return None
 
-def fetch_services():
-    """Fetch all services from database"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
+def sync_catalog(read_primary=False):
+    """Bring the in-memory catalog up to date from the change journal, returning True if it changed"""
+    with get_read_connection(read_primary) as conn:
+        changed = sync_catalog_from(conn, allow_behind=not read_primary)
+    if changed is None:
+        # The replica hasn't replayed the journal up to the version we already applied
+        print(f"ℹ️  Read replica is behind catalog version {catalog_version}, syncing from the primary")
+        with get_db_connection() as conn:
+            changed = sync_catalog_from(conn)
+    return changed
+
+def sync_catalog_from(conn, allow_behind=False):
+    """Apply journal changes read through conn; None if conn is behind the applied version and allow_behind"""
+    global catalog_version, catalog_services_by_id, catalog_hash_value
+
+    if catalog_version is not None:
+        changes = fetch_catalog_changes(conn, catalog_version)
+        if allow_behind and changes['version'] < catalog_version:
+            return None
+        if not changes['full_resync']:
+            changed, catalog_hash_value = apply_catalog_changes(
+                catalog_services_by_id, changes, catalog_hash_value)
+            catalog_version = changes['version']
+            return changed
+        print(f"⚠️  Catalog version {catalog_version} is older than the pruned journal, reloading full catalog")
+
+    version, services = fetch_full_catalog(conn, CONFIG_STREAM_BATCH_SIZE)
+
+    catalog_services_by_id = {s.service_id: s for s in services}
+    catalog_hash_value = services_hash_value(services)
+    catalog_version = version
+    return True
+
+def check_for_catalog_journal_changes(read_primary=False):
+    """Journal mode: detect changes by catalog version instead of re-reading every row"""
+    global last_services_hash
+
+    first_check = catalog_version is None
+    previous_version = catalog_version
+    fetched_at = time.time()
     try:
-        cursor = conn.cursor()
-        query = """
-        SELECT service_id, metric_url, organization_id, name
-        FROM public.services
-        ORDER BY organization_id, service_id
-        """
-        cursor.execute(query)
-        services = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        # Convert to list of dictionaries
-        service_list = []
-        for service in services:
-            service_list.append({
-                'service_id': service[0],
-                'metric_url': service[1],
-                'organization_id': service[2],
-                'name': service[3]
-            })
-        
-        return service_list
+        changed = sync_catalog(read_primary)
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return False, None
     except Exception as e:
-        print(f"Error fetching services: {e}")
-        if conn:
-            conn.close()
-        return []
+        print(f"Error syncing service catalog: {e}")
+        return False, None
 
-def get_services_hash(services):
-    """Generate a hash of the services list to detect changes"""
-    if not services:
-        return None
+    if not changed:
+        catalog_cache.touch(fetched_at)
+        return False, None
 
-    # Create a consistent string representation of services
-    services_str = str(sorted([
-        (s['service_id'], s['metric_url'], s['organization_id'], s['name'])
-        for s in services
-    ]))
+    current_services = sorted_services(catalog_services_by_id)
+    last_services_hash = format_hash(catalog_hash_value)
+    catalog_cache.publish(current_services, last_services_hash, catalog_version, fetched_at)
+    if first_check:
+        return False, current_services
+
+    print(f"🔄 Service changes detected! Catalog version {previous_version} -> {catalog_version}")
+    return True, current_services
 
-    return hashlib.md5(services_str.encode()).hexdigest()
+def check_for_service_changes(read_primary=False):
+    """
+    Check if services have changed since last check.
 
-def check_for_service_changes():
-    """Check if services have changed since last check"""
+    Polls read from the replica when one is configured; read_primary is for
+    checks prompted by a write (change feed notifications, startup).
+    """
     global last_services_hash
 
-    current_services = fetch_services()
+    if CATALOG_JOURNAL_ENABLED:
+        return check_for_catalog_journal_changes(read_primary)
+
+    fetched_at = time.time()
+    try:
+        current_services = load_services(read_primary)
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return False, None
+    except Exception as e:
+        print(f"Error fetching services: {e}")
+        return False, None
     current_hash = get_services_hash(current_services)
+    catalog_cache.publish(current_services, current_hash, None, fetched_at)
 
     if last_services_hash is None:
         # First time checking
@@ -113,31 +364,56 @@ def check_for_service_changes():
 
     return False, current_services
 
+def on_catalog_notification(events):
+    """Change feed callback: wake the monitor loop immediately"""
+    global catalog_notified_at
+    catalog_notified_at = time.time()
+    service_change_event.set()
+
+def on_catalog_feed_idle():
+    """
+    Change feed heartbeat: a snapshot loaded after the last notification is
+    still current, so keep it fresh instead of letting read routes reload it
+    once it is CATALOG_CACHE_MAX_AGE old.
+    """
+    snapshot = catalog_cache.peek()
+    if snapshot is not None and snapshot.loaded_at > catalog_notified_at:
+        catalog_cache.touch()
+
+def current_poll_interval():
+    """Polling interval for the monitor loop (slow safety net while the change feed is connected)"""
+    if change_feed and change_feed.connected:
+        return CHANGE_FEED_SAFETY_INTERVAL
+    return MONITOR_INTERVAL
+
 def monitor_services():
     """Background thread function to monitor service changes"""
-    global monitoring_active, prometheus_process
-
-    print(f"🔍 Starting service monitoring (checking every {MONITOR_INTERVAL} seconds)...")
+    if CHANGE_FEED_ENABLED:
+        print(f"🔍 Starting service monitoring (change feed on '{CHANGE_FEED_CHANNEL}', "
+              f"safety poll every {CHANGE_FEED_SAFETY_INTERVAL} seconds)...")
+    else:
+        print(f"🔍 Starting service monitoring (checking every {MONITOR_INTERVAL} seconds)...")
 
+    notified = False
     while monitoring_active:
         try:
-            changes_detected, current_services = check_for_service_changes()
-
-            if changes_detected:
-                print(f"📊 Found {len(current_services)} services, reconfiguring Prometheus...")
-
-                # Only reload if Prometheus is running
-                if prometheus_process and prometheus_process.poll() is None:
-                    success = reload_prometheus()
-                    if success:
-                        print("✅ Prometheus configuration reloaded successfully")
-                    else:
-                        print("❌ Failed to reload Prometheus configuration")
-                else:
-                    print("ℹ️  Prometheus is not running, skipping reload")
-
-            # Wait for the specified interval
-            time.sleep(MONITOR_INTERVAL)
+            service_change_event.clear()
+            # A notification means a write just committed on the primary, which the replica may not have yet
+            changes_detected, current_services = check_for_service_changes(read_primary=notified)
+
+            if changes_detected and SERVICE_DISCOVERY_MODE == 'http':
+                # Prometheus picks the new targets up on its next SD refresh; nothing to write or reload
+                print(f"📊 Found {len(current_services)} services, serving them via HTTP service discovery")
+                snapshot = get_catalog_snapshot()
+                if snapshot is not None:
+                    warn_unapplied_sd_limits(snapshot)
+            elif changes_detected:
+                print(f"📊 Found {len(current_services)} services, scheduling a Prometheus reload...")
+                # Bursts of changes are coalesced into one reload
+                reload_scheduler.request('catalog change')
+
+            # Wait for the next notification or the polling interval
+            notified = service_change_event.wait(current_poll_interval())
 
         except Exception as e:
             print(f"❌ Error in service monitoring: {e}")
@@ -145,12 +421,22 @@ def monitor_services():
 
 def start_monitoring():
     """Start the background monitoring thread"""
-    global monitoring_thread, monitoring_active
+    global monitoring_thread, monitoring_active, change_feed
 
     if monitoring_thread and monitoring_thread.is_alive():
         print("⚠️  Monitoring is already running")
         return
 
+    if CHANGE_FEED_ENABLED:
+        if change_feed is None:
+            change_feed = ChangeFeedListener(DATABASE_URL, CHANGE_FEED_CHANNEL, on_catalog_notification,
+                                             on_idle=on_catalog_feed_idle)
+        change_feed.start()
+
+    reload_scheduler.start()
+    if ADAPTIVE_INTERVALS_ENABLED:
+        adaptive_controller.start()
+
     monitoring_active = True
     monitoring_thread = threading.Thread(target=monitor_services, daemon=True)
     monitoring_thread.start()
@@ -158,190 +444,537 @@ def start_monitoring():
 
 def stop_monitoring():
     """Stop the background monitoring thread"""
-    global monitoring_active, monitoring_thread
+    global monitoring_active
 
     if monitoring_active:
         monitoring_active = False
         print("🛑 Stopping background service monitoring...")
 
+        if change_feed:
+            change_feed.stop()
+
+        # Wake the monitor loop so it notices the stop request right away
+        service_change_event.set()
+
         if monitoring_thread and monitoring_thread.is_alive():
             monitoring_thread.join(timeout=5)  # Wait up to 5 seconds
 
+        reload_scheduler.stop()
+        adaptive_controller.stop()
+
         print("✅ Background service monitoring stopped")
 
 def extract_target_from_url(url):
-    """Extract host:port from URL for Prometheus target"""
-    try:
-        parsed = urlparse(url)
-        host = parsed.hostname
-        port = parsed.port
-        
-        if port:
-            return f"{host}:{port}"
-        else:
-            # Default ports based on scheme
-            if parsed.scheme == 'https':
-                return f"{host}:443"
-            elif parsed.scheme == 'http':
-                return f"{host}:80"
-            else:
-                return host
-    except Exception as e:
-        print(f"Error parsing URL {url}: {e}")
-        return url
-
-def generate_prometheus_config():
-    """Generate Prometheus configuration based on services in database"""
-    services = fetch_services()
+    """Extract host:port from URL for Prometheus target (scheme, path and params are part of the scrape policy)"""
+    return parse_metric_url(url, scrape_policies.metrics_path).address
+
+def scrapeable(service):
+    """Whether Prometheus can scrape a service's metric_url; the others are left out of the config"""
+    return parse_metric_url(service.metric_url, scrape_policies.metrics_path) is not None
+
+def generate_prometheus_config(snapshot=None, shard=0):
+    """Generate Prometheus configuration based on services in database (for one shard)"""
+    if SERVICE_DISCOVERY_MODE == 'http':
+        # Targets come from /api/prometheus/sd, so the config doesn't depend on the catalog
+        config = base_prometheus_config(shard_instances[shard])
+        for tier in sorted(scrape_policies.tiers):
+            config['scrape_configs'].append(shard_job(build_http_sd_job(tier), shard, PROMETHEUS_SHARDS))
+        return config
+
+    if snapshot is None:
+        snapshot = get_catalog_snapshot()
+    services = snapshot.services if snapshot else ()
     
     if not services:
         print("No services found in database")
         return None
     
-    # Base configuration
+    config = base_prometheus_config(shard_instances[shard])
+    
+    if PROMETHEUS_JOB_LAYOUT == 'consolidated':
+        # A few jobs keyed by scrape policy, with per-target organization/service labels
+        config['scrape_configs'].extend(build_consolidated_jobs(snapshot, shard))
+    else:
+        # Create scrape configs for each organization (unchanged organizations come from the fragment cache)
+        config['scrape_configs'].extend(org_fragments[shard].values(scrape_view(snapshot)))
+    
+    return config
+
+def base_prometheus_config(instance=None):
+    """Global settings plus the Prometheus self-monitoring job"""
+    instance = instance or shard_instances[0]
     config = {
         'global': {
             'scrape_interval': '15s',
             'evaluation_interval': '15s'
         },
-        'scrape_configs': []
+        'scrape_configs': [{
+            'job_name': 'prometheus',
+            'static_configs': [{'targets': [f'localhost:{instance.port}']}]
+        }]
     }
-    
-    # Add Prometheus self-monitoring
-    config['scrape_configs'].append({
-        'job_name': 'prometheus',
-        'static_configs': [{'targets': [f'localhost:{PROMETHEUS_PORT}']}]
-    })
-    
-    # Group services by organization
-    org_services = {}
-    for service in services:
-        org_id = service['organization_id']
-        if org_id not in org_services:
-            org_services[org_id] = []
-        org_services[org_id].append(service)
-    
-    # Create scrape configs for each organization
-    for org_id, org_service_list in org_services.items():
-        targets = []
-        for service in org_service_list:
-            target = extract_target_from_url(service['metric_url'])
+    if PROMETHEUS_SHARDS > 1 and instance.role == 'shard':
+        # Tells the shards' series apart once federated
+        config['global']['external_labels'] = {'shard': str(instance.shard)}
+    return config
+
+def federation_prometheus_config(instance):
+    """Aggregator config: federate every shard"""
+    config = base_prometheus_config(instance)
+    config['scrape_configs'].append(federation_job(shard_instances, PROMETHEUS_FEDERATION_MATCH))
+    return config
+
+def scrape_job_fields(policy):
+    """Scrape job keys for a policy, including the metric allowlist of its tier"""
+    fields = policy_job_fields(policy)
+    if policy.metric_allowlist:
+        fields['metric_relabel_configs'] = metric_relabel_configs[policy.metric_allowlist]
+    return fields
+
+def effective_policy(service):
+    """Scrape policy of a service, with the adaptive interval of its target applied"""
+    policy = scrape_policies.resolve(service)
+    if not adaptive_controller.has_overrides():
+        return policy
+    seconds = adaptive_controller.interval_for(extract_target_from_url(service.metric_url))
+    if seconds is None:
+        return policy
+    interval = format_interval(seconds)
+    timeout = policy.scrape_timeout if parse_duration(policy.scrape_timeout) <= seconds else interval
+    return policy._replace(scrape_interval=interval, scrape_timeout=timeout)
+
+def split_by_policy(org_service_list):
+    """An organization's services grouped by scrape policy, as [(policy, services)] in a stable order"""
+    by_policy = {}
+    for service in org_service_list:
+        by_policy.setdefault(effective_policy(service), []).append(service)
+    return sorted(by_policy.items())
+
+def build_org_job(job_key, org_service_list):
+    """Scrape job for one organization's services sharing a scrape policy; job_key is (organization_id, policy)"""
+    org_id, policy = job_key
+    labels = {'organization_id': str(org_id)}
+    job_name = f'org_{org_id}'
+    if policy != scrape_policies.tier_policies[SCRAPE_DEFAULT_TIER]:
+        # One job per policy; the job label keeps every series of the organization under org_<id>
+        job_name += '_' + job_suffix(policy)
+        labels['job'] = f'org_{org_id}'
+
+    targets = []
+    shared_groups = []
+    for service in org_service_list:
+        target = extract_target_from_url(service.metric_url)
+        if isinstance(service, SharedService):
+            # Scraped once on behalf of every service of the organization pointing at it
+            shared_groups.append({
+                'targets': [target],
+                'labels': {**labels, **shared_owner_labels(service)}
+            })
+        else:
             targets.append(target)
-        
-        # Create job for this organization
-        job_config = {
-            'job_name': f'org_{org_id}',
-            'scrape_interval': '30s',
-            'metrics_path': '/metrics',
-            'static_configs': [{
-                'targets': targets,
-                'labels': {
-                    'organization_id': str(org_id)
-                }
-            }]
-        }
-        
-        config['scrape_configs'].append(job_config)
     
+    static_configs = []
+    if targets:
+        static_configs.append({
+            'targets': targets,
+            'labels': labels
+        })
+    return {
+        'job_name': job_name,
+        **scrape_job_fields(policy),
+        'static_configs': static_configs + shared_groups
+    }
+
+def org_jobs_builder(build_job):
+    """Adapts a build_org_job-style builder to all of an organization's services (one job per policy)"""
+    return lambda org_id, org_service_list: [
+        build_job((org_id, policy), services) for policy, services in split_by_policy(org_service_list)
+    ]
+
+def shared_owner_labels(service):
+    """Ownership labels of a deduplicated target"""
+    return {'owner_services': owner_label(service.owner_services)}
+
+def service_endpoint(service):
+    """What Prometheus actually requests for a service: (scrape address, scrape policy), None if it can't be scraped"""
+    if not scrapeable(service):
+        return None
+    return (extract_target_from_url(service.metric_url), effective_policy(service))
+
+def dedup_participates(service):
+    """
+    Whether a service's target may be shared with its organization's other services: the
+    organization opted in through TARGET_DEDUP_ORGS (a shared target carries the keeper's service_id)
+    """
+    return '*' in TARGET_DEDUP_ORGS or str(service.organization_id) in TARGET_DEDUP_ORGS
+
+def get_dedup_plan(snapshot, opted_in=True):
+    """
+    Endpoint deduplication plan for a catalog snapshot, computed once per catalog change.
+
+    opted_in=False groups every service regardless of TARGET_DEDUP_ORGS,
+    for reporting what deduplication could save.
+    """
+    key = config_cache_key(snapshot)
+    cached_key, cached_plan = dedup_cache.get(opted_in, (None, None))
+    if key is not None and cached_plan is not None and cached_key == key:
+        return cached_plan
+
+    plan = DedupPlan(snapshot, service_endpoint, dedup_participates if opted_in else None)
+    dedup_cache[opted_in] = (key, plan)
+    return plan
+
+def scrape_view(snapshot):
+    """
+    Services to scrape keyed by (organization_id, scrape policy), deduplicated when
+    TARGET_DEDUP_ENABLED; computed once per catalog change.
+
+    The keys are what the fragment caches and job grouping work on, so a policy
+    change only rebuilds the organization it belongs to. Organizations whose
+    services are unchanged reuse their previous split, unless adaptive
+    intervals moved since.
+    """
+    global scrape_view_cache
+
+    key = config_cache_key(snapshot)
+    cached_key, cached_view, previous_splits = scrape_view_cache
+    if key is not None and cached_view is not None and cached_key == key:
+        return cached_view
+    if key is None or cached_key is None or cached_key[-1] != key[-1]:
+        previous_splits = {}
+
+    by_organization = get_dedup_plan(snapshot).by_organization if TARGET_DEDUP_ENABLED else snapshot.by_organization
+    view = {}
+    splits = {}
+    for org_id, org_service_list in by_organization.items():
+        services_key = tuple(service for service in org_service_list if scrapeable(service))
+        if not services_key:
+            continue
+        split = previous_splits.get(org_id)
+        if split is None or split[0] != services_key:
+            split = (services_key, split_by_policy(services_key))
+        splits[org_id] = split
+        for policy, services in split[1]:
+            view[(org_id, policy)] = services
+    scrape_view_cache = (key, view, splits)
+    return view
+
+def samples_per_target():
+    """Samples per scrape by target address, from every running shard (None if none answered)"""
+    samples = None
+    for instance in shard_instances:
+        if not instance.is_running():
+            continue
+        try:
+            result = instant_query(instance.port, 'max by (instance) (scrape_samples_scraped)')
+        except PrometheusAPIError as e:
+            print(f"⚠️  {e}")
+            continue
+        samples = samples or {}
+        samples.update(vector_by_label(result, 'instance'))
+    return samples
+
+def build_http_sd_job(tier):
+    """Scrape job for one policy tier whose targets Prometheus fetches from the manager's HTTP SD endpoint"""
+    separator = '&' if '?' in HTTP_SD_URL else '?'
+    return {
+        'job_name': f'services_{tier}',
+        **scrape_job_fields(scrape_policies.tier_policies[tier]),
+        'http_sd_configs': [{
+            'url': f'{HTTP_SD_URL}{separator}tier={tier}',
+            'refresh_interval': HTTP_SD_REFRESH_INTERVAL
+        }]
+    }
+
+def build_org_target_groups(job_key, org_service_list):
+    """Target groups for one organization's services sharing a policy: one per service, labelled like its per-organization job"""
+    org_id = str(job_key[0])
+    groups = []
+    for service in org_service_list:
+        labels = {
+            # Target labels take precedence over job_name, so series keep their org_<id> job
+            'job': f'org_{org_id}',
+            'organization_id': org_id,
+            'service_id': service.service_id
+        }
+        if isinstance(service, SharedService):
+            labels.update(shared_owner_labels(service))
+        groups.append({
+            'targets': [extract_target_from_url(service.metric_url)],
+            'labels': labels
+        })
+    return groups
+
+def build_target_groups(snapshot, tier=None):
+    """
+    HTTP SD target groups for the whole catalog, or for the services of one policy tier.
+
+    Jobs are per tier, so a service whose own interval or timeout differs from
+    its tier's carries them as __scrape_interval__ / __scrape_timeout__ labels,
+    and one whose metric_url has another scheme, path or query params as
+    __scheme__ / __metrics_path__ / __param_<name> labels (first value only).
+    Per-service sample and label limits are job-level and can't be applied here.
+    """
+    view = scrape_view(snapshot)
+    groups = []
+    for (org_id, policy), org_groups in zip(view, org_target_groups.values(view)):
+        for service, group in zip(view[(org_id, policy)], org_groups):
+            service_tier = scrape_policies.tier_of(service)
+            if tier is not None and service_tier != tier:
+                continue
+            overrides = target_policy_labels(policy, scrape_policies.tier_policies[service_tier])
+            if overrides:
+                group = {
+                    'targets': group['targets'],
+                    'labels': {**group['labels'], **overrides}
+                }
+            groups.append(group)
+    return groups
+
+def unapplied_sd_limits(snapshot):
+    """Services whose own sample_limit / label_limit differ from their tier's, which HTTP SD can't apply"""
+    services = []
+    for (_, policy), org_services in scrape_view(snapshot).items():
+        for service in org_services:
+            tier_policy = scrape_policies.tier_policies[scrape_policies.tier_of(service)]
+            if (policy.sample_limit, policy.label_limit) != (tier_policy.sample_limit, tier_policy.label_limit):
+                services.append(service)
+    return services
+
+def warn_unapplied_sd_limits(snapshot):
+    """Log the services whose limits are dropped under SERVICE_DISCOVERY_MODE=http"""
+    services = unapplied_sd_limits(snapshot)
+    if services:
+        examples = ', '.join(service.service_id for service in services[:5])
+        print(f"⚠️  {len(services)} service(s) set their own sample_limit/label_limit, which HTTP service "
+              f"discovery cannot apply ({examples}); use SERVICE_DISCOVERY_MODE=static to enforce them")
+    return services
+
+def target_policy_labels(policy, job_policy):
+    """Relabeling-time labels applying a target's own policy within a job of job_policy"""
+    labels = {}
+    if (policy.scrape_interval, policy.scrape_timeout) != (job_policy.scrape_interval, job_policy.scrape_timeout):
+        labels['__scrape_interval__'] = policy.scrape_interval
+        labels['__scrape_timeout__'] = policy.scrape_timeout
+    if policy.scheme != job_policy.scheme:
+        labels['__scheme__'] = policy.scheme
+    if policy.metrics_path != job_policy.metrics_path:
+        labels['__metrics_path__'] = policy.metrics_path
+    labels.update(param_labels(policy.params))
+    return labels
+
+def consolidated_job(policy, static_configs=None):
+    """Shared scrape job for every target with the given scrape policy"""
+    job = {
+        'job_name': 'services_' + job_suffix(policy),
+        **scrape_job_fields(policy)
+    }
+    if static_configs is not None:
+        job['static_configs'] = static_configs
+    return job
+
+def group_by_policy(view, per_key_values):
+    """Collect per-(organization, policy) values under their policy, in a stable job order"""
+    by_policy = {}
+    for (org_id, policy), values in zip(view, per_key_values):
+        by_policy.setdefault(policy, []).append(values)
+    return sorted(by_policy.items())
+
+def build_consolidated_jobs(snapshot, shard=0):
+    """Consolidated layout as job dicts"""
+    view = scrape_view(snapshot)
+    groups = org_target_groups.values(view)
+    return [
+        shard_job(consolidated_job(policy, list(itertools.chain.from_iterable(org_groups))),
+                  shard, PROMETHEUS_SHARDS)
+        for policy, org_groups in group_by_policy(view, groups)
+    ]
+
+def render_consolidated_jobs(snapshot, fmt, shard=0):
+    """Consolidated layout as rendered job text, spliced from cached per-organization target groups"""
+    view = scrape_view(snapshot)
+    fragments = org_target_groups.fragments(view, fmt)
+    return [
+        render_grouped_job(shard_job(consolidated_job(policy), shard, PROMETHEUS_SHARDS), org_fragments_text, fmt)
+        for policy, org_fragments_text in group_by_policy(view, fragments)
+    ]
+
+def get_sd_body(snapshot, tier=None):
+    """Serialized HTTP SD response for a catalog snapshot (and tier), rendered once per catalog change"""
+    key = config_cache_key(snapshot)
+    cached_key, cached_body = sd_cache.get(tier, (None, None))
+    if key is not None and cached_body is not None and cached_key == key:
+        return cached_body
+
+    body = json.dumps(build_target_groups(snapshot, tier), separators=(',', ':'))
+    sd_cache[tier] = (key, body)
+    return body
+
+def shard_org_job_builder(shard):
+    """build_org_job restricted to one shard's targets"""
+    if PROMETHEUS_SHARDS <= 1:
+        return build_org_job
+    return lambda job_key, org_service_list: shard_job(build_org_job(job_key, org_service_list), shard, PROMETHEUS_SHARDS)
+
+# Per-(organization, policy) jobs (one cache per shard) / target groups and their rendered text,
+# rebuilt only for organizations whose services changed
+org_fragments = [FragmentCache(shard_org_job_builder(shard)) for shard in range(PROMETHEUS_SHARDS)]
+org_target_groups = FragmentCache(build_org_target_groups, render=render_target_groups)
+
+def layout_fragments(shard=0):
+    """Fragment cache backing the configured job layout"""
+    return org_target_groups if PROMETHEUS_JOB_LAYOUT == 'consolidated' else org_fragments[shard]
+
+def config_cache_key(snapshot):
+    """
+    Everything the generated config depends on; used for memoization and the /api/config ETag.
+
+    None for a snapshot built without a catalog hash: its contents aren't
+    identified, so nothing may be memoized or validated for it.
+    """
+    if snapshot.hash is None:
+        return None
+    return (snapshot.hash, snapshot.version, adaptive_controller.generation)
+
+def get_prometheus_config(snapshot=None, shard=0):
+    """Prometheus configuration of one shard for a catalog snapshot, memoized until the catalog changes"""
+    if snapshot is None:
+        snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        return None
+
+    key = config_cache_key(snapshot)
+    cached_key, cached_config = config_cache.get(shard, (None, None))
+    if key is not None and cached_config is not None and cached_key == key:
+        return cached_config
+
+    config = generate_prometheus_config(snapshot, shard)
+    if config:
+        config_cache[shard] = (key, config)
     return config
 
-def write_prometheus_config():
-    """Generate and write Prometheus configuration file"""
-    try:
-        config = generate_prometheus_config()
-        if not config:
-            return False
-        
-        # Ensure data directory exists
-        os.makedirs(PROMETHEUS_DATA_DIR, exist_ok=True)
-        
-        # Write configuration file
-        with open(PROMETHEUS_CONFIG_PATH, 'w') as f:
-            yaml.dump(config, f, default_flow_style=False, indent=2)
-        
-        print(f"Prometheus configuration written to {PROMETHEUS_CONFIG_PATH}")
-        return True
-    except Exception as e:
-        print(f"Error writing Prometheus config: {e}")
-        return False
+def write_prometheus_config_streaming(instance, unchanged_digest=None):
+    """Stream services from a server-side cursor straight into the config file"""
+    counted = {'services': 0}
 
-def kill_processes_on_port(port):
-    """Kill any processes using the specified port"""
-    try:
-        # Find processes using the port
-        result = subprocess.run(['lsof', '-ti', f':{port}'],
-                              capture_output=True, text=True, timeout=10)
-
-        if result.returncode == 0 and result.stdout.strip():
-            pids = result.stdout.strip().split('\n')
-            print(f"🔍 Found {len(pids)} process(es) using port {port}")
-
-            for pid in pids:
-                if pid.strip():
-                    try:
-                        # Try graceful termination first
-                        subprocess.run(['kill', '-TERM', pid.strip()], timeout=5)
-                        print(f"📤 Sent SIGTERM to process {pid}")
-                        time.sleep(2)
-
-                        # Check if process is still running
-                        check_result = subprocess.run(['kill', '-0', pid.strip()],
-                                                    capture_output=True, timeout=5)
-                        if check_result.returncode == 0:
-                            # Process still running, force kill
-                            subprocess.run(['kill', '-KILL', pid.strip()], timeout=5)
-                            print(f"💀 Force killed process {pid}")
-                        else:
-                            print(f"✅ Process {pid} terminated gracefully")
-
-                    except subprocess.TimeoutExpired:
-                        print(f"⚠️  Timeout killing process {pid}")
-                    except subprocess.CalledProcessError:
-                        print(f"⚠️  Process {pid} may have already terminated")
-
-            # Wait a moment for ports to be released
-            time.sleep(3)
-            print(f"🧹 Port {port} cleanup completed")
-            return True
+    def count_services(services):
+        for service in services:
+            counted['services'] += 1
+            yield service
+
+    base = base_prometheus_config(instance)
+    # Runs right after a change was detected, so read from the primary to never write an older catalog
+    with get_db_connection() as conn:
+        services = filter(scrapeable, count_services(iter_catalog(conn, CONFIG_STREAM_BATCH_SIZE)))
+        jobs = itertools.chain(base['scrape_configs'], itertools.chain.from_iterable(
+            iter_org_jobs(services, org_jobs_builder(shard_org_job_builder(instance.shard)))))
+        stats = write_config_atomic(
+            instance.config_path, base, jobs, PROMETHEUS_CONFIG_FORMAT,
+            require_jobs=len(base['scrape_configs']) + 1,
+            unchanged_digest=unchanged_digest
+        )
+
+    if stats is None:
+        print("No services found in database")
+        return None
+    stats['services'] = counted['services']
+    return stats
+
+def write_instance_config(instance, snapshot, unchanged_digest=None):
+    """Write one instance's config file; returns its write stats or None"""
+    if instance.role == 'federation':
+        config = federation_prometheus_config(instance)
+        stats = write_config_atomic(
+            instance.config_path, config, config['scrape_configs'], PROMETHEUS_CONFIG_FORMAT,
+            unchanged_digest=unchanged_digest)
+        stats['mode'] = 'federation'
+    elif SERVICE_DISCOVERY_MODE == 'http':
+        config = generate_prometheus_config(shard=instance.shard)
+        stats = write_config_atomic(
+            instance.config_path, config, config['scrape_configs'], PROMETHEUS_CONFIG_FORMAT,
+            unchanged_digest=unchanged_digest)
+        stats['mode'] = 'http_sd'
+    elif CONFIG_STREAMING_ENABLED:
+        stats = write_prometheus_config_streaming(instance, unchanged_digest)
+        if not stats:
+            return None
+        stats['mode'] = 'streaming'
+    else:
+        # Assemble the file from pre-rendered per-organization fragments
+        started = time.perf_counter()
+        base = base_prometheus_config(instance)
+        if PROMETHEUS_JOB_LAYOUT == 'consolidated':
+            fragments = render_consolidated_jobs(snapshot, PROMETHEUS_CONFIG_FORMAT, instance.shard)
         else:
-            print(f"✅ Port {port} is already free")
-            return True
+            fragments = org_fragments[instance.shard].fragments(scrape_view(snapshot), PROMETHEUS_CONFIG_FORMAT)
+        stats = write_config_atomic(
+            instance.config_path, base, itertools.chain(base['scrape_configs'], fragments),
+            PROMETHEUS_CONFIG_FORMAT, unchanged_digest=unchanged_digest
+        )
+        stats['seconds'] = round(time.perf_counter() - started, 6)
+        stats['mode'] = 'buffered'
+        stats['layout'] = PROMETHEUS_JOB_LAYOUT
+        stats['fragments_rebuilt'] = layout_fragments(instance.shard).stats()['last_rebuilt']
+    return stats
 
-    except subprocess.TimeoutExpired:
-        print(f"⚠️  Timeout while checking port {port}")
-        return False
-    except FileNotFoundError:
-        # lsof not available, try alternative method
-        try:
-            result = subprocess.run(['netstat', '-tlnp'],
-                                  capture_output=True, text=True, timeout=10)
-            if f':{port} ' in result.stdout:
-                print(f"⚠️  Port {port} appears to be in use, but cannot kill processes (lsof not available)")
+def write_prometheus_config(skip_unchanged=False):
+    """
+    Generate and write the config file of every Prometheus instance.
+
+    With skip_unchanged, an instance whose rendered config matches the one it
+    has loaded keeps its file (its last_write['unchanged'] is True).
+    """
+    try:
+        snapshot = None
+        if SERVICE_DISCOVERY_MODE != 'http' and not CONFIG_STREAMING_ENABLED:
+            snapshot = get_catalog_snapshot()
+            if not snapshot or not snapshot.services:
+                print("No services found in database")
+                return False
+
+        for instance in prometheus_instances:
+            # Ensure data directory exists
+            os.makedirs(instance.data_dir, exist_ok=True)
+
+            unchanged_digest = instance.config_digest if skip_unchanged else None
+            stats = write_instance_config(instance, snapshot, unchanged_digest)
+            if not stats:
                 return False
+
+            stats['written_at'] = time.time()
+            instance.last_write = stats
+            config_write_stats[instance.name] = stats
+            if stats['unchanged']:
+                print(f"Prometheus configuration for {instance.name} unchanged "
+                      f"({stats['jobs']} jobs, rendered in {stats['seconds'] * 1000:.1f} ms)")
             else:
-                print(f"✅ Port {port} appears to be free")
-                return True
-        except:
-            print(f"⚠️  Cannot check port {port} status")
-            return False
+                print(f"Prometheus configuration written to {instance.config_path} "
+                      f"({stats['jobs']} jobs, {stats['bytes']} bytes in {stats['seconds'] * 1000:.1f} ms)")
+        return True
     except Exception as e:
-        print(f"❌ Error checking/killing processes on port {port}: {e}")
+        print(f"Error writing Prometheus config: {e}")
         return False
 
-def start_prometheus():
-    """Start Prometheus server"""
-    global prometheus_process
+def prometheus_running():
+    """True if any managed Prometheus process is running"""
+    return any(instance.is_running() for instance in prometheus_instances)
 
+def start_prometheus():
+    """Start Prometheus server (every shard, then the federation aggregator)"""
     try:
         # Check if already running
-        if prometheus_process and prometheus_process.poll() is None:
+        pending = [instance for instance in prometheus_instances if not instance.is_running()]
+        if not pending:
             print("Prometheus is already running")
             return True
 
-        # Kill any existing processes on the Prometheus port
-        print(f"🧹 Cleaning up port {PROMETHEUS_PORT}...")
-        if not kill_processes_on_port(PROMETHEUS_PORT):
-            print(f"⚠️  Warning: Could not fully clean port {PROMETHEUS_PORT}, attempting to start anyway...")
+        # Kill any existing processes on the Prometheus ports
+        supervisor.resume()
+        for instance in pending:
+            supervisor.reset(instance)
+            print(f"🧹 Cleaning up port {instance.port}...")
+            if not free_port(instance.port, PORT_CLEANUP_TIMEOUT):
+                print(f"⚠️  Warning: Could not fully clean port {instance.port}, attempting to start anyway...")
 
         # Generate configuration
         if not write_prometheus_config():
@@ -349,105 +982,329 @@ def start_prometheus():
             return False
 
         # Start Prometheus
-        cmd = [
-            PROMETHEUS_BINARY_PATH,
-            f'--config.file={PROMETHEUS_CONFIG_PATH}',
-            f'--storage.tsdb.path={PROMETHEUS_DATA_DIR}',
-            '--web.enable-lifecycle',
-            f'--web.listen-address=0.0.0.0:{PROMETHEUS_PORT}'
-        ]
-        
-        prometheus_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            preexec_fn=os.setsid
-        )
+        for instance in pending:
+            launch_instance(instance)
+            instance.config_digest = instance.last_write['digest']
         
-        # Wait a moment to check if process started
-        time.sleep(2)
+        # Wait until every process serves /-/ready (or exits, or the deadline passes)
+        wait_until_ready(pending, PROMETHEUS_READY_TIMEOUT)
         
-        if prometheus_process.poll() is None:
-            print(f"Prometheus started successfully with PID {prometheus_process.pid}")
-            return True
-        else:
-            stdout, stderr = prometheus_process.communicate()
-            print(f"Prometheus failed to start: {stderr.decode()}")
-            return False
+        started = True
+        for instance in pending:
+            if instance.state == 'failed':
+                print(f"Prometheus {instance.name} failed to start: {instance.failure_output()}")
+                started = False
+            elif instance.state != 'ready':
+                print(f"⏳ Prometheus {instance.name} (PID {instance.process.pid}) not ready after "
+                      f"{PROMETHEUS_READY_TIMEOUT:g}s ({instance.state}), still starting up")
+        return started
             
     except Exception as e:
         print(f"Error starting Prometheus: {e}")
         return False
 
-def stop_prometheus():
-    """Stop Prometheus server"""
-    global prometheus_process
+def launch_instance(instance, restart=False):
+    """Start one Prometheus process with its current config file, watched by the supervisor"""
+    cmd = [
+        PROMETHEUS_BINARY_PATH,
+        f'--config.file={instance.config_path}',
+        f'--storage.tsdb.path={instance.data_dir}',
+        '--web.enable-lifecycle',
+        f'--web.listen-address=0.0.0.0:{instance.port}'
+    ]
     
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=os.setsid
+    )
+    instance.launched(process, report_wal_progress, restart=restart)
+    if PROMETHEUS_SUPERVISOR_ENABLED:
+        supervisor.watch(instance, process)
+
+def restart_instance(instance):
+    """Supervisor callback: start a crashed instance again, on the last good config if its file was never loaded"""
+    restored = instance.restore_good_config()
+    if restored:
+        print(f"↩️  Restored the last good configuration of {instance.name}")
+    if not free_port(instance.port, PORT_CLEANUP_TIMEOUT):
+        print(f"⚠️  Warning: Could not fully clean port {instance.port}, attempting to restart anyway...")
+    launch_instance(instance, restart=True)
+    print(f"🔁 Prometheus {instance.name} restarted with PID {instance.process.pid}")
+    if wait_until_ready([instance], PROMETHEUS_READY_TIMEOUT):
+        print(f"⏳ Prometheus {instance.name} is still starting after {PROMETHEUS_READY_TIMEOUT}s")
+    elif restored and instance.is_running():
+        # Re-apply the current catalog now that it is up; a rejected config is reported, not crashed on.
+        # Runs here rather than through the scheduler, which isn't running while monitoring is off
+        if reload_scheduler.run_now('restored last good config', reload_prometheus):
+            print(f"✅ Current configuration re-applied to {instance.name}")
+        else:
+            print(f"❌ Current configuration was not accepted by {instance.name}; it keeps the last good one")
+
+def mark_ready(instance):
+    """Record readiness; the config a process came up with is known to be good"""
+    instance.mark_ready()
     try:
-        if prometheus_process and prometheus_process.poll() is None:
-            # Terminate gracefully
-            os.killpg(os.getpgid(prometheus_process.pid), signal.SIGTERM)
-            
-            # Wait for process to terminate
-            for _ in range(10):
-                if prometheus_process.poll() is not None:
-                    break
-                time.sleep(1)
-            
-            # Force kill if still running
-            if prometheus_process.poll() is None:
-                os.killpg(os.getpgid(prometheus_process.pid), signal.SIGKILL)
-            
-            print("Prometheus stopped")
-            prometheus_process = None
-            return True
+        instance.save_good_config()
+    except OSError as e:
+        print(f"⚠️  Could not save last good configuration of {instance.name}: {e}")
+
+def report_wal_progress(instance):
+    """Log WAL replay progress of a starting instance in roughly 10% steps"""
+    segment, max_segment = instance.wal_replay['segment'], instance.wal_replay['max_segment']
+    if segment == max_segment or segment % max(1, (max_segment + 1) // 10) == 0:
+        print(f"⏳ Prometheus {instance.name} replaying WAL: segment {segment}/{max_segment}")
+
+def wait_until_ready(instances, timeout):
+    """
+    Poll /-/ready of each instance with exponential backoff until all are ready,
+    have exited, or timeout seconds passed; returns the ones still starting.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    waiting = list(instances)
+    while True:
+        for instance in list(waiting):
+            if not instance.is_running():
+                waiting.remove(instance)
+            elif is_ready(instance.port, timeout=1):
+                mark_ready(instance)
+                waiting.remove(instance)
+                print(f"Prometheus {instance.name} ready on port {instance.port} with PID {instance.process.pid} "
+                      f"after {instance.time_to_ready():.2f}s")
+        remaining = deadline - time.monotonic()
+        if not waiting or remaining <= 0:
+            return waiting
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, PROMETHEUS_READY_MAX_BACKOFF)
+
+def refresh_readiness():
+    """Mark instances that finished starting after start_prometheus stopped waiting"""
+    for instance in prometheus_instances:
+        if instance.state in ('starting', 'replaying_wal') and is_ready(instance.port, timeout=0.5):
+            mark_ready(instance)
+            print(f"Prometheus {instance.name} ready after {instance.time_to_ready():.2f}s")
+
+def prometheus_state():
+    """Overall readiness for the dashboard: stopped, starting, replaying_wal, ready or failed"""
+    states = [instance.state for instance in prometheus_instances if instance.state != 'stopped']
+    if not states:
+        return 'stopped'
+    for state in ('failed', 'replaying_wal', 'starting'):
+        if state in states:
+            return state
+    return 'ready'
+
+def stop_instance(instance):
+    """Stop one Prometheus process; returns False if it wasn't running"""
+    process = instance.process
+    instance.stop_requested = True  # Not a crash: the supervisor leaves it down
+    if not instance.is_running():
+        instance.process = None
+        return False
+
+    # Terminate gracefully
+    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+    
+    # Wait for process to terminate
+    for _ in range(10):
+        if process.poll() is not None:
+            break
+        time.sleep(1)
+    
+    # Force kill if still running
+    if process.poll() is None:
+        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
+
+    instance.process = None
+    instance.config_digest = None
+    return True
+
+def stop_prometheus():
+    """Stop Prometheus server (the aggregator first, then every shard)"""
+    try:
+        stopped = [instance.name for instance in reversed(prometheus_instances) if stop_instance(instance)]
+        if stopped:
+            print(f"Prometheus stopped ({', '.join(stopped)})")
         else:
             print("Prometheus is not running")
-            return True
+        return True
             
     except Exception as e:
         print(f"Error stopping Prometheus: {e}")
         return False
 
 def reload_prometheus():
-    """Reload Prometheus configuration"""
-    global prometheus_process
-    
+    """Reload Prometheus configuration (skipped per instance when the rendered config is byte-identical)"""
     try:
-        if not prometheus_process or prometheus_process.poll() is not None:
+        if not prometheus_running():
             print("Prometheus is not running")
             return False
         
         # Generate new configuration
-        if not write_prometheus_config():
+        if not write_prometheus_config(skip_unchanged=True):
             print("Failed to generate new configuration")
             return False
-        
-        # Send reload signal
-        os.kill(prometheus_process.pid, signal.SIGHUP)
-        print("Prometheus configuration reloaded")
-        return True
+
+        success = True
+        for instance in prometheus_instances:
+            if not instance.is_running():
+                continue
+            if instance.last_write['unchanged']:
+                reload_counters['skipped_unchanged'] += 1
+                print(f"ℹ️  Rendered configuration for {instance.name} is unchanged, skipping reload")
+                continue
+            if instance.state != 'ready':
+                # Prometheus loads its config file once the TSDB is open, so a starting instance picks it up
+                instance.config_digest = instance.last_write['digest']
+                print(f"ℹ️  Prometheus {instance.name} is still starting, it will load the new configuration when ready")
+                continue
+
+            error = reload_instance(instance)
+            if error:
+                reload_counters['failed'] += 1
+                print(f"❌ Prometheus {instance.name} rejected the new configuration: {error}")
+                success = False
+                continue
+            # Only a confirmed reload counts as loaded, so a rejected config is retried on the next reload
+            instance.config_digest = instance.last_write['digest']
+            try:
+                instance.save_good_config()
+            except OSError as e:
+                print(f"⚠️  Could not save last good configuration of {instance.name}: {e}")
+            reload_counters['reloaded'] += 1
+            print(f"Prometheus {instance.name} configuration reloaded in {instance.last_reload['seconds']:.2f}s")
+        return success
         
     except Exception as e:
         print(f"Error reloading Prometheus: {e}")
         return False
 
+def reload_instance(instance):
+    """
+    Reload one instance through POST /-/reload and confirm it from its
+    prometheus_config_last_reload_* metrics; returns the error, or None.
+    """
+    requested_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        reload_config(instance.port, PROMETHEUS_RELOAD_TIMEOUT)
+        status = metric_values(instance.port, (
+            'prometheus_config_last_reload_successful',
+            'prometheus_config_last_reload_success_timestamp_seconds'
+        ))
+        if status.get('prometheus_config_last_reload_successful') != 1:
+            error = 'prometheus_config_last_reload_successful is not 1'
+        elif status.get('prometheus_config_last_reload_success_timestamp_seconds', 0) < requested_at - 1:
+            error = 'prometheus_config_last_reload_success_timestamp_seconds did not advance'
+    except PrometheusAPIError as e:
+        error = str(e)
+
+    seconds = time.perf_counter() - started
+    reload_durations.observe(seconds, instance.name, 'failure' if error else 'success')
+    instance.last_reload = {
+        'at': requested_at,
+        'seconds': round(seconds, 3),
+        'success': error is None,
+        'error': error
+    }
+    return error
+
+def run_scheduled_reload():
+    """Reload scheduler callback: one reload for a whole burst of catalog changes"""
+    if not prometheus_running():
+        print("ℹ️  Prometheus is not running, skipping reload")
+        return True
+
+    success = reload_prometheus()
+    if success:
+        print("✅ Prometheus configuration reloaded successfully")
+    else:
+        print("❌ Failed to reload Prometheus configuration")
+    return success
+
+reload_scheduler = ReloadScheduler(
+    run_scheduled_reload,
+    debounce=RELOAD_DEBOUNCE_SECONDS,
+    min_interval=RELOAD_MIN_INTERVAL,
+    max_delay=RELOAD_MAX_DELAY
+)
+
+# Restarts Prometheus processes that exit on their own
+supervisor = Supervisor(
+    restart_instance,
+    initial_backoff=PROMETHEUS_RESTART_BACKOFF,
+    max_backoff=PROMETHEUS_RESTART_MAX_BACKOFF,
+    crash_loop_limit=PROMETHEUS_CRASH_LOOP_LIMIT,
+    crash_loop_window=PROMETHEUS_CRASH_LOOP_WINDOW
+)
+
+def collect_scrape_costs():
+    """Latest scrape duration, samples and up-flaps per target from every running shard (None if none answered)"""
+    queries = {
+        'duration': 'max by (instance) (scrape_duration_seconds)',
+        'samples': 'max by (instance) (scrape_samples_scraped)',
+        'flaps': f'max by (instance) (changes(up[{ADAPTIVE_FLAP_WINDOW}]))',
+    }
+    costs = None
+    for instance in shard_instances:
+        if not instance.is_running():
+            continue
+        try:
+            results = {field: instant_query(instance.port, expr) for field, expr in queries.items()}
+        except PrometheusAPIError as e:
+            print(f"⚠️  {e}")
+            continue
+        costs = costs or {}
+        for field, result in results.items():
+            for target, value in vector_by_label(result, 'instance').items():
+                costs.setdefault(target, {})[field] = value
+    return costs
+
+def adaptive_base_intervals():
+    """
+    {target: base interval seconds} for the catalog, from the scrape policies without adaptive
+    overrides; a target scraped by several services gets the shortest of their intervals
+    """
+    snapshot = get_catalog_snapshot()
+    if not snapshot:
+        return {}
+    bases = {}
+    for service in filter(scrapeable, snapshot.services):
+        target = extract_target_from_url(service.metric_url)
+        interval = int(parse_duration(scrape_policies.resolve(service).scrape_interval))
+        bases[target] = min(interval, bases.get(target, interval))
+    return bases
+
+adaptive_controller = AdaptiveIntervalController(
+    collect_scrape_costs,
+    adaptive_base_intervals,
+    on_change=lambda decisions: reload_scheduler.request('adaptive intervals'),
+    min_interval=int(parse_duration(ADAPTIVE_MIN_INTERVAL)),
+    max_interval=int(parse_duration(ADAPTIVE_MAX_INTERVAL)),
+    slow_seconds=ADAPTIVE_SLOW_SECONDS,
+    heavy_samples=ADAPTIVE_HEAVY_SAMPLES,
+    flap_changes=ADAPTIVE_FLAP_CHANGES,
+    confirmations=ADAPTIVE_CONFIRMATIONS,
+    hold_seconds=ADAPTIVE_HOLD_SECONDS,
+    evaluation_interval=ADAPTIVE_EVALUATION_INTERVAL
+)
+
 # Flask routes
 @app.route('/')
 def index():
     """Main dashboard"""
-    services = fetch_services()
-    
-    # Group services by organization
-    org_services = {}
-    for service in services:
-        org_id = service['organization_id']
-        if org_id not in org_services:
-            org_services[org_id] = []
-        org_services[org_id].append(service)
+    snapshot = get_catalog_snapshot()
+    services = snapshot.services if snapshot else ()
+    org_services = snapshot.by_organization if snapshot else {}
     
     # Check Prometheus status
-    is_running = prometheus_process and prometheus_process.poll() is None
+    refresh_readiness()
+    is_running = prometheus_running()
+    state = prometheus_state()
+    wal_replay = [instance.wal_replay for instance in prometheus_instances if instance.state == 'replaying_wal']
     
     html_template = """
     <!DOCTYPE html>
@@ -462,6 +1319,7 @@ def index():
             .service { background: #f9f9f9; margin: 10px 0; padding: 10px; border-radius: 3px; }
             .status-running { color: green; font-weight: bold; }
             .status-stopped { color: red; font-weight: bold; }
+            .status-starting { color: #FF9800; font-weight: bold; }
             button { padding: 10px 15px; margin: 5px; border: none; border-radius: 3px; cursor: pointer; }
             .btn-start { background: #4CAF50; color: white; }
             .btn-stop { background: #f44336; color: white; }
@@ -472,16 +1330,18 @@ def index():
     <body>
         <div class="header">
             <h1>Prometheus Multi-Organization Manager</h1>
-            <p>Status: <span class="{{ 'status-running' if is_running else 'status-stopped' }}">
-                {{ 'Running' if is_running else 'Stopped' }}
+            <p>Status: <span id="prometheus-status" class="{{ 'status-running' if state == 'ready' else ('status-starting' if is_running else 'status-stopped') }}">
+                {% if state == 'ready' %}Running (ready){% elif state == 'replaying_wal' %}Starting (replaying WAL: segment {{ wal_replay[0].segment }}/{{ wal_replay[0].max_segment }}){% elif state == 'starting' %}Starting{% elif state == 'failed' %}Failed{% else %}Stopped{% endif %}
             </span></p>
             <button class="btn-start" onclick="controlPrometheus('start')">Start</button>
             <button class="btn-reload" onclick="controlPrometheus('reload')">Reload</button>
             <button class="btn-stop" onclick="controlPrometheus('stop')">Stop</button>
-            <button class="btn-kill" onclick="controlPrometheus('kill-port')" title="Kill processes using port {{ PROMETHEUS_PORT }}">Kill Port {{ PROMETHEUS_PORT }}</button>
-            <a href="http://localhost:{{ PROMETHEUS_PORT }}" target="_blank">
-                <button style="background: #FF9800; color: white;">Open Prometheus UI</button>
+            <button class="btn-kill" onclick="controlPrometheus('kill-port')" title="Kill processes using port{{ 's' if PROMETHEUS_PORTS|length > 1 }} {{ PROMETHEUS_PORTS|join(', ') }}">Kill Port{{ 's' if PROMETHEUS_PORTS|length > 1 }} {{ PROMETHEUS_PORTS|join(', ') }}</button>
+            {% for instance in ui_instances %}
+            <a href="http://localhost:{{ instance.port }}" target="_blank">
+                <button style="background: #FF9800; color: white;">Open Prometheus UI{% if ui_instances|length > 1 %} ({{ instance.name }}){% endif %}</button>
             </a>
+            {% endfor %}
         </div>
 
         <div class="monitoring-section">
@@ -555,8 +1415,27 @@ def index():
                     });
             }
 
+            function waitForPrometheus() {
+                fetch('/api/prometheus/status')
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.state === 'starting' || data.state === 'replaying_wal') {
+                            const replay = data.instances.map(i => i.wal_replay).find(w => w);
+                            document.getElementById('prometheus-status').textContent = replay
+                                ? `Starting (replaying WAL: segment ${replay.segment}/${replay.max_segment})`
+                                : 'Starting';
+                            setTimeout(waitForPrometheus, 2000);
+                        } else {
+                            location.reload();
+                        }
+                    });
+            }
+
             // Check monitoring status on page load
             document.addEventListener('DOMContentLoaded', checkMonitoringStatus);
+            {% if state in ('starting', 'replaying_wal') %}
+            document.addEventListener('DOMContentLoaded', () => setTimeout(waitForPrometheus, 2000));
+            {% endif %}
         </script>
     </body>
     </html>
@@ -565,94 +1444,231 @@ def index():
     return render_template_string(html_template,
                                 org_services=org_services,
                                 is_running=is_running,
+                                state=state,
+                                wal_replay=wal_replay,
                                 total_services=len(services),
-                                PROMETHEUS_PORT=PROMETHEUS_PORT)
+                                PROMETHEUS_PORTS=[instance.port for instance in prometheus_instances],
+                                ui_instances=dashboard_ui_instances())
+
+def dashboard_ui_instances():
+    """Instances the dashboard links to: the federation instance when it exists (it sees every series), else every shard"""
+    federation = [instance for instance in prometheus_instances if instance.role == 'federation']
+    return federation or shard_instances
+
+def service_list_response(records):
+    """
+    JSON response for a sorted list of services.
+
+    Without query parameters this is the full array, streamed. limit= and/or
+    cursor= return one keyset page as {"limit", "next_cursor", "services"};
+    fields= projects either form onto a subset of the service columns.
+    """
+    try:
+        fields = parse_fields(request.args.get('fields'), SERVICE_COLUMNS)
+        limit = parse_limit(request.args.get('limit'), API_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if limit is None and after is None:
+        return Response(iter_json_array(records, fields), mimetype='application/json')
+
+    limit = limit or min(API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    page, next_cursor = paginate(records, catalog_order, limit, after)
+    return Response(iter_json_page(page, fields, limit, next_cursor), mimetype='application/json')
 
 @app.route('/api/services')
 def api_services():
-    """Get all services"""
-    services = fetch_services()
-    return jsonify(services)
+    """Get all services (paginated with limit/cursor), or only the changes since a catalog version with ?since=<version>"""
+    since = request.args.get('since')
+
+    if since is None:
+        snapshot = get_catalog_snapshot()
+        if snapshot is None:
+            return jsonify({'error': 'Failed to load service catalog'}), 500
+
+        etag = make_etag('services', snapshot.hash, snapshot.version, request.query_string)
+        response = conditional_response(
+            etag, lambda: service_list_response(snapshot.services), API_CACHE_CONTROL)
+        # Error tuples (a 400 for bad parameters) carry no validators or version
+        if snapshot.version is not None and isinstance(response, Response):
+            response.headers['X-Catalog-Version'] = str(snapshot.version)
+        return response
+
+    if any(arg in request.args for arg in ('limit', 'cursor', 'fields')):
+        return jsonify({'error': 'since cannot be combined with limit, cursor or fields'}), 400
+
+    if not CATALOG_JOURNAL_ENABLED:
+        return jsonify({'error': 'Delta sync requires CATALOG_JOURNAL_ENABLED'}), 400
+    try:
+        since = int(since)
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'since must be a non-negative catalog version'}), 400
+
+    def read_changes(conn):
+        changes = fetch_catalog_changes(conn, since)
+        if changes['full_resync']:
+            version, services = fetch_full_catalog(conn, CONFIG_STREAM_BATCH_SIZE)
+            changes['version'] = version
+            changes['services'] = services_to_json(services)
+        changes['upserts'] = services_to_json(changes['upserts'])
+        return changes
+
+    try:
+        with get_read_connection() as conn:
+            changes = read_changes(conn)
+        if since > changes['version']:
+            # The client has seen a newer version than the replica; answer from the primary
+            with get_db_connection() as conn:
+                changes = read_changes(conn)
+        version = changes['version']
+        response = jsonify(changes)
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return jsonify({'error': 'Database connection failed'}), 500
+    except Exception as e:
+        print(f"Error fetching service catalog: {e}")
+        return jsonify({'error': 'Failed to fetch services'}), 500
+
+    response.headers['X-Catalog-Version'] = str(version)
+    return response
+
+def parse_bool(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+@app.route('/api/organizations', methods=['GET', 'POST'])
+def api_organizations():
+    """
+    Resolve many organizations at once: GET ?ids=a,b,c or POST {"ids": [...]}.
+
+    Names come from the organization cache, so only uncached IDs hit the
+    database, in a single ANY() query. With include_services the services are
+    attached from the catalog snapshot. Unresolvable IDs are reported in errors.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get('ids'), list):
+            return jsonify({'error': 'Request body must be a JSON object with an "ids" list'}), 400
+        requested = [str(org_id) for org_id in body['ids']]
+        include_services = parse_bool(body.get('include_services', False))
+    else:
+        ids = request.args.get('ids')
+        if not ids:
+            return jsonify({'error': 'ids query parameter is required'}), 400
+        requested = [org_id.strip() for org_id in ids.split(',') if org_id.strip()]
+        include_services = parse_bool(request.args.get('include_services', 'false'))
+
+    requested = list(dict.fromkeys(requested))
+    if len(requested) > API_MAX_BATCH_IDS:
+        return jsonify({'error': f'At most {API_MAX_BATCH_IDS} ids per request'}), 400
+
+    errors = {}
+    normalized = {}
+    for org_id in requested:
+        canonical = normalize_organization_id(org_id)
+        if canonical is None:
+            errors[org_id] = 'invalid_id'
+        else:
+            normalized[org_id] = canonical
+
+    try:
+        names = catalog_cache.organization_names(list(dict.fromkeys(normalized.values())))
+        snapshot = catalog_cache.get() if include_services else None
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return jsonify({'error': 'Database connection failed'}), 500
+    except Exception as e:
+        print(f"Error fetching organizations: {e}")
+        return jsonify({'error': 'Failed to fetch organizations'}), 500
+
+    organizations = []
+    for org_id, canonical in normalized.items():
+        if canonical not in names:
+            errors[org_id] = 'not_found'
+            continue
+        organization = {'id': canonical, 'name': names[canonical]}
+        if snapshot is not None:
+            organization['services'] = services_to_json(snapshot.by_organization.get(canonical, ()))
+        organizations.append(organization)
+
+    return jsonify({
+        'organizations': organizations,
+        'errors': errors
+    })
 
 @app.route('/api/organizations/<organization_id>')
 def api_organization(organization_id):
     """Get organization information by ID"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    org_id = normalize_organization_id(organization_id)
+    if org_id is None:
+        return jsonify({'error': 'Organization not found'}), 404
 
     try:
-        cursor = conn.cursor()
-        query = """
-        SELECT id, name
-        FROM organizations
-        WHERE id = %s
-        """
-        cursor.execute(query, (organization_id,))
-        org = cursor.fetchone()
-        cursor.close()
-        conn.close()
-
-        if org:
-            return jsonify({
-                'id': org[0],
-                'name': org[1]
-            })
+        name = catalog_cache.organization_name(org_id)
+
+        if name is not None:
+            return conditional_response(
+                make_etag('organization', org_id, name),
+                lambda: jsonify({
+                    'id': org_id,
+                    'name': name
+                }),
+                API_CACHE_CONTROL
+            )
         else:
             return jsonify({'error': 'Organization not found'}), 404
 
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return jsonify({'error': 'Database connection failed'}), 500
     except Exception as e:
         print(f"Error fetching organization: {e}")
-        if conn:
-            conn.close()
         return jsonify({'error': 'Failed to fetch organization'}), 500
 
 @app.route('/api/organizations/<organization_id>/services')
 def api_organization_services(organization_id):
     """Get services for a specific organization"""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    org_id = normalize_organization_id(organization_id)
+    if org_id is None:
+        return jsonify({'error': 'Organization not found'}), 404
 
     try:
-        cursor = conn.cursor()
-        query = """
-        SELECT service_id, metric_url, organization_id, name
-        FROM public.services
-        WHERE organization_id = %s
-        ORDER BY service_id
-        """
-        cursor.execute(query, (organization_id,))
-        services = cursor.fetchall()
-        cursor.close()
-        conn.close()
-
-        # Convert to list of dictionaries
-        service_list = []
-        for service in services:
-            service_list.append({
-                'service_id': service[0],
-                'metric_url': service[1],
-                'organization_id': service[2],
-                'name': service[3]
-            })
-
-        return jsonify(service_list)
+        snapshot = catalog_cache.get()
+        etag = make_etag('organization-services', org_id, snapshot.hash, snapshot.version, request.query_string)
+        return conditional_response(
+            etag,
+            lambda: service_list_response(snapshot.by_organization.get(org_id, [])),
+            API_CACHE_CONTROL
+        )
 
+    except PoolError as e:
+        print(f"Database connection error: {e}")
+        return jsonify({'error': 'Database connection failed'}), 500
     except Exception as e:
         print(f"Error fetching organization services: {e}")
-        if conn:
-            conn.close()
         return jsonify({'error': 'Failed to fetch services'}), 500
 
 @app.route('/api/prometheus/start', methods=['POST'])
 def api_start_prometheus():
-    """Start Prometheus"""
+    """Start Prometheus; 200 once every instance is ready, 202 if some are still starting at the deadline"""
     success = start_prometheus()
-    if success:
-        return jsonify({'message': 'Prometheus started successfully'})
-    else:
-        return jsonify({'error': 'Failed to start Prometheus'}), 500
+    instances = [instance.status() for instance in prometheus_instances]
+    if not success:
+        return jsonify({'error': 'Failed to start Prometheus', 'instances': instances}), 500
+    if all(instance['ready'] for instance in instances):
+        times = [instance['time_to_ready'] for instance in instances if instance['time_to_ready'] is not None]
+        return jsonify({
+            'message': 'Prometheus started successfully and is ready',
+            'time_to_ready': max(times) if times else None,
+            'instances': instances
+        })
+    return jsonify({
+        'message': 'Prometheus started but is not ready yet (still replaying its WAL?)',
+        'instances': instances
+    }), 202
 
 @app.route('/api/prometheus/stop', methods=['POST'])
 def api_stop_prometheus():
@@ -666,32 +1682,268 @@ def api_stop_prometheus():
 @app.route('/api/prometheus/reload', methods=['POST'])
 def api_reload_prometheus():
     """Reload Prometheus configuration"""
-    success = reload_prometheus()
+    # An explicit reload should pick up the database as it is right now (from the primary)
+    try:
+        catalog_cache.refresh(lambda: load_catalog(read_primary=True))
+    except Exception as e:
+        print(f"⚠️  Could not refresh service catalog before reload: {e}")
+    # Runs now, absorbing any reload the scheduler had pending
+    requested_at = time.time()
+    success = reload_scheduler.run_now('api', reload_prometheus)
+    reloads = {
+        instance.name: instance.last_reload for instance in prometheus_instances
+        if instance.last_reload and instance.last_reload['at'] >= requested_at
+    }
     if success:
-        return jsonify({'message': 'Prometheus configuration reloaded successfully'})
+        return jsonify({'message': 'Prometheus configuration reloaded successfully', 'reloads': reloads})
     else:
-        return jsonify({'error': 'Failed to reload Prometheus configuration'}), 500
+        errors = {name: reload['error'] for name, reload in reloads.items() if not reload['success']}
+        return jsonify({'error': 'Failed to reload Prometheus configuration', 'details': errors}), 500
 
 @app.route('/api/prometheus/kill-port', methods=['POST'])
 def api_kill_prometheus_port():
-    """Kill any processes using the Prometheus port"""
+    """Kill any processes using the Prometheus ports"""
+    ports = ', '.join(str(instance.port) for instance in prometheus_instances)
     try:
-        success = kill_processes_on_port(PROMETHEUS_PORT)
-        if success:
-            return jsonify({'message': f'Successfully cleaned port {PROMETHEUS_PORT}'})
+        # Managed processes are stopped through stop_instance so the supervisor
+        # doesn't take the kill for a crash and start them again on the same port;
+        # free_port then only deals with processes the manager doesn't own
+        for instance in reversed(prometheus_instances):
+            stop_instance(instance)
+        failed = [instance.port for instance in prometheus_instances if not free_port(instance.port, PORT_CLEANUP_TIMEOUT)]
+        if not failed:
+            return jsonify({'message': f'Successfully cleaned port {ports}'})
         else:
-            return jsonify({'error': f'Failed to clean port {PROMETHEUS_PORT}'}), 500
+            return jsonify({'error': f'Failed to clean port {", ".join(map(str, failed))}'}), 500
     except Exception as e:
-        return jsonify({'error': f'Error cleaning port {PROMETHEUS_PORT}: {str(e)}'}), 500
+        return jsonify({'error': f'Error cleaning port {ports}: {str(e)}'}), 500
+
+@app.route('/api/prometheus/status')
+def api_prometheus_status():
+    """Get the state of every managed Prometheus process"""
+    refresh_readiness()
+    return jsonify({
+        'running': prometheus_running(),
+        'state': prometheus_state(),
+        'shards': PROMETHEUS_SHARDS,
+        'federation': PROMETHEUS_FEDERATION_ENABLED,
+        'supervisor': PROMETHEUS_SUPERVISOR_ENABLED,
+        'instances': [dict(instance.status(), supervisor=supervisor.status(instance)) for instance in prometheus_instances]
+    })
+
+@app.route('/api/prometheus/logs')
+def api_prometheus_logs():
+    """
+    Buffered output of one Prometheus instance (?instance=, default the first).
+
+    level= keeps entries at or above a level, tail= the last N, since= the
+    entries after a seq cursor. follow=true streams them as NDJSON and keeps
+    streaming new lines (an empty line every 15s keeps the connection alive).
+    """
+    name = request.args.get('instance', prometheus_instances[0].name)
+    instance = next((i for i in prometheus_instances if i.name == name), None)
+    if instance is None:
+        return jsonify({'error': f'Unknown instance: {name}'}), 400
+
+    level = request.args.get('level')
+    if level is not None and level.lower() not in LOG_LEVELS:
+        return jsonify({'error': f'level must be one of {", ".join(sorted(LOG_LEVELS))}'}), 400
+    try:
+        tail = parse_limit(request.args.get('tail'), PROMETHEUS_LOG_BUFFER_LINES)
+    except ValueError as e:
+        return jsonify({'error': str(e).replace('limit', 'tail')}), 400
+    try:
+        since = int(request.args['since']) if 'since' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'since must be an integer'}), 400
+
+    pump = instance.logs
+    if not parse_bool(request.args.get('follow', 'false')):
+        entries = pump.entries(since=since, level=level, tail=tail if tail or since is not None else 100)
+        return jsonify({
+            'instance': instance.name,
+            'state': instance.state,
+            'next_since': entries[-1]['seq'] if entries else (since if since is not None else pump.last_seq),
+            'logs': pump.stats(),
+            'entries': entries
+        })
+
+    def follow():
+        cursor = since
+        if cursor is None:
+            backlog = pump.entries(level=level, tail=tail or 100)
+            cursor = backlog[0]['seq'] - 1 if backlog else pump.last_seq
+        while True:
+            seen = pump.last_seq  # Entries filtered out by level must not wake the loop again
+            for entry in pump.entries(since=cursor, level=level):
+                cursor = entry['seq']
+                yield json.dumps(entry) + '\n'
+            if not pump.wait(seen, timeout=15):
+                yield '\n'
+
+    return Response(follow(), mimetype='application/x-ndjson')
 
 @app.route('/api/config')
 def api_config():
-    """Get current Prometheus configuration"""
-    config = generate_prometheus_config()
-    if config:
-        return jsonify(config)
-    else:
-        return jsonify({'error': 'Failed to generate configuration'}), 500
+    """Get current Prometheus configuration (?shard=N for one shard when sharded)"""
+    try:
+        shard = int(request.args.get('shard', 0))
+    except ValueError:
+        return jsonify({'error': 'shard must be an integer'}), 400
+    if not 0 <= shard < PROMETHEUS_SHARDS:
+        return jsonify({'error': f'shard must be between 0 and {PROMETHEUS_SHARDS - 1}'}), 400
+
+    if SERVICE_DISCOVERY_MODE == 'http':
+        etag = make_etag('config', 'http', HTTP_SD_URL, HTTP_SD_REFRESH_INTERVAL, shard)
+        return conditional_response(etag, lambda: jsonify(generate_prometheus_config(shard=shard)), API_CACHE_CONTROL)
+
+    snapshot = get_catalog_snapshot()
+    key = config_cache_key(snapshot) if snapshot and snapshot.services else None
+    etag = make_etag('config', *key, shard) if key else None
+
+    def build():
+        config = get_prometheus_config(snapshot, shard)
+        if config:
+            return jsonify(config)
+        else:
+            return jsonify({'error': 'Failed to generate configuration'}), 500
+
+    return conditional_response(etag, build, API_CACHE_CONTROL)
+
+@app.route('/api/prometheus/sd')
+def api_prometheus_sd():
+    """Prometheus HTTP service discovery: target groups for every service in the catalog (?tier= for one policy tier)"""
+    tier = request.args.get('tier')
+    if tier is not None and tier not in scrape_policies.tiers:
+        return jsonify({'error': f'Unknown scrape policy tier: {tier}'}), 400
+
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        # A non-200 answer makes Prometheus keep its previous targets
+        return jsonify({'error': 'Failed to load service catalog'}), 500
+
+    key = config_cache_key(snapshot)
+    etag = make_etag('sd', *key, tier) if key else None
+    response = conditional_response(
+        etag,
+        lambda: Response(get_sd_body(snapshot, tier), mimetype='application/json'),
+        API_CACHE_CONTROL
+    )
+    if snapshot.version is not None:
+        response.headers['X-Catalog-Version'] = str(snapshot.version)
+    return response
+
+@app.route('/api/config/stats')
+def api_config_stats():
+    """Get statistics for the last Prometheus config write"""
+    return jsonify({
+        'streaming': CONFIG_STREAMING_ENABLED,
+        'format': PROMETHEUS_CONFIG_FORMAT,
+        'last_write': config_write_stats.get(prometheus_instances[0].name),
+        'instances': config_write_stats,
+        'layout': PROMETHEUS_JOB_LAYOUT,
+        'scrape_policy_tiers': scrape_policies.tiers,
+        'metric_allowlists': metric_allowlists if METRIC_ALLOWLIST_ENABLED else None,
+        'default_tier': SCRAPE_DEFAULT_TIER,
+        'metric_url_cache': parse_metric_url.cache_info()._asdict(),
+        'fragments': layout_fragments().stats()
+    })
+
+@app.route('/api/targets/dedup')
+def api_targets_dedup():
+    """Report endpoints shared by several services, the scrapes/series deduplication saves and the cross-tenant duplicates it keeps"""
+    snapshot = get_catalog_snapshot()
+    if snapshot is None:
+        return jsonify({'error': 'Failed to load service catalog'}), 500
+
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    # With deduplication off every organization is grouped, opted in or not, so the
+    # savings are what enabling it for all of them would save
+    report = get_dedup_plan(snapshot, opted_in=TARGET_DEDUP_ENABLED).report(samples_per_target(), limit=limit)
+    report['enabled'] = TARGET_DEDUP_ENABLED
+    return jsonify(report)
+
+@app.route('/api/metrics/series-report')
+def api_series_report():
+    """Series per scrape before and after metric relabeling (the allowlist), per organization and in total"""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    queries = {
+        'before': 'sum by (organization_id) (scrape_samples_scraped{organization_id!=""})',
+        'after': 'sum by (organization_id) (scrape_samples_post_metric_relabeling{organization_id!=""})',
+        'head_series': 'sum(prometheus_tsdb_head_series)',
+    }
+    totals = {field: {} for field in queries}
+    answered = False
+    for instance in shard_instances:
+        if not instance.is_running():
+            continue
+        try:
+            results = {field: instant_query(instance.port, expr) for field, expr in queries.items()}
+        except PrometheusAPIError as e:
+            print(f"⚠️  {e}")
+            continue
+        answered = True
+        for field, result in results.items():
+            for org_id, value in vector_by_label(result, 'organization_id').items():
+                totals[field][org_id] = totals[field].get(org_id, 0) + value
+    if not answered:
+        return jsonify({'error': 'No running Prometheus answered the series queries'}), 500
+
+    organizations = []
+    for org_id, before in totals['before'].items():
+        after = totals['after'].get(org_id, before)
+        organizations.append({
+            'organization_id': org_id,
+            'full_fidelity': org_id in METRIC_FULL_FIDELITY_ORGS,
+            'before': int(before),
+            'after': int(after),
+            'dropped': int(before - after)
+        })
+    organizations.sort(key=lambda entry: (-entry['dropped'], entry['organization_id']))
+
+    before = int(sum(totals['before'].values()))
+    after = int(sum(totals['after'].values()))
+    return jsonify({
+        'enabled': METRIC_ALLOWLIST_ENABLED,
+        'full_fidelity_organizations': METRIC_FULL_FIDELITY_ORGS,
+        'totals': {
+            'before': before,
+            'after': after,
+            'dropped': before - after,
+            'reduction_percent': round(100 * (before - after) / before, 1) if before else 0.0
+        },
+        'head_series': int(sum(totals['head_series'].values())),
+        'organizations': organizations[:limit]
+    })
+
+@app.route('/api/scrape-intervals')
+def api_scrape_intervals():
+    """Adaptive scrape interval overrides and the decisions behind them (?target= to filter)"""
+    return jsonify({
+        'enabled': ADAPTIVE_INTERVALS_ENABLED,
+        'stats': adaptive_controller.stats(),
+        'overrides': adaptive_controller.overrides(),
+        'decisions': adaptive_controller.decisions(request.args.get('target'))
+    })
+
+@app.route('/api/scrape-intervals/evaluate', methods=['POST'])
+def api_evaluate_scrape_intervals():
+    """Run an adaptive interval evaluation now"""
+    if not ADAPTIVE_INTERVALS_ENABLED:
+        return jsonify({'error': 'Adaptive scrape intervals are disabled'}), 400
+    try:
+        decisions = adaptive_controller.evaluate()
+        return jsonify({'decisions': decisions, 'overrides': adaptive_controller.overrides()})
+    except Exception as e:
+        return jsonify({'error': f'Failed to evaluate scrape intervals: {str(e)}'}), 500
 
 @app.route('/api/monitoring/start', methods=['POST'])
 def api_start_monitoring():
@@ -714,22 +1966,59 @@ def api_stop_monitoring():
 @app.route('/api/monitoring/status')
 def api_monitoring_status():
     """Get monitoring status"""
-    global monitoring_active, monitoring_thread, last_services_hash
-
     is_active = monitoring_active and monitoring_thread and monitoring_thread.is_alive()
 
     return jsonify({
         'active': is_active,
-        'interval': MONITOR_INTERVAL,
+        'interval': current_poll_interval(),
         'last_check_hash': last_services_hash[:8] + '...' if last_services_hash else None,
-        'thread_alive': monitoring_thread.is_alive() if monitoring_thread else False
+        'thread_alive': monitoring_thread.is_alive() if monitoring_thread else False,
+        'catalog_version': catalog_version,
+        'change_feed': change_feed.status() if change_feed else None,
+        'reload': dict(reload_scheduler.stats(), **reload_counters, durations=reload_durations.snapshot())
     })
 
+@app.route('/metrics')
+def manager_metrics():
+    """The manager's own metrics in the Prometheus text format (reload durations and outcomes)"""
+    lines = [
+        '# HELP prometheus_manager_reloads_total Prometheus reloads by outcome',
+        '# TYPE prometheus_manager_reloads_total counter'
+    ]
+    for result in ('reloaded', 'failed', 'skipped_unchanged'):
+        lines.append(f'prometheus_manager_reloads_total{{result="{result}"}} {reload_counters[result]}')
+    snapshot = catalog_cache.peek()
+    lines.extend([
+        '# HELP prometheus_manager_catalog_services Services in the catalog',
+        '# TYPE prometheus_manager_catalog_services gauge',
+        f'prometheus_manager_catalog_services {len(snapshot.services) if snapshot else 0}'
+    ])
+    body = '\n'.join(lines) + '\n' + reload_durations.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/catalog/stats')
+def api_catalog_stats():
+    """Get in-memory catalog cache statistics"""
+    return jsonify(catalog_cache.stats())
+
+@app.route('/api/db/pool')
+def api_db_pool():
+    """Get database connection pool statistics"""
+    stats = db_pool.stats()
+    if replica_pool is not None:
+        stats['replica'] = replica_pool.stats()
+    stats['routing'] = db_router.stats()
+    return jsonify(stats)
+
 def cleanup_on_exit():
     """Cleanup function to stop monitoring and Prometheus on exit"""
     print("\n🧹 Cleaning up...")
+    supervisor.stop()
     stop_monitoring()
     stop_prometheus()
+    db_pool.close()
+    if replica_pool is not None:
+        replica_pool.close()
     print("✅ Cleanup completed")
 
 if __name__ == '__main__':
@@ -739,16 +2028,60 @@ if __name__ == '__main__':
     print(f"Database URL: {DATABASE_URL}")
     print(f"Prometheus config will be written to: {PROMETHEUS_CONFIG_PATH}")
     print(f"Prometheus will run on port: {PROMETHEUS_PORT}")
+    if PROMETHEUS_SHARDS > 1:
+        print(f"Prometheus shards: {PROMETHEUS_SHARDS} (ports {PROMETHEUS_PORT}-{PROMETHEUS_PORT + PROMETHEUS_SHARDS - 1})")
+    if PROMETHEUS_FEDERATION_ENABLED:
+        print(f"Federation Prometheus will run on port: {PROMETHEUS_FEDERATION_PORT}")
     print(f"Service monitoring interval: {MONITOR_INTERVAL} seconds")
+    if PROMETHEUS_CONFIG_FORMAT not in CONFIG_FORMATS:
+        raise SystemExit(f"PROMETHEUS_CONFIG_FORMAT must be one of {', '.join(CONFIG_FORMATS)}")
+    if PROMETHEUS_JOB_LAYOUT not in ('per_org', 'consolidated'):
+        raise SystemExit("PROMETHEUS_JOB_LAYOUT must be 'per_org' or 'consolidated'")
+    if PROMETHEUS_JOB_LAYOUT == 'consolidated' and CONFIG_STREAMING_ENABLED:
+        raise SystemExit("CONFIG_STREAMING_ENABLED only supports PROMETHEUS_JOB_LAYOUT=per_org")
+    if TARGET_DEDUP_ENABLED and CONFIG_STREAMING_ENABLED:
+        raise SystemExit("TARGET_DEDUP_ENABLED is not supported with CONFIG_STREAMING_ENABLED")
+    if TARGET_DEDUP_ENABLED and not TARGET_DEDUP_ORGS:
+        print("⚠️  TARGET_DEDUP_ENABLED is set but no organization opted in through TARGET_DEDUP_ORGS")
+    if SERVICE_DISCOVERY_MODE not in ('static', 'http'):
+        raise SystemExit("SERVICE_DISCOVERY_MODE must be 'static' or 'http'")
+    if SERVICE_DISCOVERY_MODE == 'http':
+        print(f"Service discovery: Prometheus polls {HTTP_SD_URL} every {HTTP_SD_REFRESH_INTERVAL}")
+        if CONFIG_STREAMING_ENABLED:
+            print("⚠️  CONFIG_STREAMING_ENABLED has no effect with SERVICE_DISCOVERY_MODE=http (targets are served, not written)")
+    elif CONFIG_STREAMING_ENABLED:
+        print("ℹ️  Streaming config writes: only the writer runs in constant memory, "
+              "the monitor and catalog cache still hold every service")
+    if CHANGE_FEED_ENABLED:
+        print(f"Catalog change feed: LISTEN {CHANGE_FEED_CHANNEL} (safety poll every {CHANGE_FEED_SAFETY_INTERVAL} seconds)")
 
     # Register cleanup function
     atexit.register(cleanup_on_exit)
 
-    # Generate initial configuration and set initial hash
+    # Open the minimum number of pooled database connections up front
+    opened = db_pool.warm()
+    print(f"🔌 Database pool ready ({opened} connection(s) open, max {DB_POOL_MAX_SIZE})")
+    if replica_pool is not None:
+        opened = replica_pool.warm()
+        print(f"📚 Read replica pool ready ({opened} connection(s) open, max lag {REPLICA_MAX_LAG}s)")
+
+    # Databases without migration 013 lack the scrape policy columns; services then get the tier defaults
+    with get_db_connection() as conn:
+        missing_columns = detect_catalog_columns(conn)
+    if missing_columns:
+        print(f"⚠️  public.services has no {', '.join(sorted(missing_columns))} column(s) "
+              f"(migration 013 not applied), using the scrape policy tier defaults")
+
+    # Load the initial catalog (sets the initial hash and cache snapshot), then generate configuration
+    _, initial_services = check_for_service_changes(read_primary=True)
+    initial_services = initial_services or []
+    if CATALOG_JOURNAL_ENABLED:
+        print(f"📊 Initial services loaded: {len(initial_services)} services (catalog version {catalog_version})")
+    else:
+        print(f"📊 Initial services loaded: {len(initial_services)} services")
+    if SERVICE_DISCOVERY_MODE == 'http' and initial_services:
+        warn_unapplied_sd_limits(get_catalog_snapshot())
     write_prometheus_config()
-    initial_services = fetch_services()
-    last_services_hash = get_services_hash(initial_services)
-    print(f"📊 Initial services loaded: {len(initial_services)} services")
 
     # Start background monitoring
     start_monitoring()
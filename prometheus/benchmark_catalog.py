@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark catalog record representations: legacy dict rows vs compact Service records
+
+The additive per-record hash costs more CPU than the legacy whole-catalog md5
+for a full rebuild; what it buys is the O(changes) update of the delta column.
+"""
+
+import gc
+import hashlib
+import sys
+import time
+import tracemalloc
+
+from catalog import CatalogSnapshot, apply_catalog_changes, build_services, services_hash_value
+
+SIZES = [10_000, 100_000, 1_000_000]
+SERVICES_PER_ORG = 20
+
+
+def generate_rows(count):
+    """Rows shaped like the catalog query result (service_id, metric_url, organization_id, name, policy columns)"""
+    return [
+        (
+            f'service-{i:07d}',
+            f'http://host-{i}.example.com:9100/metrics',
+            f'{i // SERVICES_PER_ORG:08x}-0000-4000-8000-000000000000',
+            f'Service {i}',
+            'service', None, None, None, None
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_records(rows):
+    """Previous fetch_services(): one 4-key dict per row"""
+    service_list = []
+    for service in rows:
+        service_list.append({
+            'service_id': service[0],
+            'metric_url': service[1],
+            'organization_id': service[2],
+            'name': service[3]
+        })
+    return service_list
+
+
+def legacy_group(services):
+    """Previous per-organization regrouping"""
+    org_services = {}
+    for service in services:
+        org_id = service['organization_id']
+        if org_id not in org_services:
+            org_services[org_id] = []
+        org_services[org_id].append(service)
+    return org_services
+
+
+def legacy_hash(services):
+    """Previous get_services_hash(): md5 of str(sorted(list of tuples))"""
+    services_str = str(sorted([
+        (s['service_id'], s['metric_url'], s['organization_id'], s['name'])
+        for s in services
+    ]))
+    return hashlib.md5(services_str.encode()).hexdigest()
+
+
+def delta_update(services):
+    """Journal-mode hash update for one changed service, against the full catalog's hash"""
+    services_by_id = {s.service_id: s for s in services}
+    hash_value = services_hash_value(services)
+    changed = services[0]._replace(name='Renamed')
+    started = time.perf_counter()
+    apply_catalog_changes(services_by_id, {'upserts': [changed], 'deletes': []}, hash_value)
+    return time.perf_counter() - started
+
+
+def measure_memory(build, rows):
+    """Bytes retained by the structure build(rows) returns (rows themselves excluded)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current
+
+
+def measure_peak(func, arg):
+    """Peak bytes allocated while func(arg) runs"""
+    gc.collect()
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    return peak
+
+
+def measure_time(func, arg):
+    gc.collect()
+    started = time.perf_counter()
+    result = func(arg)
+    return time.perf_counter() - started, result
+
+
+def mib(value):
+    return f"{value / 2**20:8.1f}"
+
+
+def main():
+    """Run the comparison for every size given on the command line (default 10k/100k/1M)"""
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+
+    print("📊 Catalog record benchmark (memory in MiB, time in seconds)")
+    print("=" * 96)
+    print(f"{'services':>9} {'layout':<8} {'records':>8} {'index':>8} {'hash peak':>9} "
+          f"{'build':>7} {'index':>7} {'hash':>7} {'delta':>9}")
+
+    for count in sizes:
+        rows = generate_rows(count)
+
+        legacy_mem = measure_memory(legacy_records, rows)
+        compact_mem = measure_memory(build_services, rows)
+
+        legacy_build, legacy = measure_time(legacy_records, rows)
+        compact_build, compact = measure_time(build_services, rows)
+
+        legacy_index_mem = measure_memory(legacy_group, legacy)
+        compact_index_mem = measure_memory(CatalogSnapshot, compact)
+        legacy_index, _ = measure_time(legacy_group, legacy)
+        compact_index, _ = measure_time(CatalogSnapshot, compact)
+
+        legacy_hash_peak = measure_peak(legacy_hash, legacy)
+        compact_hash_peak = measure_peak(services_hash_value, compact)
+        legacy_hash_time, _ = measure_time(legacy_hash, legacy)
+        compact_hash_time, _ = measure_time(services_hash_value, compact)
+        compact_delta = delta_update(compact)
+
+        print(f"{count:>9} {'dict':<8} {mib(legacy_mem)} {mib(legacy_index_mem)} {mib(legacy_hash_peak):>9} "
+              f"{legacy_build:7.3f} {legacy_index:7.3f} {legacy_hash_time:7.3f} {legacy_hash_time:9.6f}")
+        print(f"{count:>9} {'Service':<8} {mib(compact_mem)} {mib(compact_index_mem)} {mib(compact_hash_peak):>9} "
+              f"{compact_build:7.3f} {compact_index:7.3f} {compact_hash_time:7.3f} {compact_delta:9.6f}")
+
+        del rows, legacy, compact
+        gc.collect()
+
+    print("\nrecords: retained size of the record list; index: grouping (dict) vs CatalogSnapshot "
+          "(by organization + by service_id);\nhash peak: transient memory while hashing the catalog; "
+          "hash: full rehash; delta: rehash after one changed service\n(the legacy hash "
+          "always rehashes everything, the additive one only adjusts the changed record's digest)")
+
+
+if __name__ == '__main__':
+    main()
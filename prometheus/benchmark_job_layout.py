@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark Prometheus job layouts: one job per organization vs consolidated jobs with per-target labels
+"""
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import psutil
+
+import app
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+from config_stream import dump_config
+
+ORG_COUNTS = [10, 1_000, 10_000]
+SERVICES_PER_ORG = 5
+LAYOUTS = ['per_org', 'consolidated']
+BENCH_PORT = int(os.getenv('BENCH_PROMETHEUS_PORT', 19090))
+SETTLE_SECONDS = float(os.getenv('BENCH_SETTLE_SECONDS', 15))  # Let scrape pools start before sampling memory
+RELOADS = 3
+
+
+def generate_snapshot(org_count, version):
+    """
+    Catalog with SERVICES_PER_ORG services per organization; targets are unroutable on purpose.
+
+    It carries a real hash and version like a published snapshot, so the
+    manager's per-catalog memoization treats every size as a new catalog.
+    """
+    services = [
+        Service(
+            f'service-{org:05d}-{i}',
+            f'http://10.255.{org % 250}.{i + 1}:{9100 + org // 250}/metrics',
+            f'{org:08x}-0000-4000-8000-000000000000',
+            f'Service {org}-{i}'
+        )
+        for org in range(org_count)
+        for i in range(SERVICES_PER_ORG)
+    ]
+    return CatalogSnapshot(sorted(services, key=catalog_order), format_hash(services_hash_value(services)), version)
+
+
+def build_config(snapshot, layout):
+    """Config for the layout, generated by the manager's own code path"""
+    app.PROMETHEUS_JOB_LAYOUT = layout
+    app.shard_instances[0].port = BENCH_PORT
+    return app.generate_prometheus_config(snapshot)
+
+
+def http(method, path, timeout=120):
+    request = urllib.request.Request(f'http://127.0.0.1:{BENCH_PORT}{path}', method=method)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def wait_ready(process, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Prometheus exited during startup')
+        try:
+            http('GET', '/-/ready', timeout=2)
+            return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError('Prometheus did not become ready')
+
+
+def measure_prometheus(binary, config_path, workdir):
+    """Start Prometheus on the config and return (RSS MiB after settling, median reload seconds)"""
+    cmd = [
+        binary,
+        f'--config.file={config_path}',
+        f'--storage.tsdb.path={os.path.join(workdir, "data")}',
+        '--web.enable-lifecycle',
+        f'--web.listen-address=127.0.0.1:{BENCH_PORT}'
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(process)
+        time.sleep(SETTLE_SECONDS)
+        rss = psutil.Process(process.pid).memory_info().rss
+
+        reload_times = []
+        for _ in range(RELOADS):
+            started = time.perf_counter()
+            # /-/reload answers once the new config is applied (scrape pools rebuilt)
+            http('POST', '/-/reload')
+            reload_times.append(time.perf_counter() - started)
+        return rss / 2**20, statistics.median(reload_times)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    """Run the comparison for every org count given on the command line (default 10/1k/10k)"""
+    org_counts = [int(arg) for arg in sys.argv[1:]] or ORG_COUNTS
+    binary = shutil.which(app.PROMETHEUS_BINARY_PATH)
+
+    print("📊 Prometheus job layout benchmark")
+    if binary is None:
+        print(f"⚠️  Prometheus binary '{app.PROMETHEUS_BINARY_PATH}' not found: "
+              "reporting config size and generation time only")
+    print("=" * 86)
+    print(f"{'orgs':>6} {'layout':<13} {'jobs':>6} {'targets':>8} {'config KiB':>10} "
+          f"{'gen s':>7} {'RSS MiB':>8} {'reload s':>9}")
+
+    for version, org_count in enumerate(org_counts, 1):
+        snapshot = generate_snapshot(org_count, version)
+        for layout in LAYOUTS:
+            for fragments in app.org_fragments:
+                fragments.clear()
+            app.org_target_groups.clear()
+            started = time.perf_counter()
+            config = build_config(snapshot, layout)
+            generation = time.perf_counter() - started
+
+            with tempfile.TemporaryDirectory(prefix='prom-bench-') as workdir:
+                config_path = os.path.join(workdir, 'prometheus.yml')
+                with open(config_path, 'w') as f:
+                    size = dump_config(config, f).bytes
+
+                rss, reload_seconds = (None, None)
+                if binary is not None:
+                    rss, reload_seconds = measure_prometheus(binary, config_path, workdir)
+
+            rss_text = f"{rss:8.1f}" if rss is not None else f"{'-':>8}"
+            reload_text = f"{reload_seconds:9.3f}" if reload_seconds is not None else f"{'-':>9}"
+            print(f"{org_count:>6} {layout:<13} {len(config['scrape_configs']):>6} "
+                  f"{len(snapshot.services):>8} {size / 1024:10.1f} {generation:7.3f} {rss_text} {reload_text}")
+
+    print("\nRSS: Prometheus resident memory after the scrape pools settled; "
+          "reload: median time for POST /-/reload to return")
+
+
+if __name__ == '__main__':
+    main()
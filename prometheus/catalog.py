@@ -0,0 +1,448 @@
+"""
+Service catalog: versioned journal sync and the shared in-memory snapshot cache
+"""
+
+import gc
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import partial
+
+SERVICE_COLUMNS = (
+    'service_id', 'metric_url', 'organization_id', 'name',
+    # Scrape policy (migration 013): tier and per-service overrides, NULL = inherit the tier
+    'entity_type', 'scrape_interval', 'scrape_timeout', 'sample_limit', 'label_limit'
+)
+
+# Immutable, tuple-backed catalog record; converted with _asdict() only at the JSON edge
+Service = namedtuple('Service', SERVICE_COLUMNS, defaults=('service', None, None, None, None))
+
+HASH_MODULUS = 1 << 128
+
+# Scrape policy columns and what a catalog query selects in their place on a database
+# without them (before migration 013): the Service defaults
+POLICY_COLUMNS = SERVICE_COLUMNS[4:]
+POLICY_COLUMN_FALLBACKS = {
+    'entity_type': "'service'::text",
+    'scrape_interval': 'NULL::text',
+    'scrape_timeout': 'NULL::text',
+    'sample_limit': 'NULL::integer',
+    'label_limit': 'NULL::integer',
+}
+
+CATALOG_COLUMNS_QUERY = """
+SELECT column_name
+FROM information_schema.columns
+WHERE table_schema = 'public' AND table_name = 'services' AND column_name = ANY(%s)
+"""
+
+
+def build_catalog_query(missing_columns=()):
+    """
+    Catalog query selecting every SERVICE_COLUMNS column, with the Service default
+    in place of the policy columns the services table doesn't have.
+
+    service_id is ordered byte-wise so SQL order matches Python's catalog_order();
+    keyset pagination over the snapshot relies on that.
+    """
+    policy = ', '.join(
+        f'{POLICY_COLUMN_FALLBACKS[column]} AS {column}' if column in missing_columns
+        else f'{column}::text' if column == 'entity_type' else column
+        for column in POLICY_COLUMNS
+    )
+    return f"""
+SELECT service_id, metric_url, organization_id, name,
+       {policy}
+FROM public.services
+ORDER BY organization_id, service_id COLLATE "C"
+"""
+
+
+CATALOG_QUERY = build_catalog_query()
+
+# Policy columns missing from the services table, set once at startup by detect_catalog_columns()
+missing_policy_columns = frozenset()
+catalog_query = CATALOG_QUERY
+
+VERSION_QUERY = """
+SELECT COALESCE((SELECT MAX(version) FROM public.service_catalog_changes), 0),
+       COALESCE((SELECT pruned_through FROM public.service_catalog_meta), 0)
+"""
+
+CHANGES_QUERY = """
+SELECT DISTINCT ON (service_id) version, op, service_id, organization_id, row_data
+FROM public.service_catalog_changes
+WHERE version > %s AND version <= %s
+ORDER BY service_id, version DESC
+"""
+
+
+# tuple.__new__ bound to Service skips namedtuple._make's length check on the hot path
+_new_service = partial(tuple.__new__, Service)
+
+
+def service_from_row(row):
+    """Build a Service from a catalog query row"""
+    return _new_service(row)
+
+
+@contextmanager
+def gc_paused():
+    """Pause the cyclic GC while bulk-building records; they are acyclic, so nothing can leak"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def build_services(rows):
+    """Build Service records for a whole result set"""
+    with gc_paused():
+        return [_new_service(row) for row in rows]
+
+
+def service_from_journal(row_data):
+    """
+    Build a Service from a journal row_data JSON document.
+
+    Rows journaled before a column existed (entity_type before migration 013),
+    and columns the catalog query doesn't select, get the column's default, as
+    a full load of the same row would.
+    """
+    return Service._make(
+        Service._field_defaults[column] if column in missing_policy_columns
+        else row_data.get(column, Service._field_defaults.get(column))
+        for column in SERVICE_COLUMNS
+    )
+
+
+def detect_catalog_columns(conn):
+    """
+    Check which policy columns public.services has, so catalog loads and journal
+    rows fall back to the defaults on a database without migration 013.
+
+    Returns the missing columns.
+    """
+    global missing_policy_columns, catalog_query
+
+    with conn.cursor() as cursor:
+        cursor.execute(CATALOG_COLUMNS_QUERY, (list(POLICY_COLUMNS),))
+        present = {row[0] for row in cursor.fetchall()}
+    conn.rollback()
+    missing_policy_columns = frozenset(POLICY_COLUMNS) - present
+    catalog_query = build_catalog_query(missing_policy_columns)
+    return missing_policy_columns
+
+
+def services_to_json(services):
+    """Plain dicts for JSON responses"""
+    return [service._asdict() for service in services]
+
+
+def service_digest(service):
+    """128-bit digest of one record"""
+    try:
+        encoded = '\x1f'.join(service).encode()
+    except TypeError:
+        encoded = '\x1f'.join('' if value is None else str(value) for value in service).encode()
+    return int.from_bytes(hashlib.md5(encoded).digest(), 'big')
+
+
+def services_hash_value(services):
+    """
+    Order-independent catalog hash: the sum of per-record digests.
+
+    Because it is a sum, a delta can be applied by subtracting the digests of
+    removed records and adding those of new ones, without touching the rest.
+    """
+    return sum(map(service_digest, services)) % HASH_MODULUS
+
+
+def format_hash(value):
+    return f'{value:032x}'
+
+
+def fetch_catalog_version(conn):
+    """Return (current catalog version, pruned_through)"""
+    with conn.cursor() as cursor:
+        cursor.execute(VERSION_QUERY)
+        version, pruned_through = cursor.fetchone()
+    return int(version), int(pruned_through)
+
+
+def fetch_services(conn, batch_size=2000):
+    """
+    Every service in catalog order, built from a server-side cursor batch by
+    batch so the driver's raw rows are never all held next to the records.
+    """
+    with conn.cursor(name='catalog_load') as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(catalog_query)
+        return build_services(cursor)
+
+
+def fetch_full_catalog(conn, batch_size=2000):
+    """Load every service together with the catalog version it corresponds to"""
+    # SET TRANSACTION must be the first statement, and callers usually ran
+    # fetch_catalog_changes on this connection already
+    conn.rollback()
+    with conn.cursor() as cursor:
+        # One snapshot for both queries so the version matches the rows
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        cursor.execute(VERSION_QUERY)
+        version, _ = cursor.fetchone()
+    services = fetch_services(conn, batch_size)
+    conn.rollback()
+    return int(version), services
+
+
+def iter_catalog(conn, batch_size=2000):
+    """Stream services in catalog order through a server-side cursor"""
+    with conn.cursor(name='catalog_stream') as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(catalog_query)
+        for row in cursor:
+            yield service_from_row(row)
+
+
+def fetch_catalog_changes(conn, since):
+    """
+    Return the compacted changes after version `since`.
+
+    The result is a dict with the current version, the upserted services and
+    the tombstones (service_id + organization_id). If `since` is older than
+    the pruned part of the journal, 'full_resync' is True and the caller must
+    reload the whole catalog instead.
+    """
+    version, pruned_through = fetch_catalog_version(conn)
+    result = {
+        'since': since,
+        'version': version,
+        'full_resync': since < pruned_through or since > version,
+        'upserts': [],
+        'deletes': []
+    }
+    if result['full_resync'] or since == version:
+        return result
+
+    with conn.cursor() as cursor:
+        cursor.execute(CHANGES_QUERY, (since, version))
+        for _, op, service_id, organization_id, row_data in cursor.fetchall():
+            if op == 'delete':
+                result['deletes'].append({
+                    'service_id': service_id,
+                    'organization_id': organization_id
+                })
+            else:
+                result['upserts'].append(service_from_journal(row_data))
+
+    result['upserts'].sort(key=catalog_order)
+    result['deletes'].sort(key=lambda d: d['service_id'])
+    return result
+
+
+def apply_catalog_changes(services_by_id, changes, hash_value=0):
+    """
+    Apply a delta from fetch_catalog_changes to a service_id -> Service dict.
+
+    Returns (changed, new hash value), updating the hash in O(changes).
+    changed compares the hashes, so journaled updates of columns the catalog
+    doesn't carry (description, active_status, ...) don't count.
+    """
+    previous_hash = hash_value % HASH_MODULUS
+    for tombstone in changes['deletes']:
+        removed = services_by_id.pop(tombstone['service_id'], None)
+        if removed is not None:
+            hash_value -= service_digest(removed)
+    for service in changes['upserts']:
+        previous = services_by_id.get(service.service_id)
+        if previous is not None:
+            hash_value -= service_digest(previous)
+        services_by_id[service.service_id] = service
+        hash_value += service_digest(service)
+    hash_value %= HASH_MODULUS
+    return hash_value != previous_hash, hash_value
+
+
+def catalog_order(service):
+    return (str(service.organization_id), service.service_id)
+
+
+def sorted_services(services_by_id):
+    """Services in catalog order (organization_id, service_id)"""
+    return sorted(services_by_id.values(), key=catalog_order)
+
+
+class CatalogSnapshot:
+    """
+    Immutable catalog view with secondary indexes; replaced wholesale on refresh.
+
+    services must be in catalog_order(); by_organization lists keep that order.
+    """
+
+    __slots__ = ('services', 'by_organization', 'by_service_id', 'hash', 'version', 'loaded_at')
+
+    def __init__(self, services, services_hash=None, version=None, loaded_at=None):
+        with gc_paused():
+            by_organization = {}
+            for service in services:
+                by_organization.setdefault(service.organization_id, []).append(service)
+
+            self.services = tuple(services)
+            self.by_organization = by_organization
+            self.by_service_id = {s.service_id: s for s in services}
+        self.hash = services_hash
+        self.version = version
+        self.loaded_at = time.time() if loaded_at is None else loaded_at
+
+    def touched(self, loaded_at):
+        """Copy sharing the same indexes, marked as verified fresh at loaded_at"""
+        clone = object.__new__(CatalogSnapshot)
+        for name in CatalogSnapshot.__slots__:
+            object.__setattr__(clone, name, getattr(self, name))
+        clone.loaded_at = loaded_at
+        return clone
+
+    def age(self):
+        return time.time() - self.loaded_at
+
+
+class CatalogCache:
+    """Process-wide catalog snapshot shared by the monitor loop and all read routes"""
+
+    def __init__(self, loader, max_age=60, org_loader=None, org_ttl=300):
+        self.loader = loader
+        self.max_age = max_age
+        self.org_loader = org_loader
+        self.org_ttl = org_ttl
+
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._org_names = {}  # organization_id -> (name, fetched_at)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'stale_served': 0,
+            'org_hits': 0,
+            'org_misses': 0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def publish(self, services, services_hash=None, version=None, fetched_at=None):
+        """Swap in a new snapshot built from services read at fetched_at"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        current = self._snapshot
+        if current is not None and current.loaded_at > fetched_at:
+            # A newer load already won the race
+            return current
+        if current is not None and services_hash is not None and current.hash == services_hash \
+                and current.version == version:
+            snapshot = current.touched(fetched_at)
+        else:
+            snapshot = CatalogSnapshot(services, services_hash, version, fetched_at)
+        self._snapshot = snapshot
+        return snapshot
+
+    def touch(self, fetched_at=None):
+        """Mark the current snapshot as verified unchanged at fetched_at"""
+        current = self._snapshot
+        if current is not None:
+            fetched_at = time.time() if fetched_at is None else fetched_at
+            if fetched_at > current.loaded_at:
+                self._snapshot = current.touched(fetched_at)
+
+    def peek(self):
+        """Current snapshot without refreshing (may be None or stale)"""
+        return self._snapshot
+
+    def get(self):
+        """Snapshot no older than max_age, refreshing from the database on a miss"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age() <= self.max_age:
+            self._count('hits')
+            return snapshot
+
+        self._count('misses')
+        with self._refresh_lock:
+            # Another request may have refreshed while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.age() <= self.max_age:
+                return snapshot
+            try:
+                return self._load()
+            except Exception as e:
+                if snapshot is None:
+                    raise
+                print(f"⚠️  Catalog refresh failed, serving snapshot {snapshot.age():.0f}s old: {e}")
+                self._count('stale_served')
+                return snapshot
+
+    def refresh(self, loader=None):
+        """Reload the snapshot from the database now, regardless of its age (optionally via another loader)"""
+        with self._refresh_lock:
+            return self._load(loader)
+
+    def _load(self, loader=None):
+        fetched_at = time.time()
+        try:
+            services, services_hash, version = (loader or self.loader)()
+        except Exception:
+            self._count('refresh_errors')
+            raise
+        self._count('refreshes')
+        return self.publish(services, services_hash, version, fetched_at)
+
+    def organization_names(self, organization_ids):
+        """Resolve organization names through the TTL cache; unknown IDs are omitted"""
+        now = time.time()
+        names = {}
+        missing = []
+        for org_id in organization_ids:
+            cached = self._org_names.get(org_id)
+            if cached is not None and now - cached[1] <= self.org_ttl:
+                names[org_id] = cached[0]
+            else:
+                missing.append(org_id)
+
+        self._count('org_hits', len(organization_ids) - len(missing))
+        if missing:
+            self._count('org_misses', len(missing))
+            fetched = self.org_loader(missing)
+            for org_id, name in fetched.items():
+                self._org_names[org_id] = (name, now)
+                names[org_id] = name
+        return names
+
+    def organization_name(self, organization_id):
+        """Single-organization lookup; returns None if it doesn't exist"""
+        return self.organization_names([organization_id]).get(organization_id)
+
+    def stats(self):
+        """Hit/miss counters plus the age and size of the current snapshot"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        snapshot = self._snapshot
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_ratio': stats['hits'] / lookups if lookups else None,
+            'max_age': self.max_age,
+            'age_seconds': round(snapshot.age(), 3) if snapshot else None,
+            'services': len(snapshot.services) if snapshot else 0,
+            'organizations': len(snapshot.by_organization) if snapshot else 0,
+            'hash': snapshot.hash if snapshot else None,
+            'version': snapshot.version if snapshot else None,
+            'organization_names_cached': len(self._org_names),
+            'org_ttl': self.org_ttl,
+        })
+        return stats
@@ -0,0 +1,128 @@
+"""
+LISTEN/NOTIFY change feed that wakes the manager as soon as the services table changes
+"""
+
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class ChangeFeedListener:
+    """
+    Dedicated listener connection that calls on_change for every notification.
+
+    While connected, on_idle (if given) runs every heartbeat seconds without a
+    notification, so the caller knows nothing was missed up to that moment.
+    """
+
+    def __init__(self, dsn, channel, on_change, reconnect_delay=1, max_reconnect_delay=60, on_idle=None, heartbeat=5):
+        self.dsn = dsn
+        self.channel = channel
+        self.on_change = on_change
+        self.on_idle = on_idle
+        self.heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._conn = None
+        self.connected = False
+        self.notifications = 0
+        self.reconnects = 0
+        self.last_event_at = None
+        self.last_error = None
+
+    def start(self):
+        """Start the listener thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='change-feed')
+        self._thread.start()
+
+    def stop(self):
+        """Stop the listener thread and close its connection"""
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def is_alive(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _connect(self):
+        """Open the listener connection and subscribe to the channel"""
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _run(self):
+        delay = self.reconnect_delay
+
+        while not self._stop.is_set():
+            try:
+                self._conn = self._connect()
+                self.connected = True
+                self.last_error = None
+                delay = self.reconnect_delay
+                print(f"📡 Listening for catalog changes on channel '{self.channel}'")
+
+                # Events may have been missed while disconnected, so resync once
+                self.on_change([])
+
+                while not self._stop.is_set():
+                    readable, _, _ = select.select([self._conn], [], [], self.heartbeat)
+                    if not readable:
+                        if self.on_idle:
+                            self.on_idle()
+                        continue
+                    self._conn.poll()
+                    if not self._conn.notifies:
+                        continue
+                    events = [n.payload for n in self._conn.notifies]
+                    self._conn.notifies.clear()
+                    self.notifications += len(events)
+                    self.last_event_at = time.time()
+                    self.on_change(events)
+
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                self.last_error = str(e)
+                print(f"⚠️  Change feed connection lost: {e} (retrying in {delay}s)")
+            finally:
+                self.connected = False
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_reconnect_delay)
+            self.reconnects += 1
+
+    def status(self):
+        """Current listener state for the monitoring API"""
+        return {
+            'channel': self.channel,
+            'connected': self.connected,
+            'thread_alive': self.is_alive(),
+            'notifications': self.notifications,
+            'reconnects': self.reconnects,
+            'last_event_at': self.last_event_at,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,83 @@
+"""
+Per-organization config fragment cache: only organizations whose services changed are rebuilt
+"""
+
+import threading
+
+from config_stream import render_job
+
+
+class FragmentCache:
+    """
+    Built value (a scrape job, or target groups) and its rendered text per organization,
+    keyed by that organization's services.
+
+    The key is the tuple of the organization's Service records, so a lookup is a
+    C-level tuple comparison (records shared between snapshots compare by
+    identity) rather than a rebuild; a change to one service only invalidates
+    its own organization.
+    """
+
+    def __init__(self, build, render=render_job):
+        self.build = build
+        self.render = render
+        self._lock = threading.Lock()
+        self._entries = {}  # organization_id -> [services tuple, built value, {format: rendered text}]
+        self._stats = {
+            'hits': 0,
+            'rebuilt': 0,
+            'evicted': 0,
+            'rendered': 0,
+            'last_rebuilt': 0,
+        }
+
+    def _entries_for(self, by_organization):
+        """Up-to-date entries in by_organization order, dropping organizations that disappeared"""
+        entries = []
+        rebuilt = 0
+        for org_id, org_services in by_organization.items():
+            key = tuple(org_services)
+            entry = self._entries.get(org_id)
+            if entry is None or entry[0] != key:
+                entry = [key, self.build(org_id, org_services), {}]
+                self._entries[org_id] = entry
+                rebuilt += 1
+            entries.append(entry)
+
+        if len(self._entries) > len(by_organization):
+            for org_id in [o for o in self._entries if o not in by_organization]:
+                del self._entries[org_id]
+                self._stats['evicted'] += 1
+
+        self._stats['hits'] += len(entries) - rebuilt
+        self._stats['rebuilt'] += rebuilt
+        self._stats['last_rebuilt'] = rebuilt
+        return entries
+
+    def values(self, by_organization):
+        """Built values for every organization, in by_organization order (shared, treat as read-only)"""
+        with self._lock:
+            return [entry[1] for entry in self._entries_for(by_organization)]
+
+    def fragments(self, by_organization, fmt='yaml'):
+        """Rendered text for every organization; only new or changed organizations are serialized"""
+        with self._lock:
+            fragments = []
+            for entry in self._entries_for(by_organization):
+                text = entry[2].get(fmt)
+                if text is None:
+                    text = entry[2][fmt] = self.render(entry[1], fmt)
+                    self._stats['rendered'] += 1
+                fragments.append(text)
+            return fragments
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Reuse counters and the number of cached organizations"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['organizations'] = len(self._entries)
+        return stats
@@ -0,0 +1,175 @@
+"""
+Streaming Prometheus config writer: catalog rows -> jobs -> incremental YAML/JSON emitter
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from itertools import groupby
+
+import yaml
+
+try:
+    # libyaml bindings are several times faster than the pure-Python dumper
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
+CONFIG_FORMATS = ('yaml', 'json')
+
+
+def render_job(job, fmt='yaml'):
+    """Serialize one scrape job exactly as ConfigEmitter.job() writes it (JSON without the separator)"""
+    if fmt == 'json':
+        return json.dumps(job, sort_keys=True)
+    return yaml.dump([job], Dumper=YamlDumper, default_flow_style=False, indent=2)
+
+
+def render_target_groups(groups, fmt='yaml'):
+    """
+    Serialize static_configs entries so render_grouped_job() can splice them into a job.
+
+    YAML is rendered at its final nesting depth, so line wrapping matches a
+    full yaml.dump of the document.
+    """
+    if fmt == 'json':
+        return ', '.join(json.dumps(group, sort_keys=True) for group in groups)
+    text = yaml.dump([{'static_configs': groups}], Dumper=YamlDumper, default_flow_style=False, indent=2)
+    return text.split('\n', 1)[1]
+
+
+def render_grouped_job(job, group_fragments, fmt='yaml'):
+    """
+    Serialize a job whose static_configs are given as render_target_groups() fragments.
+
+    The output equals render_job() of the full job: static_configs sorts after
+    every other key the job may have, so it is always emitted last.
+    """
+    if any(key > 'static_configs' for key in job):
+        raise ValueError('static_configs must be the last key of a grouped job')
+    if fmt == 'json':
+        head = json.dumps(job, sort_keys=True)
+        return head[:-1] + ', "static_configs": [' + ', '.join(group_fragments) + ']}'
+    head = yaml.dump([job], Dumper=YamlDumper, default_flow_style=False, indent=2)
+    return head + '  static_configs:\n' + ''.join(group_fragments)
+
+
+def iter_org_jobs(services, build_job):
+    """Group services (ordered by organization_id) into one job per organization"""
+    for org_id, org_services in groupby(services, key=lambda s: s.organization_id):
+        yield build_job(org_id, list(org_services))
+
+
+class ConfigEmitter:
+    """Writes a config document piece by piece so only one job is in memory at a time"""
+
+    def __init__(self, stream, fmt='yaml'):
+        if fmt not in CONFIG_FORMATS:
+            raise ValueError(f"Unsupported config format: {fmt}")
+        self.stream = stream
+        self.fmt = fmt
+        self.jobs = 0
+        self.bytes = 0
+        self._digest = hashlib.sha256()
+
+    def _write(self, text):
+        self.stream.write(text)
+        self.bytes += len(text)
+        self._digest.update(text.encode())
+
+    def digest(self):
+        """SHA-256 of everything written so far"""
+        return self._digest.hexdigest()
+
+    def begin(self, header):
+        """Write every top-level key except scrape_configs, then open the job list"""
+        header = {k: v for k, v in header.items() if k != 'scrape_configs'}
+        if self.fmt == 'json':
+            body = json.dumps(header, sort_keys=True)
+            self._write(body[:-1] + (', ' if header else '') + '"scrape_configs": [')
+        else:
+            if header:
+                self._write(yaml.dump(header, Dumper=YamlDumper, default_flow_style=False, indent=2))
+            self._write('scrape_configs:\n')
+
+    def job(self, job):
+        """Append one scrape job"""
+        self.fragment(render_job(job, self.fmt))
+
+    def fragment(self, text):
+        """Append one scrape job already serialized with render_job()"""
+        if self.fmt == 'json':
+            self._write((',\n' if self.jobs else '\n') + text)
+        else:
+            self._write(text)
+        self.jobs += 1
+
+    def end(self):
+        """Close the document"""
+        if self.fmt == 'json':
+            self._write('\n]}\n')
+        elif not self.jobs:
+            # Keep the document valid even when there are no jobs
+            self._write('[]\n')
+
+
+def dump_config(config, stream, fmt='yaml'):
+    """Write a fully built config dict through the same emitter"""
+    emitter = ConfigEmitter(stream, fmt)
+    emitter.begin(config)
+    for job in config.get('scrape_configs', []):
+        emitter.job(job)
+    emitter.end()
+    return emitter
+
+
+def write_config_atomic(path, header, jobs, fmt='yaml', require_jobs=0, unchanged_digest=None):
+    """
+    Stream jobs into a temp file next to path and rename it into place.
+
+    Items of jobs are job dicts or job fragments pre-rendered with render_job().
+
+    Returns stats for the write, or None (leaving path untouched) if fewer than
+    require_jobs jobs were produced. Errors from the job iterator propagate and
+    also leave the existing file untouched. If the rendered document hashes to
+    unchanged_digest, path is left as it is and stats['unchanged'] is True.
+    """
+    started = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.prometheus-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', buffering=1024 * 1024) as f:
+            emitter = ConfigEmitter(f, fmt)
+            emitter.begin(header)
+            for job in jobs:
+                if isinstance(job, str):
+                    emitter.fragment(job)
+                else:
+                    emitter.job(job)
+            emitter.end()
+
+        if emitter.jobs < require_jobs:
+            os.unlink(tmp_path)
+            return None
+
+        unchanged = emitter.digest() == unchanged_digest and os.path.exists(path)
+        if unchanged:
+            os.unlink(tmp_path)
+        else:
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return {
+        'format': fmt,
+        'jobs': emitter.jobs,
+        'bytes': emitter.bytes,
+        'digest': emitter.digest(),
+        'unchanged': unchanged,
+        'seconds': round(time.perf_counter() - started, 6),
+    }
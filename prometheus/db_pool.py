@@ -0,0 +1,228 @@
+"""
+Thread-safe PostgreSQL connection pool with health checks and usage statistics
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolError(Exception):
+    """Raised when a connection cannot be acquired from the pool"""
+
+
+class ConnectionPool:
+    """Bounded pool of psycopg2 connections shared by all manager threads"""
+
+    def __init__(self, dsn, name='primary', min_size=1, max_size=10, max_age=1800,
+                 acquire_timeout=10, validate_after=30, connect_timeout=10):
+        self.dsn = dsn
+        self.name = name
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.max_age = max_age
+        self.acquire_timeout = acquire_timeout
+        self.validate_after = validate_after
+        self.connect_timeout = connect_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []  # (conn, created_at, last_used), most recently used last
+        self._created_at = {}  # id(conn) -> creation time for checked-out connections
+        self._size = 0
+        self._closed = False
+
+        self._stats = {
+            'acquired': 0,
+            'waited': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'connect_errors': 0,
+            'validation_failures': 0,
+            'recycled_error': 0,
+            'recycled_age': 0,
+        }
+
+    def _connect(self):
+        """Open a new physical connection"""
+        try:
+            conn = psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._stats['connect_errors'] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['connects'] += 1
+        return conn
+
+    def _discard(self, conn, reason=None):
+        """Close a connection and free its slot (caller holds the lock)"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._size -= 1
+        if reason:
+            self._stats[reason] += 1
+        self._cond.notify()
+
+    def _is_healthy(self, conn):
+        """Run a trivial query to make sure an idle connection is still usable"""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def warm(self):
+        """Open connections up to min_size so the first requests don't pay for them"""
+        opened = []
+        try:
+            while True:
+                with self._cond:
+                    if self._closed or self._size >= self.min_size:
+                        break
+                    self._size += 1
+                opened.append((self._connect(), time.time()))
+        except Exception as e:
+            print(f"⚠️  Could not pre-open {self.name} database connections: {e}")
+        finally:
+            with self._cond:
+                now = time.time()
+                for conn, created_at in opened:
+                    self._idle.append((conn, created_at, now))
+                self._cond.notify_all()
+        return len(opened)
+
+    def acquire(self, timeout=None):
+        """Check out a validated connection, waiting up to timeout seconds"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            candidate = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError(f"{self.name} connection pool is closed")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolError(
+                            f"Timed out after {timeout}s waiting for a {self.name} database connection")
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if candidate is None:
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    raise PoolError(f"{self.name} database connection error: {e}") from e
+                created_at = time.time()
+                break
+
+            conn, created_at, last_used = candidate
+            now = time.time()
+            if conn.closed:
+                with self._cond:
+                    self._discard(conn, 'recycled_error')
+                continue
+            if self.max_age and now - created_at > self.max_age:
+                with self._cond:
+                    self._discard(conn, 'recycled_age')
+                continue
+            if self.validate_after is not None and now - last_used > self.validate_after:
+                if not self._is_healthy(conn):
+                    with self._cond:
+                        self._stats['validation_failures'] += 1
+                        self._discard(conn)
+                    continue
+            break
+
+        wait = time.monotonic() - started
+        with self._cond:
+            self._created_at[id(conn)] = created_at
+            self._stats['acquired'] += 1
+            if waited:
+                self._stats['waited'] += 1
+            self._stats['wait_seconds_total'] += wait
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+        return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool, recycling it if it is broken or too old"""
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), time.time())
+
+        if not broken and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                broken = True
+
+        with self._cond:
+            if broken or conn.closed:
+                self._discard(conn, 'recycled_error')
+            elif self._closed:
+                self._discard(conn)
+            elif self.max_age and time.time() - created_at > self.max_age:
+                self._discard(conn, 'recycled_age')
+            else:
+                self._idle.append((conn, created_at, time.time()))
+                self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that checks a connection out and always returns it"""
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def close(self):
+        """Close all idle connections; checked-out ones are closed on release"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool sizing and acquire/usage counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_age': self.max_age,
+            })
+        acquired = stats['acquired']
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / acquired if acquired else 0.0
+        return stats
@@ -0,0 +1,160 @@
+"""
+Routes read-only manager queries to an optional read replica, falling back to the primary when it lags
+"""
+
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import psycopg2
+
+from db_pool import PoolError
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+# (an idle primary doesn't make a caught-up replica look stale) or when it isn't a standby at all
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+# Why the replica was last found unusable; reads it turns away are counted as fallbacks_<reason>
+UNUSABLE_LAG = 'lag'
+UNUSABLE_ERROR = 'error'
+
+
+class ReplicaRouter:
+    """Hands out replica connections for reads while the replica is reachable and within max_lag"""
+
+    def __init__(self, primary, replica=None, max_lag=10, lag_check_interval=5):
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._usable = False
+        self.unusable_reason = None
+        self.last_lag = None
+        self.last_error = None
+        self._stats = {
+            'replica_reads': 0,
+            'primary_reads': 0,
+            'replica_query_failures': 0,
+            'fallbacks_lag': 0,
+            'fallbacks_error': 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _measure_lag(self):
+        """Lag of the replica in seconds (None if it can't be determined)"""
+        with self.replica.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_QUERY)
+                lag = cursor.fetchone()[0]
+        return None if lag is None else float(lag)
+
+    def replica_usable(self):
+        """Whether reads may go to the replica, re-measuring lag at most every lag_check_interval seconds"""
+        if self.replica is None:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.lag_check_interval:
+                return self._usable
+            # Claim this check so concurrent readers keep using the previous verdict
+            self._checked_at = now
+
+        try:
+            lag = self._measure_lag()
+            error = None
+        except Exception as e:
+            lag, error = None, str(e)
+
+        usable = error is None and lag is not None and lag <= self.max_lag
+        if usable:
+            reason = None
+        elif error is None and lag is not None:
+            reason = UNUSABLE_LAG
+        else:
+            # An unmeasurable lag (NULL replay timestamp) is as unusable as an unreachable replica
+            reason = UNUSABLE_ERROR
+            error = error or 'replica lag could not be measured'
+        with self._lock:
+            if self._usable and not usable:
+                if error:
+                    print(f"⚠️  Read replica unavailable, routing reads to the primary: {error}")
+                else:
+                    print(f"⚠️  Read replica lag {lag}s exceeds {self.max_lag}s, routing reads to the primary")
+            elif usable and not self._usable:
+                print(f"📚 Routing reads to the replica (lag {lag:.1f}s)")
+            self._usable = usable
+            self.unusable_reason = reason
+            self.last_lag = lag
+            self.last_error = error
+        return usable
+
+    def _mark_unusable(self, error):
+        with self._lock:
+            self._usable = False
+            self.unusable_reason = UNUSABLE_ERROR
+            self._checked_at = time.monotonic()
+            self.last_error = str(error)
+
+    @contextmanager
+    def connection(self, primary=False):
+        """
+        Read connection: the replica when it is usable, otherwise the primary.
+
+        Pass primary=True for read-after-write paths that must see the latest
+        committed data. A replica connection that breaks while in use re-raises
+        its error, and reads go to the primary until the next lag check.
+        """
+        with ExitStack() as stack:
+            conn = None
+            if not primary and self.replica is not None:
+                if self.replica_usable():
+                    try:
+                        conn = stack.enter_context(self.replica.connection())
+                        self._count('replica_reads')
+                    except PoolError as e:
+                        print(f"⚠️  Read replica connection failed, using the primary: {e}")
+                        self._mark_unusable(e)
+                        self._count('fallbacks_error')
+                    else:
+                        try:
+                            yield conn
+                        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                            print(f"⚠️  Read replica query failed, routing reads to the primary: {e}")
+                            self._mark_unusable(e)
+                            self._count('replica_query_failures')
+                            raise
+                        return
+                else:
+                    self._count(f'fallbacks_{self.unusable_reason or UNUSABLE_ERROR}')
+
+            if conn is None:
+                conn = stack.enter_context(self.primary.connection())
+                self._count('primary_reads')
+            yield conn
+
+    def stats(self):
+        """Routing counters and the last lag measurement"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'replica_configured': self.replica is not None,
+            'replica_in_use': self._usable,
+            'unusable_reason': self.unusable_reason,
+            'max_lag': self.max_lag,
+            'last_lag': self.last_lag,
+            'last_error': self.last_error,
+        })
+        return stats
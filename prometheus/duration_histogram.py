@@ -0,0 +1,77 @@
+"""
+Cumulative duration histograms, reported as JSON and in the Prometheus text exposition format
+"""
+
+import threading
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def format_value(value):
+    """Sample value / le bound as the exposition format writes it"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+class DurationHistogram:
+    """
+    Histogram of observed durations in seconds, one series per label set.
+
+    Labels are given in label_names order; buckets are upper bounds, with
+    +Inf added implicitly.
+    """
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> {'counts': per-bucket (non-cumulative), 'sum': s, 'count': n}
+
+    def observe(self, seconds, *label_values):
+        with self._lock:
+            series = self._series.setdefault(tuple(label_values), {
+                'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0
+            })
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += seconds
+            series['count'] += 1
+
+    def snapshot(self):
+        """[{labels, count, sum, buckets: {le: cumulative count}}] per label set"""
+        with self._lock:
+            series = {labels: (list(s['counts']), s['sum'], s['count']) for labels, s in self._series.items()}
+        result = []
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative, running = {}, 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                cumulative[format_value(bound)] = running
+            result.append({
+                'labels': dict(zip(self.label_names, labels)),
+                'count': count,
+                'sum': round(total, 6),
+                'buckets': cumulative
+            })
+        return result
+
+    def render(self):
+        """Text exposition of the histogram"""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for entry in self.snapshot():
+            labels = list(entry['labels'].items())
+            for le, count in entry['buckets'].items():
+                lines.append(f'{self.name}_bucket{{{format_labels(labels + [("le", le)])}}} {count}')
+            suffix = f'{{{format_labels(labels)}}}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {format_value(entry["sum"])}')
+            lines.append(f'{self.name}_count{suffix} {entry["count"]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,153 @@
+"""
+Log pump: drains a child's stdout/stderr on reader threads into a bounded, queryable ring buffer
+"""
+
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Severity order for level filtering; Prometheus 2.x writes lowercase logfmt levels, 3.x uppercase slog ones
+LEVELS = {'debug': 10, 'info': 20, 'warn': 30, 'warning': 30, 'error': 40}
+LOGFMT_PAIR = re.compile(r'([\w.]+)=("(?:[^"\\]|\\.)*"|\S*)')
+PANIC = re.compile(r'^(panic:|fatal error:)')
+
+
+def parse_log_line(line):
+    """logfmt fields of a log line such as ts=... level=info msg="..." (empty if it isn't logfmt)"""
+    fields = {}
+    for key, value in LOGFMT_PAIR.findall(line):
+        if value.startswith('"') and value.endswith('"') and len(value) >= 2:
+            value = value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+        fields[key] = value
+    return fields if 'msg' in fields or 'level' in fields else {}
+
+
+def level_value(level):
+    """Numeric severity of a level name (unknown levels count as info)"""
+    return LEVELS.get((level or '').lower(), LEVELS['info'])
+
+
+class LogPump:
+    """
+    Reads a process's stdout and stderr on daemon threads, so a chatty child
+    never blocks on a full pipe, and keeps the last `capacity` lines.
+
+    Each line becomes an entry {seq, at, pid, stream, level, msg, line, fields};
+    seq increases across restarts of the process the pump is attached to, so it
+    doubles as a follow cursor. Lines that aren't logfmt (a Go panic and its
+    stack trace) take the level of the line before them, or error for a panic.
+    With path, raw lines are also appended to a size-rotated file.
+    """
+
+    def __init__(self, name, capacity=1000, path=None, max_bytes=10 * 1024 * 1024, backups=3):
+        self.name = name
+        self.capacity = capacity
+        self.path = path
+        self._entries = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._threads = []
+        self._dropped = 0
+        self._file_log = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._file_log = logging.getLogger(f'log_pump.{name}')
+            self._file_log.handlers = [handler]
+            self._file_log.setLevel(logging.INFO)
+            self._file_log.propagate = False
+
+    def attach(self, process, on_line=None):
+        """Start draining process.stdout/stderr; on_line(entry) runs for every line read"""
+        self._threads = []
+        for stream_name in ('stdout', 'stderr'):
+            stream = getattr(process, stream_name)
+            if stream is None:
+                continue
+            thread = threading.Thread(target=self._read, args=(process.pid, stream_name, stream, on_line),
+                                      daemon=True, name=f'{self.name}-{stream_name}')
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout=1):
+        """Wait (up to timeout seconds) for the reader threads to reach end of file"""
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def _read(self, pid, stream_name, stream, on_line):
+        level = 'info'
+        try:
+            for raw in iter(stream.readline, b''):
+                line = raw.decode(errors='replace').rstrip()
+                if not line:
+                    continue
+                fields = parse_log_line(line)
+                if fields.get('level'):
+                    level = fields['level'].lower()
+                elif PANIC.match(line):
+                    level = 'error'
+                entry = self.append(line, stream_name, pid, level, fields)
+                if on_line:
+                    on_line(entry)
+        finally:
+            stream.close()
+
+    def append(self, line, stream_name='stderr', pid=None, level='info', fields=None):
+        """Add one line to the buffer (and the log file); returns its entry"""
+        fields = fields or {}
+        with self._cond:
+            self._seq += 1
+            if len(self._entries) == self.capacity:
+                self._dropped += 1
+            entry = {
+                'seq': self._seq,
+                'at': time.time(),
+                'pid': pid,
+                'stream': stream_name,
+                'level': 'warn' if level == 'warning' else level,
+                'msg': fields.get('msg', line),
+                'line': line,
+                'fields': fields
+            }
+            self._entries.append(entry)
+            self._cond.notify_all()
+        if self._file_log:
+            self._file_log.info(line)
+        return entry
+
+    def entries(self, since=None, level=None, tail=None, pid=None):
+        """Buffered entries after seq `since`, at or above `level`, optionally only the last `tail`"""
+        minimum = level_value(level) if level else None
+        with self._cond:
+            entries = list(self._entries)
+        selected = [
+            entry for entry in entries
+            if (since is None or entry['seq'] > since)
+            and (minimum is None or level_value(entry['level']) >= minimum)
+            and (pid is None or entry['pid'] == pid)
+        ]
+        return selected[-tail:] if tail else selected
+
+    def wait(self, since, timeout):
+        """Block until an entry newer than seq `since` arrives or timeout passes; returns whether one did"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq > since, timeout)
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def stats(self):
+        return {
+            'buffered': len(self._entries),
+            'capacity': self.capacity,
+            'last_seq': self._seq,
+            'dropped': self._dropped,
+            'file': self.path
+        }
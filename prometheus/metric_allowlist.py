@@ -0,0 +1,63 @@
+"""
+Status-page metric allowlists: metric_relabel_configs keeping only the SLI series of each entity_type
+"""
+
+import json
+import re
+
+# Metric name regexes (RE2, fully anchored by Prometheus) kept per entity_type tier.
+# Synthetic series (up, scrape_*) are never subject to metric relabeling.
+SLI_PATTERNS = [
+    '.*_requests_total',
+    '.*_request_duration_seconds_(bucket|sum|count)',
+    '.*_errors?_total',
+    '.*_error_rate',
+]
+
+DEFAULT_ALLOWLISTS = {
+    'service': SLI_PATTERNS,
+    'api': SLI_PATTERNS + ['.*_backend_up', '.*_backend_response_time_seconds'],
+    'database': [
+        '.*_query_duration_seconds_(bucket|sum|count)',
+        '.*_transactions_total',
+        '.*_active_connections',
+        '.*_connections_active',
+    ],
+    'custom': SLI_PATTERNS,
+}
+
+
+def load_allowlists(overrides=None):
+    """DEFAULT_ALLOWLISTS with tiers replaced by a JSON object of {tier: [regex, ...]}; raises ValueError on bad input"""
+    allowlists = {tier: list(patterns) for tier, patterns in DEFAULT_ALLOWLISTS.items()}
+    if overrides:
+        for tier, patterns in json.loads(overrides).items():
+            if not isinstance(patterns, list) or not all(isinstance(p, str) for p in patterns):
+                raise ValueError(f"Metric allowlist for {tier} must be a list of regexes")
+            for pattern in patterns:
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f"Invalid metric allowlist regex {pattern!r} for {tier}: {e}")
+            allowlists[tier] = patterns
+    return allowlists
+
+
+def allowlist_relabel_configs(patterns, full_fidelity_orgs=()):
+    """
+    metric_relabel_configs keeping only series whose name matches patterns.
+
+    Series of organizations in full_fidelity_orgs (matched through the
+    organization_id target label) are all kept, so a per-organization
+    override needs no separate job.
+    """
+    allowed = '|'.join(patterns)
+    regex = f'[^;]*;(?:{allowed})'
+    if full_fidelity_orgs:
+        regex = '(?:' + '|'.join(re.escape(str(org_id)) for org_id in sorted(full_fidelity_orgs)) + f');.*|{regex}'
+    return [{
+        'source_labels': ['organization_id', '__name__'],
+        'separator': ';',
+        'regex': regex,
+        'action': 'keep'
+    }]
@@ -0,0 +1,63 @@
+"""
+Scrape endpoints parsed from services.metric_url: scheme, address, metrics path and query params
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlsplit
+
+# params is ((name, (value, ...)), ...) sorted by name, hashable so it can be part of a scrape policy
+ScrapeEndpoint = namedtuple('ScrapeEndpoint', ('scheme', 'address', 'metrics_path', 'params'))
+
+SCHEMES = ('http', 'https')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+PARAM_NAME = re.compile(r'^[A-Za-z0-9_]+$')  # What can follow __param_ in a label name
+
+
+@lru_cache(maxsize=65536)
+def parse_metric_url(url, default_path='/metrics'):
+    """
+    Where and how Prometheus should scrape a metric_url; memoized, since the
+    same URLs are parsed on every config build.
+
+    URLs without a scheme are taken as http, and an empty path (or '/') means
+    default_path, which is what every target was scraped at before. Returns
+    None for a URL Prometheus can't scrape (another scheme, no host, a bad
+    port): its address would make Prometheus reject the whole config, so the
+    service is left out of it instead.
+    """
+    try:
+        parsed = urlsplit(url if '://' in url else f'http://{url}')
+        scheme = parsed.scheme.lower()
+        if scheme not in SCHEMES:
+            raise ValueError(f"unsupported scheme {parsed.scheme!r}")
+        host = parsed.hostname
+        if not host:
+            raise ValueError("no host")
+        if ':' in host:
+            host = f'[{host}]'  # IPv6 literal
+        port = parsed.port or DEFAULT_PORTS[scheme]
+
+        params = {}
+        for name, value in parse_qsl(parsed.query, keep_blank_values=True):
+            params.setdefault(name, []).append(value)
+        return ScrapeEndpoint(
+            scheme,
+            f'{host}:{port}',
+            parsed.path if parsed.path not in ('', '/') else default_path,
+            tuple((name, tuple(values)) for name, values in sorted(params.items()))
+        )
+    except (TypeError, ValueError) as e:
+        print(f"⚠️  Not scraping metric_url {url!r}: {e}")
+        return None
+
+
+def params_dict(params):
+    """ScrapeEndpoint.params as a scrape job's params mapping"""
+    return {name: list(values) for name, values in params}
+
+
+def param_labels(params):
+    """__param_<name> target labels for params (first value; names that can't be label names are skipped)"""
+    return {f'__param_{name}': values[0] for name, values in params if PARAM_NAME.match(name)}
@@ -0,0 +1,120 @@
+"""
+Port cleanup: find the processes bound to a port through psutil and terminate them in parallel
+"""
+
+import os
+
+import psutil
+
+# Sockets that hold a port: TCP listeners and bound UDP sockets (TIME_WAIT leftovers don't)
+BOUND_STATES = (psutil.CONN_LISTEN, psutil.CONN_NONE)
+
+
+def process_connections(proc):
+    """A process's inet sockets (psutil renamed connections() to net_connections() in 6.0)"""
+    connections = getattr(proc, 'net_connections', None) or proc.connections
+    return connections(kind='inet')
+
+
+def port_owner_pids(port):
+    """
+    PIDs of processes listening on port (None for sockets of processes this
+    user can't see).
+
+    Clients connected to the port (such as this app querying Prometheus) are
+    not owners. Where the system-wide table needs privileges (macOS), falls
+    back to the processes this user may inspect.
+    """
+    try:
+        return {conn.pid for conn in psutil.net_connections(kind='inet')
+                if conn.laddr and conn.laddr.port == port and conn.status in BOUND_STATES}
+    except psutil.AccessDenied:
+        pids = set()
+        for proc in psutil.process_iter():
+            try:
+                if any(conn.laddr and conn.laddr.port == port and conn.status in BOUND_STATES
+                       for conn in process_connections(proc)):
+                    pids.add(proc.pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        return pids
+
+
+def port_owners(pids):
+    """psutil.Process objects for the known PIDs"""
+    procs = []
+    for pid in sorted(pid for pid in pids if pid is not None):
+        try:
+            procs.append(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            continue
+    return procs
+
+
+def describe(proc):
+    """'pid ppid cmdline' of a process, like ps -o pid,ppid,cmd"""
+    try:
+        return f"{proc.pid} {proc.ppid()} {' '.join(proc.cmdline()) or proc.name()}"
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return str(proc.pid)
+
+
+def signal_all(procs, method):
+    """Send terminate/kill to every process, ignoring the ones that already exited"""
+    for proc in procs:
+        try:
+            getattr(proc, method)()
+        except psutil.NoSuchProcess:
+            continue
+
+
+def free_port(port, timeout=5, verbose=False):
+    """
+    Terminate every process bound to port; True once the port is free.
+
+    All owners get SIGTERM at once and are waited for together for up to
+    timeout seconds (returning as soon as they have exited), then the
+    survivors get SIGKILL and another timeout.
+    """
+    try:
+        pids = port_owner_pids(port) - {os.getpid()}
+        procs = port_owners(pids)
+        if not pids:
+            print(f"✅ Port {port} is already free")
+            return True
+        if not procs:
+            print(f"⚠️  Port {port} is in use by a process this user can't inspect")
+            return False
+
+        print(f"🔍 Found {len(procs)} process(es) using port {port}")
+        if verbose:
+            for proc in procs:
+                print(f"   {describe(proc)}")
+
+        signal_all(procs, 'terminate')
+        print(f"📤 Sent SIGTERM to {', '.join(str(proc.pid) for proc in procs)}")
+        gone, alive = psutil.wait_procs(procs, timeout=timeout)
+        for proc in gone:
+            print(f"✅ Process {proc.pid} terminated gracefully")
+
+        if alive:
+            signal_all(alive, 'kill')
+            gone, alive = psutil.wait_procs(alive, timeout=timeout)
+            for proc in gone:
+                print(f"💀 Force killed process {proc.pid}")
+            for proc in alive:
+                print(f"⚠️  Process {proc.pid} survived SIGKILL")
+
+        remaining = port_owner_pids(port) - {os.getpid()}
+        if remaining:
+            print(f"⚠️  Warning: Port {port} still has processes after cleanup")
+            return False
+        print(f"✅ Port {port} is now free")
+        return True
+
+    except psutil.AccessDenied as e:
+        print(f"⚠️  Not permitted to clean port {port}: {e}")
+        return False
+    except Exception as e:
+        print(f"❌ Error checking/killing processes on port {port}: {e}")
+        return False
@@ -0,0 +1,69 @@
+"""
+Minimal client for the HTTP API of the Prometheus instances the manager runs
+"""
+
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class PrometheusAPIError(Exception):
+    """Prometheus unreachable or the query failed"""
+
+
+def instant_query(port, expr, timeout=5, host='localhost'):
+    """Run an instant query; returns the result vector as a list of {'metric': ..., 'value': [ts, str]}"""
+    url = f'http://{host}:{port}/api/v1/query?' + urllib.parse.urlencode({'query': expr})
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            body = json.load(response)
+    except Exception as e:
+        raise PrometheusAPIError(f"Query {expr!r} on port {port} failed: {e}") from e
+
+    if body.get('status') != 'success':
+        raise PrometheusAPIError(f"Query {expr!r} on port {port} failed: {body.get('error')}")
+    return body['data']['result']
+
+
+def is_ready(port, timeout=2, host='localhost'):
+    """Whether /-/ready answers 200 (503 while the TSDB is still starting, or unreachable)"""
+    try:
+        with urllib.request.urlopen(f'http://{host}:{port}/-/ready', timeout=timeout) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def reload_config(port, timeout=30, host='localhost'):
+    """POST /-/reload (needs --web.enable-lifecycle); raises PrometheusAPIError carrying Prometheus' error message"""
+    request = urllib.request.Request(f'http://{host}:{port}/-/reload', method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            return
+    except urllib.error.HTTPError as e:
+        message = e.read().decode(errors='replace').strip()
+        raise PrometheusAPIError(f"Reload on port {port} failed: {message or e}") from e
+    except Exception as e:
+        raise PrometheusAPIError(f"Reload on port {port} failed: {e}") from e
+
+
+def metric_values(port, names, timeout=5, host='localhost'):
+    """Current values of unlabelled metrics, read from the instance's own /metrics (not its TSDB)"""
+    try:
+        with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=timeout) as response:
+            text = response.read().decode()
+    except Exception as e:
+        raise PrometheusAPIError(f"Reading /metrics on port {port} failed: {e}") from e
+
+    values = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0] in names:
+            values[parts[0]] = float(parts[1])
+    return values
+
+
+def vector_by_label(result, label):
+    """{label value: float sample value} for an instant vector"""
+    return {sample['metric'].get(label): float(sample['value'][1]) for sample in result}
@@ -0,0 +1,247 @@
+"""
+Prometheus processes run by the manager: hashmod shards and the optional federation aggregator
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import time
+
+from log_pump import LogPump
+
+WAL_SEGMENT = re.compile(r'\bsegment=(\d+)')
+WAL_MAX_SEGMENT = re.compile(r'\bmaxSegment=(\d+)')
+
+
+def parse_wal_progress(line):
+    """(segment, max segment) from a 'WAL segment loaded' log line, else None"""
+    if 'WAL segment loaded' not in line:
+        return None
+    segment, max_segment = WAL_SEGMENT.search(line), WAL_MAX_SEGMENT.search(line)
+    if not segment or not max_segment:
+        return None
+    return int(segment.group(1)), int(max_segment.group(1))
+
+
+class PrometheusInstance:
+    """
+    One Prometheus process: where it listens, its files, the config it has
+    loaded, how far its startup got (WAL replay progress from its log,
+    readiness from /-/ready), and its recent output (kept across restarts).
+    """
+
+    def __init__(self, name, port, config_path, data_dir, shard=None, role='shard', log_options=None):
+        self.name = name
+        self.port = port
+        self.config_path = config_path
+        self.data_dir = data_dir
+        self.shard = shard
+        self.role = role
+
+        self.process = None
+        self.config_digest = None  # SHA-256 of the config the running process has loaded
+        self.last_write = {}
+
+        self.started_at = None
+        self.ready_at = None
+        self.was_ready = False  # Became ready since the last manual start (the supervisor only restarts those)
+        self.stop_requested = False
+        self.last_good_digest = None  # SHA-256 of the config saved as last_good_config_path
+        self.wal_replay = None  # {'segment', 'max_segment'} while/after replaying the WAL
+        self.last_reload = None  # {'at', 'seconds', 'success', 'error'} of the last /-/reload
+        self.logs = LogPump(name, **(log_options or {}))
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def last_good_config_path(self):
+        """Copy of the last config this instance loaded successfully"""
+        return f'{self.config_path}.last-good'
+
+    def save_good_config(self):
+        """Keep a copy of the config the process has just proven it can load"""
+        if not os.path.exists(self.config_path):
+            return
+        tmp_path = f'{self.last_good_config_path}.tmp'
+        shutil.copyfile(self.config_path, tmp_path)
+        os.replace(tmp_path, self.last_good_config_path)
+        self.last_good_digest = file_digest(self.last_good_config_path)
+
+    def restore_good_config(self):
+        """Put the last good config back if the current file was never loaded successfully; returns whether it did"""
+        if self.last_good_digest is None or not os.path.exists(self.last_good_config_path):
+            return False
+        if os.path.exists(self.config_path) and file_digest(self.config_path) == self.last_good_digest:
+            return False
+        tmp_path = f'{self.config_path}.tmp'
+        shutil.copyfile(self.last_good_config_path, tmp_path)
+        os.replace(tmp_path, self.config_path)
+        self.config_digest = self.last_good_digest
+        return True
+
+    def launched(self, process, progress=None, restart=False):
+        """Track a freshly started process; its output is drained into the log pump and followed for WAL replay progress"""
+        self.process = process
+        self.started_at = time.time()
+        self.ready_at = None
+        self.wal_replay = None
+        self.stop_requested = False
+        if not restart:
+            self.was_ready = False
+
+        def on_line(entry):
+            wal = parse_wal_progress(entry['line'])
+            if wal and process is self.process:
+                self.wal_replay = {'segment': wal[0], 'max_segment': wal[1]}
+                if progress:
+                    progress(self)
+
+        self.logs.attach(process, on_line)
+
+    def failure_output(self, lines=20, timeout=1):
+        """Last output lines of an exited process, once its pipes have been read to the end"""
+        self.logs.join(timeout)
+        pid = self.process.pid if self.process is not None else None
+        return '\n'.join(entry['line'] for entry in self.logs.entries(tail=lines, pid=pid))
+
+    def mark_ready(self):
+        if self.ready_at is None:
+            self.ready_at = time.time()
+            self.was_ready = True
+
+    @property
+    def state(self):
+        """stopped, starting, replaying_wal, ready or failed"""
+        if self.process is None:
+            return 'stopped'
+        if self.process.poll() is not None:
+            return 'failed'
+        if self.ready_at is not None:
+            return 'ready'
+        if self.wal_replay is not None:
+            return 'replaying_wal'
+        return 'starting'
+
+    def time_to_ready(self):
+        """Seconds from launch until /-/ready first answered 200"""
+        if self.ready_at is None or self.started_at is None:
+            return None
+        return round(self.ready_at - self.started_at, 3)
+
+    def status(self):
+        """Process state for the status API"""
+        return {
+            'name': self.name,
+            'role': self.role,
+            'shard': self.shard,
+            'port': self.port,
+            'config_path': self.config_path,
+            'data_dir': self.data_dir,
+            'running': self.is_running(),
+            'pid': self.process.pid if self.is_running() else None,
+            'state': self.state,
+            'ready': self.state == 'ready',
+            'started_at': self.started_at if self.process is not None else None,
+            'time_to_ready': self.time_to_ready(),
+            'wal_replay': self.wal_replay,
+            'last_reload': self.last_reload,
+            'logs': self.logs.stats(),
+        }
+
+
+def file_digest(path):
+    """SHA-256 of a file, comparable with the config writer's digest"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def suffixed_path(path, suffix):
+    """prometheus.yml -> prometheus.<suffix>.yml"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{suffix}{ext}'
+
+
+def instance_log_options(log_options, log_dir, name):
+    """LogPump options of one instance, with its own rotated file under log_dir"""
+    options = dict(log_options or {})
+    if log_dir:
+        options['path'] = os.path.join(log_dir, f'{name}.log')
+    return options
+
+
+def build_instances(config_path, data_dir, port, shards=1, federation=False, federation_port=None,
+                    log_options=None, log_dir=None):
+    """
+    Shards on consecutive ports starting at port, plus the aggregator if federation is on.
+
+    With a single shard the instance keeps the plain config path and data dir,
+    so an unsharded setup looks exactly as before. log_options go to each
+    instance's LogPump; with log_dir its output is also written to <name>.log.
+    """
+    instances = []
+    for shard in range(shards):
+        if shards == 1:
+            instances.append(PrometheusInstance('prometheus', port, config_path, data_dir, shard=0,
+                                                log_options=instance_log_options(log_options, log_dir, 'prometheus')))
+        else:
+            instances.append(PrometheusInstance(
+                f'shard-{shard}',
+                port + shard,
+                suffixed_path(config_path, f'shard-{shard}'),
+                os.path.join(data_dir, f'shard-{shard}'),
+                shard=shard,
+                log_options=instance_log_options(log_options, log_dir, f'shard-{shard}')
+            ))
+
+    if federation:
+        instances.append(PrometheusInstance(
+            'federation',
+            federation_port if federation_port is not None else port + shards,
+            suffixed_path(config_path, 'federation'),
+            os.path.join(data_dir, 'federation'),
+            role='federation',
+            log_options=instance_log_options(log_options, log_dir, 'federation')
+        ))
+    return instances
+
+
+def hashmod_relabel_configs(shard, shards):
+    """Keep only the targets whose address hashes to this shard"""
+    return [
+        {
+            'source_labels': ['__address__'],
+            'modulus': shards,
+            'target_label': '__tmp_hashmod',
+            'action': 'hashmod'
+        },
+        {
+            'source_labels': ['__tmp_hashmod'],
+            'regex': str(shard),
+            'action': 'keep'
+        }
+    ]
+
+
+def shard_job(job, shard, shards):
+    """Copy of a catalog scrape job restricted to one shard (unchanged when there is only one)"""
+    if shards <= 1:
+        return job
+    sharded = dict(job)
+    sharded['relabel_configs'] = list(job.get('relabel_configs', [])) + hashmod_relabel_configs(shard, shards)
+    return sharded
+
+
+def federation_job(shard_instances, match, scrape_interval='30s'):
+    """Aggregator job pulling every shard's series through /federate"""
+    return {
+        'job_name': 'federate',
+        'scrape_interval': scrape_interval,
+        'honor_labels': True,
+        'metrics_path': '/federate',
+        'params': {'match[]': [match]},
+        'static_configs': [{
+            'targets': [f'localhost:{instance.port}' for instance in shard_instances]
+        }]
+    }
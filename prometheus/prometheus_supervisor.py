@@ -0,0 +1,155 @@
+"""
+Prometheus supervisor: notices a managed process exiting and restarts it with backoff, up to a crash-loop limit
+"""
+
+import signal
+import threading
+import time
+from collections import deque
+
+
+def exit_reason(returncode):
+    """'killed by SIGKILL' / 'exited with code 1' for a Popen returncode"""
+    if returncode is not None and returncode < 0:
+        try:
+            return f'killed by {signal.Signals(-returncode).name}'
+        except ValueError:
+            return f'killed by signal {-returncode}'
+    return f'exited with code {returncode}'
+
+
+class Supervisor:
+    """
+    Restarts Prometheus instances that exit on their own.
+
+    watch() starts a thread blocked in waitpid (Popen.wait) for each process,
+    so an exit is noticed the moment it happens. Exits the manager caused
+    (stop_instance sets instance.stop_requested) and processes that never
+    became ready since the last manual start are left alone. Otherwise
+    restart(instance) runs after initial_backoff seconds, doubling with every
+    crash within crash_loop_window up to max_backoff; more than
+    crash_loop_limit crashes in the window means a crash loop and the
+    instance stays down until it is started by hand.
+    """
+
+    def __init__(self, restart, initial_backoff=1, max_backoff=60, crash_loop_limit=5, crash_loop_window=300):
+        self.restart = restart
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.crash_loop_limit = crash_loop_limit
+        self.crash_loop_window = crash_loop_window
+
+        self._lock = threading.Lock()
+        self._active = True
+        self._timers = {}  # instance name -> pending restart Timer
+        self._state = {}  # instance name -> supervision state
+
+    def _instance_state(self, instance):
+        return self._state.setdefault(instance.name, {
+            'restarts': 0,
+            'crashes': deque(),
+            'last_exit': None,
+            'next_restart_at': None,
+            'crash_loop': False,
+        })
+
+    def watch(self, instance, process):
+        """Follow one launched process until it exits"""
+        threading.Thread(target=self._wait, args=(instance, process), daemon=True,
+                         name=f'{instance.name}-supervisor').start()
+
+    def reset(self, instance):
+        """Manual start: forget crash history and any pending restart"""
+        with self._lock:
+            self._cancel(instance.name)
+            state = self._instance_state(instance)
+            state['crashes'].clear()
+            state['crash_loop'] = False
+
+    def stop(self):
+        """Cancel pending restarts and stop restarting (watch threads just finish)"""
+        with self._lock:
+            self._active = False
+            for name in list(self._timers):
+                self._cancel(name)
+
+    def resume(self):
+        with self._lock:
+            self._active = True
+
+    def _cancel(self, name):
+        timer = self._timers.pop(name, None)
+        if timer:
+            timer.cancel()
+        if name in self._state:
+            self._state[name]['next_restart_at'] = None
+
+    def _wait(self, instance, process):
+        returncode = process.wait()
+        now = time.time()
+        uptime = round(now - instance.started_at, 3) if instance.started_at else None
+        if process is not instance.process or instance.stop_requested:
+            return
+
+        reason = exit_reason(returncode)
+        instance.logs.join(1)
+        errors = instance.logs.entries(level='error', tail=1, pid=process.pid)
+        with self._lock:
+            state = self._instance_state(instance)
+            state['last_exit'] = {
+                'at': now,
+                'pid': process.pid,
+                'returncode': returncode,
+                'reason': reason,
+                'uptime': uptime,
+                'last_error': errors[-1]['msg'] if errors else None,
+            }
+            if not self._active or not instance.was_ready:
+                print(f"❌ Prometheus {instance.name} (PID {process.pid}) {reason}, not restarting")
+                return
+
+            crashes = state['crashes']
+            crashes.append(now)
+            while crashes and crashes[0] < now - self.crash_loop_window:
+                crashes.popleft()
+            if len(crashes) > self.crash_loop_limit:
+                state['crash_loop'] = True
+                print(f"🛑 Prometheus {instance.name} {reason}; {len(crashes)} crashes in "
+                      f"{self.crash_loop_window:g}s, giving up until it is started manually")
+                return
+
+            delay = min(self.initial_backoff * 2 ** (len(crashes) - 1), self.max_backoff)
+            state['next_restart_at'] = now + delay
+            timer = threading.Timer(delay, self._restart, args=(instance, process))
+            timer.daemon = True
+            self._timers[instance.name] = timer
+            timer.start()
+        print(f"💥 Prometheus {instance.name} (PID {process.pid}) {reason} after {uptime}s, restarting in {delay:g}s")
+
+    def _restart(self, instance, crashed):
+        with self._lock:
+            self._timers.pop(instance.name, None)
+            state = self._instance_state(instance)
+            state['next_restart_at'] = None
+            # Started or stopped by hand in the meantime
+            if not self._active or instance.process is not crashed or instance.stop_requested:
+                return
+            state['restarts'] += 1
+        try:
+            self.restart(instance)
+        except Exception as e:
+            print(f"❌ Restarting Prometheus {instance.name} failed: {e}")
+
+    def status(self, instance):
+        """Restart count, uptime and last exit of an instance"""
+        with self._lock:
+            state = self._instance_state(instance)
+            status = {
+                'restarts': state['restarts'],
+                'recent_crashes': len(state['crashes']),
+                'crash_loop': state['crash_loop'],
+                'next_restart_at': state['next_restart_at'],
+                'last_exit': state['last_exit'],
+            }
+        status['uptime'] = round(time.time() - instance.started_at, 3) if instance.is_running() else None
+        return status
@@ -0,0 +1,132 @@
+"""
+Coalesces bursts of reload requests into a single, rate-limited Prometheus reload
+"""
+
+import threading
+import time
+
+
+class ReloadScheduler:
+    """
+    Runs apply() once per burst of request() calls.
+
+    A reload fires when no new request arrived for `debounce` seconds (or the
+    oldest pending request is `max_delay` seconds old, so constant churn can't
+    starve it), and never sooner than `min_interval` seconds after the last one.
+    """
+
+    def __init__(self, apply, debounce=2, min_interval=10, max_delay=30):
+        self.apply = apply
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._pending_since = None
+        self._last_request = None
+        self._last_run = None
+        self._stats = {
+            'requested': 0,
+            'coalesced': 0,
+            'runs': 0,
+            'failures': 0,
+            'last_reason': None,
+            'last_run_at': None,
+            'last_result': None,
+        }
+
+    def start(self):
+        """Start the scheduler thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name='reload-scheduler')
+        self._thread.start()
+
+    def stop(self):
+        """Stop the scheduler thread, dropping any pending request"""
+        with self._cond:
+            self._stopping = True
+            self._pending_since = None
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def request(self, reason=None):
+        """Ask for a reload; requests arriving before it runs are merged into it"""
+        with self._cond:
+            now = time.monotonic()
+            if self._pending_since is None:
+                self._pending_since = now
+            else:
+                self._stats['coalesced'] += 1
+            self._last_request = now
+            self._stats['requested'] += 1
+            self._stats['last_reason'] = reason
+            self._cond.notify_all()
+
+    def run_now(self, reason=None, apply=None):
+        """Reload immediately (explicit requests), absorbing anything pending; returns the callback's result"""
+        with self._cond:
+            if self._pending_since is not None:
+                self._stats['coalesced'] += 1
+            self._pending_since = None
+            self._stats['requested'] += 1
+            self._stats['last_reason'] = reason
+        return self._execute(apply)
+
+    def _due_at(self):
+        """Monotonic time at which the pending reload may run (caller holds the lock)"""
+        due = min(self._last_request + self.debounce, self._pending_since + self.max_delay)
+        if self._last_run is not None:
+            due = max(due, self._last_run + self.min_interval)
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    if self._pending_since is None:
+                        self._cond.wait()
+                        continue
+                    delay = self._due_at() - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                self._pending_since = None
+
+            self._execute()
+
+    def _execute(self, apply=None):
+        with self._run_lock:
+            try:
+                result = (apply or self.apply)()
+            except Exception as e:
+                print(f"❌ Scheduled reload failed: {e}")
+                result = False
+            with self._cond:
+                self._last_run = time.monotonic()
+                self._stats['runs'] += 1
+                if not result:
+                    self._stats['failures'] += 1
+                self._stats['last_run_at'] = time.time()
+                self._stats['last_result'] = bool(result)
+        return result
+
+    def stats(self):
+        """Request/run counters and whether a reload is waiting"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'pending': self._pending_since is not None,
+                'debounce': self.debounce,
+                'min_interval': self.min_interval,
+                'max_delay': self.max_delay,
+            })
+        return stats
@@ -0,0 +1,169 @@
+"""
+Scrape policies: interval, timeout and limits per service, from entity_type tiers and per-service overrides
+"""
+
+import json
+import re
+import threading
+import zlib
+from collections import namedtuple
+
+from metric_url import params_dict, parse_metric_url
+
+# metric_allowlist names the tier whose metric allowlist applies ('' = keep every series);
+# scheme, metrics_path and params come from the service's metric_url
+ScrapePolicy = namedtuple('ScrapePolicy', (
+    'scrape_interval', 'scrape_timeout', 'sample_limit', 'label_limit', 'metrics_path', 'metric_allowlist',
+    'scheme', 'params'
+))
+
+POLICY_FIELDS = ('scrape_interval', 'scrape_timeout', 'sample_limit', 'label_limit')
+
+# Tiers keyed by services.entity_type; limits of 0 mean unlimited. Every tier scrapes like the
+# per-organization jobs always did (SCRAPE_INTERVAL / SCRAPE_TIMEOUT), and a scrape over a limit
+# fails as a whole, so nothing changes by default: SCRAPE_POLICY_TIERS or the per-service columns opt in
+DEFAULT_SCRAPE_INTERVAL = '30s'
+DEFAULT_SCRAPE_TIMEOUT = '10s'
+DEFAULT_TIERS = {
+    name: {'scrape_interval': DEFAULT_SCRAPE_INTERVAL, 'scrape_timeout': DEFAULT_SCRAPE_TIMEOUT,
+           'sample_limit': 0, 'label_limit': 0}
+    for name in ('service', 'api', 'database', 'custom')
+}
+
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000}
+DURATION_PART = re.compile(r'(\d+)(ms|s|m|h|d|w|y)')
+DURATION = re.compile(r'^(?:\d+(?:ms|s|m|h|d|w|y))+$')
+
+
+def parse_duration(text):
+    """Seconds in a Prometheus duration such as 1m30s (None if it isn't one)"""
+    if not isinstance(text, str) or not DURATION.match(text):
+        return None
+    return sum(int(value) * DURATION_UNITS[unit] for value, unit in DURATION_PART.findall(text))
+
+
+def valid_value(field, value):
+    """Whether value is usable for a policy field"""
+    if field in ('scrape_interval', 'scrape_timeout'):
+        seconds = parse_duration(value)
+        return seconds is not None and seconds > 0
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def load_tiers(overrides=None, scrape_interval=DEFAULT_SCRAPE_INTERVAL, scrape_timeout=DEFAULT_SCRAPE_TIMEOUT):
+    """
+    DEFAULT_TIERS, scraping every scrape_interval with scrape_timeout, merged with a
+    JSON object of per-tier overrides; raises ValueError on bad values
+    """
+    for field, value in (('scrape_interval', scrape_interval), ('scrape_timeout', scrape_timeout)):
+        if not valid_value(field, value):
+            raise ValueError(f"Invalid default {field}: {value!r}")
+    base = {**DEFAULT_TIERS['service'], 'scrape_interval': scrape_interval, 'scrape_timeout': scrape_timeout}
+    tiers = {name: dict(base) for name in DEFAULT_TIERS}
+    if overrides:
+        for name, values in json.loads(overrides).items():
+            tier = tiers.setdefault(name, dict(base))
+            for field, value in values.items():
+                if field not in POLICY_FIELDS or not valid_value(field, value):
+                    raise ValueError(f"Invalid scrape policy {name}.{field}: {value!r}")
+                tier[field] = value
+    return tiers
+
+
+def checksum(text):
+    return format(zlib.crc32(text.encode()), '08x')
+
+
+def job_suffix(policy):
+    """Stable job name part describing a policy, e.g. 60s_t30s_s200000_l64 (limits only when set) or 30s_https_custom_metrics_53a6d599_t10s"""
+    parts = [policy.scrape_interval]
+    if policy.scheme != 'http':
+        parts.append(policy.scheme)
+    if policy.metrics_path != '/metrics':
+        # The checksum keeps paths that read alike (/a/b, /a_b, /a/b/) in separate jobs
+        path = re.sub('[^A-Za-z0-9]+', '_', policy.metrics_path.strip('/'))
+        parts.append(f'{path}_{checksum(policy.metrics_path)}')
+    if policy.params:
+        parts.append('q' + checksum(repr(policy.params)))
+    parts.append(f't{policy.scrape_timeout}')
+    if policy.sample_limit:
+        parts.append(f's{policy.sample_limit}')
+    if policy.label_limit:
+        parts.append(f'l{policy.label_limit}')
+    if policy.metric_allowlist:
+        parts.append(f'keep_{policy.metric_allowlist}')
+    return '_'.join(parts)
+
+
+def policy_job_fields(policy):
+    """Scrape job keys for a policy (limits omitted when unlimited)"""
+    fields = {
+        'scrape_interval': policy.scrape_interval,
+        'scrape_timeout': policy.scrape_timeout,
+        'metrics_path': policy.metrics_path
+    }
+    if policy.scheme != 'http':
+        fields['scheme'] = policy.scheme
+    if policy.params:
+        fields['params'] = params_dict(policy.params)
+    if policy.sample_limit:
+        fields['sample_limit'] = policy.sample_limit
+    if policy.label_limit:
+        fields['label_limit'] = policy.label_limit
+    return fields
+
+
+class PolicyResolver:
+    """
+    Resolves a service's effective ScrapePolicy.
+
+    Valid per-service overrides win over the entity_type tier (unknown types
+    use default_tier), invalid ones fall back to the tier, and the timeout is
+    capped at the interval since Prometheus rejects a config otherwise.
+    Results are interned, so services with the same policy share one object.
+    With metric_allowlists, tiers that have one carry its name in the policy,
+    so their targets get their own jobs. The scheme, path and query params of
+    the metric_url are part of the policy too: targets that only differ in
+    host and port still share jobs, the rest are grouped into as few jobs as
+    there are distinct (scheme, path, params).
+    """
+
+    def __init__(self, tiers, default_tier='service', metrics_path='/metrics', metric_allowlists=None):
+        if default_tier not in tiers:
+            raise ValueError(f"Unknown default scrape policy tier: {default_tier}")
+        self.tiers = tiers
+        self.default_tier = default_tier
+        self.metrics_path = metrics_path
+        self.metric_allowlists = metric_allowlists or {}
+        self._lock = threading.Lock()
+        self._cache = {}  # (entity_type, overrides..., scheme, metrics_path, params) -> ScrapePolicy
+        default_endpoint = ('http', metrics_path, ())
+        self.tier_policies = {
+            name: self._resolve(name, (None,) * len(POLICY_FIELDS), default_endpoint) for name in tiers
+        }
+
+    def tier_of(self, service):
+        return service.entity_type if service.entity_type in self.tiers else self.default_tier
+
+    def _resolve(self, tier_name, overrides, endpoint):
+        values = dict(self.tiers[tier_name])
+        for field, value in zip(POLICY_FIELDS, overrides):
+            if value is not None and valid_value(field, value):
+                values[field] = value
+        if parse_duration(values['scrape_timeout']) > parse_duration(values['scrape_interval']):
+            values['scrape_timeout'] = values['scrape_interval']
+        allowlist = tier_name if tier_name in self.metric_allowlists else ''
+        scheme, metrics_path, params = endpoint
+        return ScrapePolicy(metrics_path=metrics_path, metric_allowlist=allowlist, scheme=scheme, params=params, **values)
+
+    def resolve(self, service):
+        """Effective policy of a service"""
+        endpoint = parse_metric_url(service.metric_url, self.metrics_path)
+        key = (service.entity_type, service.scrape_interval, service.scrape_timeout,
+               service.sample_limit, service.label_limit, endpoint.scheme, endpoint.metrics_path, endpoint.params)
+        policy = self._cache.get(key)
+        if policy is None:
+            policy = self._resolve(self.tier_of(service), key[1:5], key[5:])
+            with self._lock:
+                policy = self._cache.setdefault(key, policy)
+        return policy
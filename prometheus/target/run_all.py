@@ -8,6 +8,8 @@ import time
 import os
 import signal
 import sys
+import threading
+from collections import deque
 from multiprocessing import Process
 
 def run_service(script_name, port):
@@ -20,6 +22,22 @@ def run_service(script_name, port):
     except KeyboardInterrupt:
         print(f"\n🛑 Stopping {script_name}...")
 
+def drain_output(process, lines=50):
+    """
+    Read a child's stdout/stderr on daemon threads so it never blocks on a full pipe;
+    returns a deque holding its last lines
+    """
+    tail = deque(maxlen=lines)
+
+    def pump(stream):
+        for raw in iter(stream.readline, b''):
+            tail.append(raw.decode(errors='replace').rstrip())
+        stream.close()
+
+    for stream in (process.stdout, process.stderr):
+        threading.Thread(target=pump, args=(stream,), daemon=True).start()
+    return tail
+
 def main():
     """Run all target services"""
     services = [
@@ -46,7 +64,7 @@ def main():
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
-            processes.append((process, name, port))
+            processes.append((process, name, port, drain_output(process)))
             time.sleep(2)  # Give each service time to start
         
         print("\n✅ All services started!")
@@ -63,22 +81,26 @@ def main():
         print("=" * 50)
         
         # Wait for all processes
+        stopped = set()
         while True:
             time.sleep(1)
             # Check if any process has died
-            for process, name, port in processes:
-                if process.poll() is not None:
+            for process, name, port, output in processes:
+                if process.poll() is not None and name not in stopped:
+                    stopped.add(name)
                     print(f"❌ {name} has stopped unexpectedly")
+                    for line in output:
+                        print(f"   {line}")
     
     except KeyboardInterrupt:
         print("\n🛑 Stopping all services...")
         
-        for process, name, port in processes:
+        for process, name, port, output in processes:
             print(f"  Stopping {name}...")
             process.terminate()
             
         # Wait for processes to terminate
-        for process, name, port in processes:
+        for process, name, port, output in processes:
             try:
                 process.wait(timeout=5)
             except subprocess.TimeoutExpired:
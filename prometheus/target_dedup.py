@@ -0,0 +1,116 @@
+"""
+Target deduplication: services of one organization pointing at the same endpoint are scraped once,
+endpoints shared across organizations are reported
+"""
+
+from collections import namedtuple
+
+from catalog import SERVICE_COLUMNS
+
+# Service record kept as the single scrape of an endpoint that several services of its
+# organization share; owner_services lists every service the scrape stands for
+SharedService = namedtuple('SharedService', SERVICE_COLUMNS + ('owner_services',))
+
+
+def owner_label(ids):
+    """',a,b,' so a service can match its own id with =~".*,<id>,.*" """
+    return ',' + ','.join(str(i) for i in ids) + ','
+
+
+class DedupPlan:
+    """
+    Deduplicated view of a catalog snapshot.
+
+    Services are grouped by endpoint (the scrape address plus scrape policy,
+    i.e. what Prometheus would actually request). Within each organization the
+    first service of a group in catalog order keeps the target, as a
+    SharedService when others share it; the organization's other services of
+    the group are dropped. Organizations never share a target with each other:
+    a scrape's series carry one organization_id, so every organization keeps
+    its own scrape of a cross-tenant endpoint and the report only counts
+    those duplicates. Services for which participates(service) is false keep
+    their own target; candidates whose endpoint_of(service) is None can't be
+    scraped and are left out. by_organization has the same shape as
+    CatalogSnapshot.by_organization, so the fragment caches key off it and an
+    ownership change only rebuilds the organization involved.
+    """
+
+    def __init__(self, snapshot, endpoint_of, participates=None):
+        owners = {}  # endpoint -> services in catalog order
+        by_organization = {}
+        solo = 0
+        for service in snapshot.services:
+            if participates is None or participates(service):
+                endpoint = endpoint_of(service)
+                if endpoint is not None:
+                    owners.setdefault(endpoint, []).append(service)
+            else:
+                by_organization.setdefault(service.organization_id, []).append(service)
+                solo += 1
+
+        shared = {}
+        scrapes = {}  # endpoint -> scrapes kept (one per organization)
+        for endpoint, services in owners.items():
+            per_organization = {}
+            for service in services:
+                per_organization.setdefault(service.organization_id, []).append(service)
+            for org_id, org_services in per_organization.items():
+                keeper = org_services[0]
+                if len(org_services) > 1:
+                    keeper = SharedService(*keeper, tuple(s.service_id for s in org_services))
+                by_organization.setdefault(org_id, []).append(keeper)
+            if len(services) > 1:
+                shared[endpoint] = services
+            scrapes[endpoint] = len(per_organization)
+
+        # Keep catalog order so jobs and target groups come out in the usual order
+        self.by_organization = {
+            org_id: sorted(by_organization[org_id], key=lambda s: s.service_id)
+            for org_id in snapshot.by_organization if org_id in by_organization
+        }
+        self.shared = shared
+        self.scrapes = scrapes
+        self.services = len(snapshot.services)
+        self.endpoints = sum(scrapes.values()) + solo
+
+    def report(self, samples_per_target=None, limit=20):
+        """
+        Scrapes (and, given samples per scrape by target address, series) saved per scrape cycle,
+        plus the cross-tenant duplicates that are still scraped once per organization.
+
+        samples_per_target maps a target address to its scrape_samples_scraped;
+        series are None when it isn't available.
+        """
+        series_saved = 0 if samples_per_target is not None else None
+        cross_tenant_series = 0 if samples_per_target is not None else None
+        cross_tenant_scrapes = 0
+        top = []
+        for endpoint, services in self.shared.items():
+            target, policy = endpoint
+            scrapes = self.scrapes[endpoint]
+            cross_tenant_scrapes += scrapes - 1
+            samples = samples_per_target.get(target) if samples_per_target is not None else None
+            if series_saved is not None and samples is not None:
+                series_saved += samples * (len(services) - scrapes)
+                cross_tenant_series += samples * (scrapes - 1)
+            top.append({
+                'target': target,
+                'scrape_interval': policy.scrape_interval,
+                'metrics_path': policy.metrics_path,
+                'owners': len(services),
+                'scrapes': scrapes,
+                'organizations': sorted({str(s.organization_id) for s in services}),
+                'samples_per_scrape': samples
+            })
+        top.sort(key=lambda entry: (-entry['owners'], entry['target']))
+
+        return {
+            'services': self.services,
+            'endpoints': self.endpoints,
+            'shared_endpoints': len(self.shared),
+            'scrapes_saved': self.services - self.endpoints,
+            'series_saved': series_saved,
+            'cross_tenant_scrapes': cross_tenant_scrapes,
+            'cross_tenant_series': cross_tenant_series,
+            'top_shared': top[:limit]
+        }
@@ -0,0 +1,24 @@
+"""
+Shared fixtures: the manager modules on sys.path, and app imported without touching a real database
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before app runs load_dotenv() (which never overrides), so no test can reach the .env database
+_workdir = tempfile.mkdtemp(prefix='prometheus-manager-tests-')
+os.environ['DATABASE_URL'] = 'postgresql://tests@127.0.0.1:1/unreachable'
+os.environ['DATABASE_REPLICA_URL'] = ''
+os.environ['PROMETHEUS_CONFIG_PATH'] = os.path.join(_workdir, 'prometheus.yml')
+os.environ['PROMETHEUS_DATA_DIR'] = os.path.join(_workdir, 'data')
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
@@ -0,0 +1,133 @@
+import pytest
+
+from adaptive_intervals import AdaptiveIntervalController
+from catalog import CatalogSnapshot, Service
+
+SLOW = {'duration': 8, 'samples': 100, 'flaps': 0}
+CHEAP = {'duration': 0.1, 'samples': 100, 'flaps': 0}
+FLAPPING = {'duration': 0.1, 'samples': 100, 'flaps': 6}
+
+
+@pytest.fixture
+def costs():
+    return {}
+
+
+@pytest.fixture
+def controller(costs):
+    changes = []
+    controller = AdaptiveIntervalController(
+        lambda: dict(costs), lambda: {'host:9100': 30}, on_change=changes.append,
+        min_interval=15, max_interval=120, confirmations=3, hold_seconds=100
+    )
+    controller.changes = changes
+    return controller
+
+
+def run(controller, times):
+    """Evaluate at each of times; all decisions made"""
+    return [decision for now in times for decision in controller.evaluate(now=now)]
+
+
+def test_interval_changes_only_after_confirmations(controller, costs):
+    costs['host:9100'] = SLOW
+
+    assert run(controller, [0, 60]) == []
+    assert controller.interval_for('host:9100') is None
+
+    decisions = controller.evaluate(now=120)
+
+    assert [(d['from'], d['to'], d['reason']) for d in decisions] == [('30s', '60s', 'expensive')]
+    assert controller.interval_for('host:9100') == 60
+    assert controller.generation == 1
+    assert controller.changes == [decisions]
+
+
+def test_hold_blocks_the_next_move(controller, costs):
+    costs['host:9100'] = SLOW
+    run(controller, [0, 10, 20])
+
+    # Confirmed again, but within hold_seconds of the last change
+    assert run(controller, [30, 40, 50, 60, 70]) == []
+    assert controller.interval_for('host:9100') == 60
+
+    decisions = controller.evaluate(now=121)
+    assert [d['to'] for d in decisions] == ['120s']
+
+
+def test_changing_verdict_restarts_confirmation(controller, costs):
+    for now, cost in enumerate([SLOW, SLOW, CHEAP, SLOW, SLOW]):
+        costs['host:9100'] = cost
+        assert controller.evaluate(now=now) == []
+
+    assert controller.interval_for('host:9100') is None
+    assert controller.stats()['pending_targets'] == 1
+
+
+def test_flapping_target_is_tightened_to_the_minimum(controller, costs):
+    costs['host:9100'] = FLAPPING
+    decisions = run(controller, range(0, 1000, 100))
+
+    assert [d['to'] for d in decisions] == ['15s']
+    assert controller.interval_for('host:9100') == 15
+
+
+def test_recovered_target_returns_to_base(controller, costs):
+    costs['host:9100'] = SLOW
+    run(controller, [0, 100, 200, 300, 400, 500])
+    assert controller.interval_for('host:9100') == 120
+
+    costs['host:9100'] = CHEAP
+    decisions = run(controller, range(600, 1800, 100))
+
+    assert [(d['to'], d['reason']) for d in decisions] == [('60s', 'recovered'), ('30s', 'recovered')]
+    assert controller.interval_for('host:9100') is None
+    assert not controller.has_overrides()
+    assert controller.generation == 4
+
+
+def test_failed_collection_is_skipped():
+    controller = AdaptiveIntervalController(lambda: None, lambda: {'host:9100': 30})
+
+    assert controller.evaluate(now=0) == []
+    stats = controller.stats()
+    assert (stats['skipped'], stats['evaluations']) == (1, 0)
+
+
+def test_targets_leaving_the_catalog_lose_their_override(controller, costs):
+    costs['host:9100'] = SLOW
+    run(controller, [0, 1, 2])
+    assert controller.overrides() == {'host:9100': '60s'}
+
+    controller.targets = lambda: {}
+    controller.evaluate(now=3)
+
+    assert controller.overrides() == {}
+    assert controller.interval_for('host:9100') is None
+
+
+def test_readers_see_a_published_copy_not_the_live_overrides(controller, costs):
+    costs['host:9100'] = SLOW
+    run(controller, [0, 1, 2])
+    published = controller._published
+
+    controller._overrides['host:9100'] = 120  # Mid-evaluation state is not visible to readers
+    assert controller.interval_for('host:9100') == 60
+    controller.evaluate(now=3)
+
+    assert published == {'host:9100': 60}  # Earlier copies are never mutated
+    assert controller._published is not published
+
+
+def test_shared_target_base_is_its_shortest_interval(app_module, monkeypatch):
+    snapshot = CatalogSnapshot([
+        Service('a-slow', 'http://node:9100/metrics', 'org-a', 'Slow', 'service', '2m'),
+        Service('b-fast', 'http://node:9100/metrics', 'org-b', 'Fast', 'service', '15s'),
+        Service('c-default', 'http://other:9100/metrics', 'org-c', 'Other'),
+    ])
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+
+    assert app_module.adaptive_base_intervals() == {'node:9100': 15, 'other:9100': 30}
+    reordered = CatalogSnapshot(snapshot.services[::-1])
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: reordered)
+    assert app_module.adaptive_base_intervals() == {'node:9100': 15, 'other:9100': 30}
@@ -0,0 +1,360 @@
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+import catalog
+from catalog import (
+    CATALOG_COLUMNS_QUERY, CHANGES_QUERY, POLICY_COLUMNS, VERSION_QUERY, CatalogCache, Service,
+    apply_catalog_changes, build_services, catalog_order, detect_catalog_columns, fetch_catalog_changes,
+    fetch_full_catalog, format_hash, service_from_journal, services_hash_value, services_to_json
+)
+
+
+class FakeCursor:
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = 2000
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def execute(self, query, params=None):
+        conn = self.conn
+        if query.startswith('SET TRANSACTION'):
+            # PostgreSQL only accepts SET TRANSACTION before the first query of a transaction
+            if conn.in_transaction:
+                raise psycopg2.InternalError('SET TRANSACTION ISOLATION LEVEL must be called before any query')
+        elif query == VERSION_QUERY:
+            self._rows = [(conn.version, conn.pruned_through)]
+        elif query == CHANGES_QUERY:
+            since, version = params
+            latest = {}
+            for entry in conn.journal:
+                if since < entry[0] <= version:
+                    latest[entry[2]] = entry
+            self._rows = list(latest.values())
+        elif query == CATALOG_COLUMNS_QUERY:
+            (wanted,) = params
+            self._rows = [(column,) for column in wanted if column in conn.columns]
+        elif 'FROM public.services' in query:
+            for column in set(POLICY_COLUMNS) - conn.columns:
+                if f'AS {column}' not in query:
+                    raise psycopg2.errors.UndefinedColumn(f'column "{column}" does not exist')
+            self._rows = sorted(conn.services, key=catalog_order)
+        else:
+            raise AssertionError(f'unexpected query: {query}')
+        conn.in_transaction = True
+        conn.statements.append(query)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection to run the catalog queries against in-memory tables"""
+
+    def __init__(self, services=(), journal=(), version=0, pruned_through=0, columns=POLICY_COLUMNS):
+        self.services = list(services)
+        self.columns = set(columns)  # Policy columns the services table has
+        self.journal = list(journal)
+        self.version = version
+        self.pruned_through = pruned_through
+        self.in_transaction = False
+        self.statements = []
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        self.in_transaction = False
+
+
+def make_services():
+    return [
+        Service('api-1', 'http://api:9100/metrics', 'org-a', 'API'),
+        Service('db-1', 'http://db:9187', 'org-a', 'DB', 'database'),
+        Service('web-1', 'http://web:9100/metrics', 'org-b', 'Web'),
+    ]
+
+
+def journal_row(version, op, service):
+    return (version, op, service.service_id, service.organization_id, service._asdict())
+
+
+def test_delta_contains_only_the_latest_change_per_service():
+    api, db, web = make_services()
+    renamed = api._replace(name='API v2')
+    conn = FakeConnection(journal=[
+        journal_row(4, 'upsert', api),
+        journal_row(5, 'delete', db),
+        journal_row(6, 'upsert', renamed),
+    ], version=6)
+
+    changes = fetch_catalog_changes(conn, 3)
+
+    assert changes['version'] == 6
+    assert not changes['full_resync']
+    assert changes['upserts'] == [renamed]
+    assert changes['deletes'] == [{'service_id': 'db-1', 'organization_id': 'org-a'}]
+
+
+@pytest.mark.parametrize('since', [2, 9])
+def test_since_outside_the_journal_asks_for_a_full_resync(since):
+    conn = FakeConnection(version=8, pruned_through=5)
+    changes = fetch_catalog_changes(conn, since)
+    assert changes['full_resync']
+    assert changes['upserts'] == changes['deletes'] == []
+
+
+def test_full_catalog_loads_after_a_delta_query_on_the_same_connection():
+    services = make_services()
+    conn = FakeConnection(services=services, version=8, pruned_through=5)
+    assert fetch_catalog_changes(conn, 2)['full_resync']
+
+    version, loaded = fetch_full_catalog(conn)
+
+    assert version == 8
+    assert loaded == sorted(services, key=catalog_order)
+    assert not conn.in_transaction
+
+
+@pytest.fixture
+def catalog_columns(monkeypatch):
+    """Restores the detected catalog columns after a test runs detect_catalog_columns"""
+    monkeypatch.setattr(catalog, 'missing_policy_columns', catalog.missing_policy_columns)
+    monkeypatch.setattr(catalog, 'catalog_query', catalog.catalog_query)
+
+
+def test_catalog_loads_without_the_policy_columns(catalog_columns):
+    # Before migration 013 the table has none of the columns; the rows come back with the defaults
+    services = [Service(*service[:4]) for service in make_services()]
+    conn = FakeConnection(services=services, version=3, columns=())
+    with pytest.raises(psycopg2.errors.UndefinedColumn):
+        fetch_full_catalog(conn)
+
+    assert detect_catalog_columns(conn) == set(POLICY_COLUMNS)
+    version, loaded = fetch_full_catalog(conn)
+
+    assert (version, loaded) == (3, sorted(services, key=catalog_order))
+    assert not conn.in_transaction
+
+
+def test_catalog_selects_the_policy_columns_that_exist(catalog_columns):
+    conn = FakeConnection(services=make_services(), columns=('entity_type',))
+
+    assert detect_catalog_columns(conn) == {'scrape_interval', 'scrape_timeout', 'sample_limit', 'label_limit'}
+    assert 'entity_type::text' in catalog.catalog_query
+    # Journal documents follow the query: only entity_type is taken from them
+    journaled = service_from_journal({**make_services()[1]._asdict(), 'scrape_interval': '2m'})
+    assert (journaled.entity_type, journaled.scrape_interval) == ('database', None)
+
+
+def test_applied_delta_matches_a_full_reload():
+    api, db, web = make_services()
+    services_by_id = {s.service_id: s for s in (api, db, web)}
+    added = Service('cache-1', 'http://cache:9121', 'org-b', 'Cache')
+    moved = web._replace(metric_url='http://web:9200/metrics')
+    changes = {
+        'upserts': [added, moved],
+        'deletes': [{'service_id': 'db-1', 'organization_id': 'org-a'}],
+    }
+
+    changed, hash_value = apply_catalog_changes(services_by_id, changes, services_hash_value((api, db, web)))
+
+    assert changed
+    assert set(services_by_id.values()) == {api, added, moved}
+    assert hash_value == services_hash_value((api, added, moved))
+
+
+def test_journaled_update_that_leaves_the_record_equal_is_not_a_change():
+    services = make_services()
+    services_by_id = {s.service_id: s for s in services}
+    hash_value = services_hash_value(services)
+    # e.g. only the description column changed: the journaled record is the same
+    changes = {'upserts': [services[0]], 'deletes': [{'service_id': 'gone', 'organization_id': 'org-a'}]}
+
+    changed, new_hash = apply_catalog_changes(services_by_id, changes, hash_value)
+
+    assert not changed
+    assert new_hash == hash_value
+
+
+@pytest.fixture
+def journal_app(app_module, monkeypatch):
+    """app wired to one fake connection for both replica and primary reads, journal mode on"""
+    conn = FakeConnection(services=make_services(), version=12, pruned_through=10)
+
+    @contextmanager
+    def connection(primary=False):
+        conn.rollback()
+        yield conn
+
+    monkeypatch.setattr(app_module, 'CATALOG_JOURNAL_ENABLED', True)
+    monkeypatch.setattr(app_module, 'get_read_connection', connection)
+    monkeypatch.setattr(app_module, 'get_db_connection', connection)
+    monkeypatch.setattr(app_module, 'catalog_version', None)
+    monkeypatch.setattr(app_module, 'catalog_services_by_id', {})
+    monkeypatch.setattr(app_module, 'catalog_hash_value', 0)
+    return app_module, conn
+
+
+def test_monitor_behind_the_pruned_journal_resyncs(journal_app):
+    app_module, conn = journal_app
+    app_module.catalog_version = 4
+
+    assert app_module.sync_catalog_from(conn)
+
+    assert app_module.catalog_version == 12
+    assert set(app_module.catalog_services_by_id) == {'api-1', 'db-1', 'web-1'}
+    assert app_module.catalog_hash_value == services_hash_value(make_services())
+
+
+def test_delta_api_answers_a_pruned_since_with_the_full_catalog(journal_app):
+    app_module, _ = journal_app
+    response = app_module.app.test_client().get('/api/services?since=3')
+
+    assert response.status_code == 200
+    body = response.json
+    assert body['full_resync']
+    assert body['version'] == 12
+    assert [s['service_id'] for s in body['services']] == ['api-1', 'db-1', 'web-1']
+    assert response.headers['X-Catalog-Version'] == '12'
+
+
+class Loader:
+    """Catalog cache loader returning the next prepared result (or raising it)"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def loaded(services, version=None):
+    return services, format_hash(services_hash_value(services)), version
+
+
+def test_cache_serves_the_snapshot_until_it_is_too_old():
+    services = make_services()
+    loader = Loader(loaded(services))
+    cache = CatalogCache(loader, max_age=60)
+
+    first = cache.get()
+    assert cache.get() is first
+    assert loader.calls == 1
+    assert first.by_organization['org-a'] == services[:2]
+    assert first.by_service_id['web-1'] == services[2]
+
+    cache.touch(time.time() - 120)  # Older than the snapshot: ignored
+    assert cache.get() is first
+    cache._snapshot = first.touched(time.time() - 120)
+    cache.get()
+    assert loader.calls == 2
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['refreshes']) == (2, 2, 2)
+
+
+def test_failed_refresh_serves_the_stale_snapshot():
+    loader = Loader(loaded(make_services()), RuntimeError('database down'))
+    cache = CatalogCache(loader, max_age=0)
+    first = cache.get()
+    time.sleep(0.01)
+
+    assert cache.get() is first
+    assert cache.stats()['stale_served'] == 1
+    assert cache.stats()['refresh_errors'] == 1
+
+
+def test_failed_first_load_raises():
+    cache = CatalogCache(Loader(RuntimeError('database down')))
+    with pytest.raises(RuntimeError):
+        cache.get()
+
+
+def test_unchanged_reload_keeps_the_indexes():
+    services = make_services()
+    cache = CatalogCache(Loader(loaded(services, 3), loaded(list(services), 3), loaded(services[:2], 4)))
+    first = cache.refresh()
+
+    second = cache.refresh()
+    assert second is not first
+    assert second.by_organization is first.by_organization
+
+    third = cache.refresh()
+    assert third.version == 4
+    assert list(third.by_organization) == ['org-a']
+
+
+def test_older_load_does_not_replace_a_newer_snapshot():
+    services = make_services()
+    cache = CatalogCache(Loader(loaded(services)))
+    newer = cache.publish(services, fetched_at=time.time())
+
+    assert cache.publish(services[:1], fetched_at=time.time() - 10) is newer
+    assert cache.peek() is newer
+
+
+def test_organization_names_are_cached_for_their_ttl():
+    lookups = []
+
+    def org_loader(ids):
+        lookups.append(list(ids))
+        return {org_id: f'Name of {org_id}' for org_id in ids if org_id != 'missing'}
+
+    cache = CatalogCache(Loader(loaded([])), org_loader=org_loader, org_ttl=300)
+
+    assert cache.organization_names(['org-a', 'missing']) == {'org-a': 'Name of org-a'}
+    assert cache.organization_name('org-a') == 'Name of org-a'
+    assert cache.organization_name('missing') is None
+    assert lookups == [['org-a', 'missing'], ['missing']]
+
+
+def test_catalog_hash_ignores_order_and_sees_every_field():
+    services = make_services()
+    baseline = services_hash_value(services)
+
+    assert services_hash_value(reversed(services)) == baseline
+    assert services_hash_value(services[:2]) != baseline
+    for field in ('metric_url', 'name', 'scrape_interval'):
+        edited = [services[0]._replace(**{field: '30s'})] + services[1:]
+        assert services_hash_value(edited) != baseline, field
+    # Fields are delimited, so shifting text between neighbours changes the hash
+    shifted = [services[0]._replace(organization_id='org-aA', name='PI')] + services[1:]
+    assert services_hash_value(shifted) != baseline
+
+
+def test_records_built_from_rows_and_journal_documents_are_equal():
+    row = ('api-1', 'http://api:9100/metrics', 'org-a', 'API', 'service', None, None, None, None)
+    (built,) = build_services([row])
+    # Journaled before migration 013: no policy columns in the document
+    journaled = service_from_journal({
+        'service_id': 'api-1', 'metric_url': 'http://api:9100/metrics', 'organization_id': 'org-a', 'name': 'API'
+    })
+
+    assert built == journaled == make_services()[0]
+    assert services_to_json([built]) == [{
+        'service_id': 'api-1', 'metric_url': 'http://api:9100/metrics', 'organization_id': 'org-a', 'name': 'API',
+        'entity_type': 'service', 'scrape_interval': None, 'scrape_timeout': None,
+        'sample_limit': None, 'label_limit': None,
+    }]
+    with pytest.raises(AttributeError):
+        built.name = 'Renamed'
@@ -0,0 +1,155 @@
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import pytest
+
+import change_feed
+from change_feed import ChangeFeedListener
+
+Notify = namedtuple('Notify', 'channel payload')
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.conn.statements.append(query)
+
+
+class FakeListenConnection:
+    """Selectable like a psycopg2 connection: notify() makes it readable, poll() collects the payloads"""
+
+    def __init__(self):
+        self._reader, self._writer = socket.socketpair()
+        self._pending = []
+        self._lock = threading.Lock()
+        self.notifies = []
+        self.statements = []
+        self.closed = False
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    def set_isolation_level(self, level):
+        self.isolation_level = level
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def notify(self, payload):
+        with self._lock:
+            self._pending.append(Notify('services_changed', payload))
+        self._writer.send(b'x')
+
+    def poll(self):
+        self._reader.recv(1024)
+        with self._lock:
+            self.notifies.extend(self._pending)
+            self._pending.clear()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._writer.close()
+            self._reader.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Connections handed to the listener; a queued Exception makes that connect attempt fail"""
+    queue = []
+    opened = []
+
+    def connect(dsn):
+        if queue and isinstance(queue[0], Exception):
+            raise queue.pop(0)
+        conn = FakeListenConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(change_feed.psycopg2, 'connect', connect)
+    return queue, opened
+
+
+@pytest.fixture
+def listener():
+    created = []
+
+    def make(**kwargs):
+        events = []
+        feed = ChangeFeedListener('dsn', 'services_changed', events.append, reconnect_delay=0.01, **kwargs)
+        feed.events = events
+        created.append(feed)
+        feed.start()
+        return feed
+
+    yield make
+    for feed in created:
+        feed.stop()
+
+
+def test_notifications_are_delivered_after_an_initial_resync(connections, listener):
+    _, opened = connections
+    feed = listener()
+    wait_for(lambda: feed.connected)
+    conn = opened[0]
+
+    conn.notify('insert:svc-1')
+    conn.notify('delete:svc-2')
+    wait_for(lambda: feed.notifications == 2)
+
+    assert conn.statements == ['LISTEN "services_changed"']
+    # The first call resyncs for whatever was missed before LISTEN took effect
+    assert feed.events[0] == []
+    assert [payload for batch in feed.events[1:] for payload in batch] == ['insert:svc-1', 'delete:svc-2']
+    assert feed.last_event_at is not None
+
+
+def test_lost_connection_is_retried_with_a_resync(connections, listener):
+    queue, opened = connections
+    queue.append(change_feed.psycopg2.OperationalError('could not connect to server'))
+    feed = listener()
+
+    wait_for(lambda: feed.connected)
+
+    assert feed.reconnects == 1
+    assert feed.last_error is None
+    assert feed.events == [[]]
+    assert feed.status()['connected']
+
+
+def test_quiet_heartbeats_call_on_idle(connections, listener):
+    idle = []
+    feed = listener(on_idle=lambda: idle.append(time.time()), heartbeat=0.01)
+
+    wait_for(lambda: len(idle) >= 3)
+
+    assert feed.events == [[]]
+
+
+def test_stop_closes_the_connection(connections, listener):
+    _, opened = connections
+    feed = listener()
+    wait_for(lambda: feed.connected)
+
+    feed.stop()
+
+    assert not feed.is_alive()
+    assert opened[0].closed
@@ -0,0 +1,71 @@
+import pytest
+from flask import Flask, jsonify
+
+from api_helpers import conditional_response, make_etag
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+
+
+def make_services(orgs=3, per_org=4):
+    services = [
+        Service(f'svc-{org}-{i}', f'http://host-{org}-{i}:9100/metrics', f'org-{org}', f'Service {org}-{i}')
+        for org in range(orgs)
+        for i in range(per_org)
+    ]
+    return sorted(services, key=catalog_order)
+
+
+@pytest.fixture
+def etag_client():
+    app = Flask(__name__)
+    builds = []
+
+    @app.route('/thing')
+    def thing():
+        def build():
+            builds.append(1)
+            return jsonify({'value': 42})
+        return conditional_response(make_etag('thing', 1), build, 'no-cache')
+
+    app.builds = builds
+    return app.test_client()
+
+
+def test_matching_etag_answers_304_without_building(etag_client):
+    first = etag_client.get('/thing')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    second = etag_client.get('/thing', headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    assert len(etag_client.application.builds) == 1
+
+
+def test_stale_etag_gets_full_response(etag_client):
+    response = etag_client.get('/thing', headers={'If-None-Match': '"outdated"'})
+    assert response.status_code == 200
+    assert response.json == {'value': 42}
+
+
+@pytest.fixture
+def services_client(app_module, monkeypatch):
+    services = make_services()
+    snapshot = CatalogSnapshot(services, format_hash(services_hash_value(services)), 7)
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+    return app_module.app.test_client(), services
+
+
+def test_services_api_revalidates_with_304(services_client):
+    client, _ = services_client
+    first = client.get('/api/services?limit=5')
+    assert first.status_code == 200
+    assert first.headers['X-Catalog-Version'] == '7'
+
+    second = client.get('/api/services?limit=5', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+    other_page = client.get('/api/services?limit=6', headers={'If-None-Match': first.headers['ETag']})
+    assert other_page.status_code == 200
@@ -0,0 +1,61 @@
+from catalog import Service, catalog_order
+from config_fragments import FragmentCache
+
+
+def make_services():
+    services = [
+        Service('api-1', 'https://api.example.com/metrics', 'org-a', 'API', 'api'),
+        Service('db-1', 'http://db.example.com:9187', 'org-a', 'DB', 'database'),
+        Service('web-2', 'http://web-2.example.com:9100/custom/path?module=http_2xx', 'org-b', 'Web 2'),
+        Service('lim-1', 'http://lim.example.com:9100/metrics', 'org-c', 'Limited'),
+    ]
+    return sorted(services, key=catalog_order)
+
+
+def org_jobs(services):
+    by_organization = {}
+    for service in services:
+        by_organization.setdefault(service.organization_id, []).append(service)
+    return by_organization
+
+
+def test_fragments_are_rebuilt_only_for_changed_organizations():
+    built = []
+
+    def build(org_id, services):
+        built.append(org_id)
+        return {'job_name': f'org_{org_id}', 'static_configs': [{'targets': [s.metric_url for s in services]}]}
+
+    cache = FragmentCache(build)
+    services = make_services()
+    first = cache.fragments(org_jobs(services))
+    assert built == ['org-a', 'org-b', 'org-c']
+
+    built.clear()
+    assert cache.fragments(org_jobs(services)) == first
+    assert built == []
+    assert cache.stats()['hits'] == 3
+
+    # Change one service of org-b and drop org-c
+    changed = [s._replace(metric_url='http://moved:9100') if s.service_id == 'web-2' else s
+               for s in services if s.organization_id != 'org-c']
+    fragments = cache.fragments(org_jobs(changed))
+
+    assert built == ['org-b']
+    assert fragments[0] == first[0]
+    assert fragments[1] != first[1]
+    stats = cache.stats()
+    assert stats['evicted'] == 1
+    assert stats['organizations'] == 2
+    assert stats['last_rebuilt'] == 1
+
+
+def test_each_format_is_rendered_once_per_build():
+    cache = FragmentCache(lambda org_id, services: {'job_name': f'org_{org_id}'})
+    by_organization = org_jobs(make_services())
+
+    cache.fragments(by_organization, 'yaml')
+    cache.fragments(by_organization, 'yaml')
+    cache.fragments(by_organization, 'json')
+
+    assert cache.stats()['rendered'] == 6
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+import io
+import json
+
+import pytest
+
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+from config_stream import dump_config, write_config_atomic
+
+
+def make_services():
+    services = [
+        Service('api-1', 'https://api.example.com/metrics', 'org-a', 'API', 'api'),
+        Service('db-1', 'http://db.example.com:9187', 'org-a', 'DB', 'database'),
+        Service('web-1', 'http://web-1.example.com:9100/metrics', 'org-a', 'Web 1'),
+        Service('web-2', 'http://web-2.example.com:9100/custom/path?module=http_2xx', 'org-b', 'Web 2'),
+        Service('slow-1', 'http://slow.example.com:9100/metrics', 'org-b', 'Slow', 'service', '2m', '1m'),
+        Service('lim-1', 'http://lim.example.com:9100/metrics', 'org-c', 'Limited', 'service', None, None, 500, 30),
+    ]
+    return sorted(services, key=catalog_order)
+
+
+@pytest.fixture
+def writer(app_module, monkeypatch, tmp_path):
+    """Writes the config of the single default instance with the streaming or the buffered writer"""
+    services = make_services()
+    snapshot = CatalogSnapshot(services, format_hash(services_hash_value(services)), 1)
+    instance = app_module.prometheus_instances[0]
+    monkeypatch.setattr(instance, 'config_path', str(tmp_path / 'prometheus.yml'))
+    monkeypatch.setattr(instance, 'data_dir', str(tmp_path / 'data'))
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+
+    @contextmanager
+    def no_database():
+        yield None
+
+    monkeypatch.setattr(app_module, 'get_db_connection', no_database)
+    monkeypatch.setattr(app_module, 'iter_catalog', lambda conn, batch_size: iter(services))
+
+    def write(streaming, fmt):
+        monkeypatch.setattr(app_module, 'CONFIG_STREAMING_ENABLED', streaming)
+        monkeypatch.setattr(app_module, 'PROMETHEUS_CONFIG_FORMAT', fmt)
+        assert app_module.write_prometheus_config()
+        with open(instance.config_path, 'rb') as f:
+            return f.read(), instance.last_write
+
+    return write
+
+
+@pytest.mark.parametrize('fmt', ['yaml', 'json'])
+def test_streamed_and_buffered_configs_are_byte_identical(writer, fmt):
+    buffered, buffered_stats = writer(False, fmt)
+    streamed, streamed_stats = writer(True, fmt)
+
+    assert streamed == buffered
+    assert streamed_stats['digest'] == buffered_stats['digest']
+    assert (streamed_stats['mode'], buffered_stats['mode']) == ('streaming', 'buffered')
+    assert streamed_stats['services'] == len(make_services())
+    assert streamed_stats['jobs'] == buffered_stats['jobs']
+
+
+def test_buffered_config_matches_the_generated_config(app_module, writer):
+    written, _ = writer(False, 'json')
+    expected = io.StringIO()
+    dump_config(app_module.generate_prometheus_config(app_module.get_catalog_snapshot()), expected, 'json')
+
+    assert written.decode() == expected.getvalue()
+    assert json.loads(written)['scrape_configs'][0]['job_name'] == 'prometheus'
+
+
+def test_too_few_jobs_leave_the_old_file(tmp_path):
+    path = tmp_path / 'prometheus.yml'
+    path.write_text('old\n')
+
+    assert write_config_atomic(str(path), {}, [{'job_name': 'prometheus'}], require_jobs=2) is None
+    assert path.read_text() == 'old\n'
+    assert list(tmp_path.iterdir()) == [path]
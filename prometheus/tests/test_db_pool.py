@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions
+
+import db_pool
+from db_pool import ConnectionPool, PoolError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        if not self.conn.healthy:
+            raise db_pool.psycopg2.OperationalError('server closed the connection unexpectedly')
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection the pool opens, in order"""
+    opened = []
+
+    def connect(dsn, connect_timeout=None):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_pool.psycopg2, 'connect', connect)
+    return opened
+
+
+def test_exhausted_pool_times_out(connections):
+    pool = ConnectionPool('dsn', max_size=1)
+    conn = pool.acquire()
+
+    with pytest.raises(PoolError, match='Timed out'):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['in_use'] == 1
+
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+    assert len(connections) == 1
+
+
+def test_waiter_gets_released_connection(connections):
+    pool = ConnectionPool('dsn', max_size=1)
+    conn = pool.acquire()
+    acquired = []
+
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(conn)
+    waiter.join(5)
+
+    assert acquired == [conn]
+    stats = pool.stats()
+    assert stats['waited'] == 1
+    assert stats['wait_seconds_max'] > 0
+
+
+def test_unhealthy_idle_connection_is_replaced(connections):
+    pool = ConnectionPool('dsn', max_size=2, validate_after=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.healthy = False
+
+    conn = pool.acquire()
+
+    assert conn is not first
+    assert first.closed
+    stats = pool.stats()
+    assert stats['validation_failures'] == 1
+    assert stats['connects'] == 2
+    assert stats['size'] == 1
+
+
+def test_idle_connection_within_validate_after_is_not_pinged(connections):
+    pool = ConnectionPool('dsn', validate_after=60)
+    first = pool.acquire()
+    pool.release(first)
+    first.healthy = False  # Would fail a ping; none is sent for a recently used connection
+
+    assert pool.acquire() is first
+    assert pool.stats()['validation_failures'] == 0
+
+
+def test_old_and_broken_connections_are_recycled(connections):
+    pool = ConnectionPool('dsn', max_size=2, max_age=0.01)
+    conn = pool.acquire()
+    time.sleep(0.02)
+    pool.release(conn)
+    assert conn.closed
+    assert pool.stats()['recycled_age'] == 1
+
+    pool.max_age = None
+    with pytest.raises(db_pool.psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise db_pool.psycopg2.OperationalError('connection lost')
+    assert conn.closed
+    stats = pool.stats()
+    assert stats['recycled_error'] == 1
+    assert stats['size'] == 0
+
+
+def test_connect_failure_frees_the_slot(connections, monkeypatch):
+    pool = ConnectionPool('dsn', max_size=1)
+
+    def refuse(dsn, connect_timeout=None):
+        raise db_pool.psycopg2.OperationalError('connection refused')
+
+    monkeypatch.setattr(db_pool.psycopg2, 'connect', refuse)
+    with pytest.raises(PoolError, match='connection refused'):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['size'] == 0
+    assert pool.stats()['connect_errors'] == 1
@@ -0,0 +1,197 @@
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+from db_pool import PoolError
+from db_router import REPLICA_LAG_QUERY, UNUSABLE_ERROR, UNUSABLE_LAG, ReplicaRouter
+
+
+class LagCursor:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        assert query == REPLICA_LAG_QUERY
+        if isinstance(self.pool.lag, Exception):
+            raise self.pool.lag
+
+    def fetchone(self):
+        return (self.pool.lag,)
+
+
+class FakePool:
+    """Pool whose connections are just its name; lag is what the replica lag query answers"""
+
+    def __init__(self, name, lag=0):
+        self.name = name
+        self.lag = lag
+        self.fail = False
+        self.checkouts = 0
+
+    @contextmanager
+    def connection(self):
+        if self.fail:
+            raise PoolError(f'{self.name} unreachable')
+        self.checkouts += 1
+        yield self
+
+    def cursor(self):
+        return LagCursor(self)
+
+
+def read_from(router, **kwargs):
+    with router.connection(**kwargs) as conn:
+        return conn.name
+
+
+@pytest.fixture
+def pools():
+    return FakePool('primary'), FakePool('replica')
+
+
+def test_reads_go_to_a_caught_up_replica(pools):
+    primary, replica = pools
+    router = ReplicaRouter(primary, replica, max_lag=10)
+
+    assert read_from(router) == 'replica'
+    assert read_from(router, primary=True) == 'primary'
+    stats = router.stats()
+    assert (stats['replica_reads'], stats['primary_reads']) == (1, 1)
+    assert stats['replica_in_use']
+
+
+def test_lagging_replica_falls_back_to_the_primary(pools):
+    primary, replica = pools
+    replica.lag = 30
+    router = ReplicaRouter(primary, replica, max_lag=10)
+
+    assert read_from(router) == 'primary'
+    assert router.stats()['fallbacks_lag'] == 1
+    assert router.last_lag == 30
+    assert router.unusable_reason == UNUSABLE_LAG
+
+
+def test_unmeasurable_lag_falls_back_to_the_primary(pools):
+    primary, replica = pools
+    replica.lag = RuntimeError('recovery conflict')
+    router = ReplicaRouter(primary, replica)
+
+    assert read_from(router) == 'primary'
+    assert router.stats()['fallbacks_error'] == 1
+    assert router.last_error == 'recovery conflict'
+
+
+def test_replica_connection_failure_uses_the_primary_until_the_next_check(pools):
+    primary, replica = pools
+    router = ReplicaRouter(primary, replica, lag_check_interval=60)
+    assert read_from(router) == 'replica'
+
+    replica.fail = True
+    assert read_from(router) == 'primary'
+    replica.fail = False
+    # Marked unusable: no replica checkout (or lag query) until lag_check_interval has passed
+    assert read_from(router) == 'primary'
+    assert replica.checkouts == 2  # The first lag query and the first read
+
+
+def test_fallbacks_are_counted_by_the_current_reason(pools):
+    primary, replica = pools
+    router = ReplicaRouter(primary, replica, max_lag=10, lag_check_interval=60)
+    replica.fail = True
+    assert read_from(router) == 'primary'  # The lag query fails: an error
+    router.lag_check_interval = 0
+    replica.fail = False
+    replica.lag = 30
+    assert read_from(router) == 'primary'  # Reachable again, but lagging
+
+    stats = router.stats()
+    assert (stats['fallbacks_error'], stats['fallbacks_lag']) == (1, 1)
+    assert stats['unusable_reason'] == UNUSABLE_LAG
+
+    replica.lag = 0
+    assert read_from(router) == 'replica'
+    assert router.unusable_reason is None
+
+
+def test_unknown_lag_is_an_error_fallback(pools):
+    primary, replica = pools
+    replica.lag = None
+
+    router = ReplicaRouter(primary, replica)
+
+    assert read_from(router) == 'primary'
+    assert router.stats()['fallbacks_error'] == 1
+    assert router.unusable_reason == UNUSABLE_ERROR
+
+
+def test_replica_failing_mid_query_is_marked_unusable(pools):
+    primary, replica = pools
+    router = ReplicaRouter(primary, replica, lag_check_interval=60)
+
+    with pytest.raises(psycopg2.OperationalError):
+        with router.connection() as conn:
+            assert conn.name == 'replica'
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+
+    assert read_from(router) == 'primary'
+    stats = router.stats()
+    assert (stats['replica_query_failures'], stats['fallbacks_error']) == (1, 1)
+    assert stats['last_error'] == 'server closed the connection unexpectedly'
+
+
+def test_application_errors_leave_the_replica_in_use(pools):
+    primary, replica = pools
+    router = ReplicaRouter(primary, replica, lag_check_interval=60)
+
+    with pytest.raises(KeyError):
+        with router.connection():
+            raise KeyError('service_id')
+
+    assert read_from(router) == 'replica'
+
+
+def test_lag_is_rechecked_after_the_interval(pools):
+    primary, replica = pools
+    replica.lag = 30
+    router = ReplicaRouter(primary, replica, max_lag=10, lag_check_interval=0)
+    assert read_from(router) == 'primary'
+
+    replica.lag = 1
+    assert read_from(router) == 'replica'
+
+
+def test_without_a_replica_everything_reads_the_primary(pools):
+    primary, _ = pools
+    router = ReplicaRouter(primary)
+
+    assert read_from(router) == 'primary'
+    assert not router.stats()['replica_configured']
+
+
+def test_sync_retries_on_the_primary_when_the_replica_is_behind(app_module, monkeypatch):
+    versions = {'replica': 5, 'primary': 9}
+    read = []
+
+    @contextmanager
+    def connection(name):
+        read.append(name)
+        yield name
+
+    def sync_catalog_from(conn, allow_behind=False):
+        if allow_behind and versions[conn] < 7:
+            return None
+        return True
+
+    monkeypatch.setattr(app_module, 'get_read_connection', lambda primary=False: connection('replica'))
+    monkeypatch.setattr(app_module, 'get_db_connection', lambda: connection('primary'))
+    monkeypatch.setattr(app_module, 'sync_catalog_from', sync_catalog_from)
+
+    assert app_module.sync_catalog()
+    assert read == ['replica', 'primary']
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+
+
+def make_snapshot():
+    services = sorted([
+        Service('api-1', 'http://api:9100/metrics', 'org-a', 'API'),
+        Service('db-1', 'http://db:9187', 'org-a', 'DB', 'database'),
+        Service('probe-1', 'https://probe/probe?module=http_2xx', 'org-b', 'Probe'),
+        Service('slow-1', 'http://slow:9100/metrics', 'org-b', 'Slow', 'service', '2m', '1m'),
+    ], key=catalog_order)
+    return CatalogSnapshot(services, format_hash(services_hash_value(services)), 4)
+
+
+@pytest.fixture
+def sd(app_module, monkeypatch):
+    snapshot = make_snapshot()
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ENABLED', False)
+    for name, empty in (('sd_cache', {}), ('dedup_cache', {}), ('scrape_view_cache', (None, None, {}))):
+        monkeypatch.setattr(app_module, name, empty)
+    return app_module.app.test_client()
+
+
+def groups_by_service(response):
+    return {group['labels']['service_id']: group for group in json.loads(response.data)}
+
+
+def test_sd_lists_one_labelled_group_per_service(sd):
+    response = sd.get('/api/prometheus/sd')
+
+    assert response.status_code == 200
+    assert response.headers['X-Catalog-Version'] == '4'
+    groups = groups_by_service(response)
+    assert set(groups) == {'api-1', 'db-1', 'probe-1', 'slow-1'}
+    assert groups['api-1'] == {
+        'targets': ['api:9100'],
+        'labels': {'job': 'org_org-a', 'organization_id': 'org-a', 'service_id': 'api-1'}
+    }
+
+
+def test_sd_carries_per_service_policy_as_target_labels(sd):
+    groups = groups_by_service(sd.get('/api/prometheus/sd?tier=service'))
+
+    assert set(groups) == {'api-1', 'probe-1', 'slow-1'}
+    assert groups['slow-1']['labels']['__scrape_interval__'] == '2m'
+    assert groups['slow-1']['labels']['__scrape_timeout__'] == '1m'
+    probe = groups['probe-1']
+    assert probe['targets'] == ['probe:443']
+    assert (probe['labels']['__scheme__'], probe['labels']['__metrics_path__']) == ('https', '/probe')
+    assert probe['labels']['__param_module'] == 'http_2xx'
+    assert not any(name.startswith('__') for name in groups['api-1']['labels'])
+
+
+def test_sd_revalidates_with_304(sd):
+    first = sd.get('/api/prometheus/sd?tier=database')
+    assert list(groups_by_service(first)) == ['db-1']
+
+    second = sd.get('/api/prometheus/sd?tier=database', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 304
+
+    other_tier = sd.get('/api/prometheus/sd?tier=service', headers={'If-None-Match': first.headers['ETag']})
+    assert other_tier.status_code == 200
+
+
+def test_unknown_tier_is_rejected(sd):
+    response = sd.get('/api/prometheus/sd?tier=mainframe')
+    assert response.status_code == 400
+
+
+def test_failed_catalog_load_answers_500_so_prometheus_keeps_its_targets(app_module, monkeypatch, sd):
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: None)
+    assert sd.get('/api/prometheus/sd').status_code == 500
+
+
+def test_http_sd_config_has_one_job_per_tier_and_no_static_targets(app_module, monkeypatch, sd):
+    monkeypatch.setattr(app_module, 'SERVICE_DISCOVERY_MODE', 'http')
+
+    config = app_module.generate_prometheus_config()
+
+    jobs = config['scrape_configs'][1:]
+    assert [job['job_name'] for job in jobs] == [f'services_{tier}' for tier in sorted(app_module.scrape_policies.tiers)]
+    for job in jobs:
+        assert 'static_configs' not in job
+        (sd_config,) = job['http_sd_configs']
+        assert sd_config['url'].endswith(f"?tier={job['job_name'][len('services_'):]}")
+
+
+def test_services_with_their_own_limits_are_reported(app_module, sd, capsys):
+    services = list(make_snapshot().services) + [
+        Service('big-1', 'http://big:9100/metrics', 'org-c', 'Big', 'service', None, None, 5000, None),
+    ]
+    snapshot = CatalogSnapshot(sorted(services, key=catalog_order), 'h', 5)
+
+    assert [service.service_id for service in app_module.warn_unapplied_sd_limits(snapshot)] == ['big-1']
+    assert 'cannot apply (big-1)' in capsys.readouterr().out
+    assert app_module.warn_unapplied_sd_limits(make_snapshot()) == []
@@ -0,0 +1,79 @@
+import pytest
+
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+from config_stream import render_grouped_job, render_job, render_target_groups
+
+
+def make_snapshot():
+    services = sorted([
+        Service('api-1', 'http://api:9100/metrics', 'org-a', 'API'),
+        Service('web-1', 'http://web:9100/metrics', 'org-a', 'Web'),
+        Service('db-1', 'http://db:9187', 'org-b', 'DB', 'database', '60s', '30s'),
+        Service('node-1', 'http://node:9100/metrics', 'org-c', 'Node'),
+    ], key=catalog_order)
+    return CatalogSnapshot(services, format_hash(services_hash_value(services)), 2)
+
+
+@pytest.fixture
+def layout(app_module, monkeypatch):
+    """Generates one snapshot's scrape jobs in the given layout"""
+    snapshot = make_snapshot()
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ENABLED', False)
+    monkeypatch.setattr(app_module, 'dedup_cache', {})
+    monkeypatch.setattr(app_module, 'scrape_view_cache', (None, None, {}))
+
+    def generate(name):
+        monkeypatch.setattr(app_module, 'PROMETHEUS_JOB_LAYOUT', name)
+        return app_module.generate_prometheus_config(snapshot)['scrape_configs'][1:]
+
+    generate.snapshot = snapshot
+    return generate
+
+
+def test_per_org_layout_has_a_job_per_organization_and_policy(layout):
+    jobs = layout('per_org')
+
+    names = [job['job_name'] for job in jobs]
+    assert (names[0], names[2]) == ('org_org-a', 'org_org-c')
+    assert names[1].startswith('org_org-b_')  # The database service's own interval differs from the default
+    assert jobs[0]['static_configs'] == [
+        {'targets': ['api:9100', 'web:9100'], 'labels': {'organization_id': 'org-a'}}
+    ]
+    assert jobs[1]['static_configs'][0]['labels'] == {'organization_id': 'org-b', 'job': 'org_org-b'}
+
+
+def test_consolidated_layout_has_a_job_per_policy_with_per_target_labels(app_module, layout):
+    jobs = layout('consolidated')
+
+    assert len(jobs) == 2
+    by_target = {
+        group['targets'][0]: (job['job_name'], group['labels'])
+        for job in jobs for group in job['static_configs']
+    }
+    default_job, _ = by_target['api:9100']
+    assert by_target['node:9100'][0] == by_target['web:9100'][0] == default_job
+    assert by_target['db:9187'][0] != default_job
+    assert by_target['db:9187'][1] == {'job': 'org_org-b', 'organization_id': 'org-b', 'service_id': 'db-1'}
+    # Series keep the per-organization job label they had in the per_org layout
+    assert {labels['job'] for _, labels in by_target.values()} == {'org_org-a', 'org_org-b', 'org_org-c'}
+
+
+@pytest.mark.parametrize('fmt', ['yaml', 'json'])
+def test_spliced_consolidated_jobs_render_like_the_built_ones(app_module, layout, fmt):
+    jobs = layout('consolidated')
+
+    rendered = app_module.render_consolidated_jobs(layout.snapshot, fmt)
+
+    assert rendered == [render_job(job, fmt) for job in jobs]
+
+
+@pytest.mark.parametrize('fmt', ['yaml', 'json'])
+def test_grouped_job_renders_like_the_full_job(fmt):
+    groups = [
+        {'targets': ['a:9100'], 'labels': {'organization_id': 'org-a'}},
+        {'targets': ['b:9100', 'c:9100'], 'labels': {'organization_id': 'org-b', 'job': 'org_org-b'}},
+    ]
+    job = {'job_name': 'services_30s_t10s', 'scrape_interval': '30s', 'metrics_path': '/metrics'}
+    fragments = [render_target_groups(groups[:1], fmt), render_target_groups(groups[1:], fmt)]
+
+    assert render_grouped_job(job, fragments, fmt) == render_job({**job, 'static_configs': groups}, fmt)
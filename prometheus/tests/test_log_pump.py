@@ -0,0 +1,89 @@
+import io
+import threading
+
+import pytest
+
+from log_pump import LogPump, parse_log_line
+
+
+class FakeProcess:
+    def __init__(self, stderr, stdout=b''):
+        self.pid = 4242
+        self.stdout = io.BytesIO(stdout)
+        self.stderr = io.BytesIO(stderr)
+
+
+def test_ring_buffer_keeps_the_newest_lines():
+    pump = LogPump('prometheus', capacity=3)
+    for i in range(1, 6):
+        pump.append(f'line {i}')
+
+    assert [entry['seq'] for entry in pump.entries()] == [3, 4, 5]
+    stats = pump.stats()
+    assert (stats['buffered'], stats['dropped'], stats['last_seq']) == (3, 2, 5)
+
+
+def test_entries_filter_by_seq_level_and_tail():
+    pump = LogPump('prometheus')
+    pump.append('starting', level='info')
+    pump.append('slow query', level='warning')
+    pump.append('disk full', level='error')
+    pump.append('still here', level='debug')
+
+    assert [e['msg'] for e in pump.entries(level='warn')] == ['slow query', 'disk full']
+    assert pump.entries(since=3)[0]['msg'] == 'still here'
+    assert [e['msg'] for e in pump.entries(tail=2)] == ['disk full', 'still here']
+    assert pump.entries()[1]['level'] == 'warn'
+
+
+@pytest.mark.parametrize('line, fields', [
+    ('ts=2024-01-01T00:00:00Z level=info msg="Server is ready to receive web requests."',
+     {'ts': '2024-01-01T00:00:00Z', 'level': 'info', 'msg': 'Server is ready to receive web requests.'}),
+    ('level=ERROR msg="say \\"hi\\"" err=', {'level': 'ERROR', 'msg': 'say "hi"', 'err': ''}),
+    ('goroutine 1 [running]:', {}),
+])
+def test_parse_log_line(line, fields):
+    assert parse_log_line(line) == fields
+
+
+def test_attached_process_is_drained_with_levels():
+    output = (
+        b'ts=1 level=info msg="Starting Prometheus"\n'
+        b'\n'
+        b'level=warn msg="low disk"\n'
+        b'panic: runtime error: index out of range\n'
+        b'goroutine 1 [running]:\n'
+    )
+    pump = LogPump('prometheus')
+    seen = []
+    pump.attach(FakeProcess(output), on_line=seen.append)
+    pump.join(5)
+
+    entries = pump.entries()
+    assert [(e['level'], e['msg']) for e in entries] == [
+        ('info', 'Starting Prometheus'),
+        ('warn', 'low disk'),
+        ('error', 'panic: runtime error: index out of range'),
+        ('error', 'goroutine 1 [running]:'),
+    ]
+    assert {e['pid'] for e in entries} == {4242}
+    assert seen == entries
+
+
+def test_wait_returns_when_a_line_arrives():
+    pump = LogPump('prometheus')
+    assert not pump.wait(since=pump.last_seq, timeout=0.01)
+
+    timer = threading.Timer(0.05, pump.append, args=('late line',))
+    timer.start()
+    assert pump.wait(since=0, timeout=5)
+    timer.join()
+
+
+def test_lines_are_written_to_the_log_file(tmp_path):
+    path = tmp_path / 'logs' / 'prometheus.log'
+    pump = LogPump('file-test', path=str(path))
+    pump.append('level=info msg="one"')
+    pump.append('level=info msg="two"')
+
+    assert path.read_text().splitlines() == ['level=info msg="one"', 'level=info msg="two"']
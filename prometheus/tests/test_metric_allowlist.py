@@ -0,0 +1,76 @@
+import re
+
+import pytest
+
+from catalog import Service
+from metric_allowlist import DEFAULT_ALLOWLISTS, SLI_PATTERNS, allowlist_relabel_configs, load_allowlists
+from scrape_policy import PolicyResolver, load_tiers
+
+
+def kept(relabel_configs, organization_id, metric):
+    """Whether Prometheus' keep action lets the series through (regexes are fully anchored)"""
+    (rule,) = relabel_configs
+    assert rule['action'] == 'keep'
+    value = rule['separator'].join((organization_id, metric))
+    return re.fullmatch(rule['regex'], value) is not None
+
+
+@pytest.mark.parametrize('metric, keep', [
+    ('http_requests_total', True),
+    ('api_request_duration_seconds_bucket', True),
+    ('api_request_duration_seconds_max', False),
+    ('db_errors_total', True),
+    ('db_error_total', True),
+    ('go_goroutines', False),
+    ('http_requests_total_created', False),
+])
+def test_allowlist_keeps_only_sli_series(metric, keep):
+    assert kept(allowlist_relabel_configs(SLI_PATTERNS), 'org-a', metric) is keep
+
+
+def test_full_fidelity_organizations_keep_every_series():
+    configs = allowlist_relabel_configs(SLI_PATTERNS, ['org.b', 'org-c'])
+
+    assert kept(configs, 'org.b', 'go_goroutines')
+    assert kept(configs, 'org-c', 'go_goroutines')
+    # Organization IDs are escaped and anchored, not matched as regexes or prefixes
+    assert not kept(configs, 'orgxb', 'go_goroutines')
+    assert not kept(configs, 'org-c2', 'go_goroutines')
+    assert kept(configs, 'org-a', 'http_requests_total')
+
+
+def test_series_without_an_organization_label_follow_the_allowlist():
+    configs = allowlist_relabel_configs(SLI_PATTERNS)
+    assert kept(configs, '', 'http_requests_total')
+    assert not kept(configs, '', 'go_goroutines')
+
+
+def test_allowlist_overrides_replace_whole_tiers():
+    allowlists = load_allowlists('{"database": ["pg_up"], "batch": ["job_runs_total"]}')
+
+    assert allowlists['database'] == ['pg_up']
+    assert allowlists['batch'] == ['job_runs_total']
+    assert allowlists['api'] == DEFAULT_ALLOWLISTS['api']
+
+
+@pytest.mark.parametrize('overrides', ['{"database": "pg_up"}', '{"database": ["("]}', 'not json'])
+def test_bad_allowlist_overrides_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        load_allowlists(overrides)
+
+
+def test_tiers_with_an_allowlist_get_its_relabel_configs(app_module, monkeypatch):
+    allowlists = load_allowlists()
+    resolver = PolicyResolver(load_tiers(), metric_allowlists=allowlists)
+    monkeypatch.setattr(app_module, 'metric_relabel_configs', {
+        tier: allowlist_relabel_configs(patterns) for tier, patterns in allowlists.items()
+    })
+
+    database = resolver.resolve(Service('db-1', 'http://db:9187', 'org-a', 'DB', 'database'))
+    fields = app_module.scrape_job_fields(database)
+
+    assert database.metric_allowlist == 'database'
+    assert kept(fields['metric_relabel_configs'], 'org-a', 'pg_query_duration_seconds_count')
+    assert not kept(fields['metric_relabel_configs'], 'org-a', 'http_requests_total')
+    assert 'metric_relabel_configs' not in app_module.scrape_job_fields(PolicyResolver(load_tiers()).resolve(
+        Service('db-1', 'http://db:9187', 'org-a', 'DB', 'database')))
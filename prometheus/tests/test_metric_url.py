@@ -0,0 +1,46 @@
+import pytest
+
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+from metric_url import ScrapeEndpoint, param_labels, params_dict, parse_metric_url
+
+
+@pytest.mark.parametrize('url, endpoint', [
+    ('http://host:9100/metrics', ScrapeEndpoint('http', 'host:9100', '/metrics', ())),
+    ('https://host', ScrapeEndpoint('https', 'host:443', '/metrics', ())),
+    ('host:9187/', ScrapeEndpoint('http', 'host:9187', '/metrics', ())),
+    ('HTTP://[::1]:9100/custom', ScrapeEndpoint('http', '[::1]:9100', '/custom', ())),
+    ('http://probe/probe?target=a&module=x&target=b',
+     ScrapeEndpoint('http', 'probe:80', '/probe', (('module', ('x',)), ('target', ('a', 'b'))))),
+])
+def test_metric_url_is_split_into_an_endpoint(url, endpoint):
+    assert parse_metric_url(url) == endpoint
+
+
+@pytest.mark.parametrize('url', ['ftp://host/metrics', 'http:///metrics', '', 'http://host:99999/metrics', None])
+def test_unscrapeable_metric_url_has_no_endpoint(url):
+    assert parse_metric_url(url) is None
+
+
+def test_params_become_job_params_and_param_labels():
+    params = parse_metric_url('http://probe/probe?module=http_2xx&bad-name=1').params
+    assert params_dict(params) == {'bad-name': ['1'], 'module': ['http_2xx']}
+    assert param_labels(params) == {'__param_module': 'http_2xx'}
+
+
+@pytest.mark.parametrize('layout', ['per_org', 'consolidated'])
+def test_service_with_a_malformed_url_is_left_out_of_the_config(app_module, monkeypatch, layout):
+    services = sorted([
+        Service('good-1', 'http://good:9100/metrics', 'org-a', 'Good'),
+        Service('bad-1', 'ftp://bad/metrics', 'org-a', 'Bad scheme'),
+        Service('bad-2', 'http:///metrics', 'org-b', 'No host'),
+    ], key=catalog_order)
+    snapshot = CatalogSnapshot(services, format_hash(services_hash_value(services)), None)
+    monkeypatch.setattr(app_module, 'PROMETHEUS_JOB_LAYOUT', layout)
+
+    config = app_module.generate_prometheus_config(snapshot)
+
+    targets = [target
+               for job in config['scrape_configs'][1:]
+               for group in job['static_configs']
+               for target in group['targets']]
+    assert targets == ['good:9100']
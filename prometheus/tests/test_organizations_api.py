@@ -0,0 +1,100 @@
+import pytest
+
+from catalog import CatalogCache, Service, catalog_order, format_hash, services_hash_value
+
+ORG_A = '11111111-1111-4111-8111-111111111111'
+ORG_B = '22222222-2222-4222-8222-222222222222'
+ORG_MISSING = '33333333-3333-4333-8333-333333333333'
+
+
+@pytest.fixture
+def organizations(app_module, monkeypatch):
+    """Client over a catalog cache holding two organizations; lookups records every database query"""
+    services = sorted([
+        Service('api-1', 'http://api:9100/metrics', ORG_A, 'API'),
+        Service('web-1', 'http://web:9100/metrics', ORG_B, 'Web'),
+    ], key=catalog_order)
+    names = {ORG_A: 'Acme', ORG_B: 'Globex'}
+    lookups = []
+
+    def org_loader(ids):
+        lookups.append(sorted(ids))
+        return {org_id: names[org_id] for org_id in ids if org_id in names}
+
+    cache = CatalogCache(lambda: (services, format_hash(services_hash_value(services)), None),
+                         org_loader=org_loader)
+    monkeypatch.setattr(app_module, 'catalog_cache', cache)
+    return app_module.app.test_client(), lookups
+
+
+def test_batch_lookup_resolves_all_ids_in_one_query(organizations):
+    client, lookups = organizations
+    response = client.get(f'/api/organizations?ids={ORG_B},{ORG_A.upper()},{ORG_MISSING},nope,{ORG_B}')
+
+    assert response.status_code == 200
+    body = response.json
+    assert body['organizations'] == [{'id': ORG_B, 'name': 'Globex'}, {'id': ORG_A, 'name': 'Acme'}]
+    assert body['errors'] == {ORG_MISSING: 'not_found', 'nope': 'invalid_id'}
+    assert lookups == [sorted([ORG_A, ORG_B, ORG_MISSING])]
+
+
+def test_cached_names_are_not_queried_again(organizations):
+    client, lookups = organizations
+    client.get(f'/api/organizations?ids={ORG_A}')
+
+    client.post('/api/organizations', json={'ids': [ORG_A, ORG_B]})
+
+    assert lookups == [[ORG_A], [ORG_B]]
+
+
+def test_include_services_attaches_the_catalog(organizations):
+    client, _ = organizations
+    response = client.post('/api/organizations', json={'ids': [ORG_A], 'include_services': True})
+
+    (organization,) = response.json['organizations']
+    assert [service['service_id'] for service in organization['services']] == ['api-1']
+
+
+@pytest.mark.parametrize('request_args', [
+    {'path': '/api/organizations'},
+    {'path': '/api/organizations', 'method': 'POST', 'json': {'ids': 'not-a-list'}},
+    {'path': '/api/organizations', 'method': 'POST', 'data': 'not json'},
+])
+def test_malformed_batch_requests_are_rejected(organizations, request_args):
+    client, lookups = organizations
+    response = client.open(**request_args)
+    assert response.status_code == 400
+    assert lookups == []
+
+
+def test_too_many_ids_are_rejected(app_module, organizations):
+    client, lookups = organizations
+    ids = [f'{i:08x}-0000-4000-8000-000000000000' for i in range(app_module.API_MAX_BATCH_IDS + 1)]
+
+    response = client.post('/api/organizations', json={'ids': ids})
+
+    assert response.status_code == 400
+    assert lookups == []
+
+
+def test_organization_services_and_lookup_agree_on_malformed_ids(organizations):
+    client, lookups = organizations
+
+    assert client.get('/api/organizations/nope').status_code == 404
+    response = client.get('/api/organizations/nope/services')
+
+    assert response.status_code == 404
+    assert response.json == {'error': 'Organization not found'}
+    assert lookups == []
+
+
+def test_unloadable_catalog_is_an_error_not_an_empty_list(app_module, monkeypatch):
+    def unavailable():
+        raise RuntimeError('connection refused')
+
+    monkeypatch.setattr(app_module, 'catalog_cache', CatalogCache(unavailable))
+
+    response = app_module.app.test_client().get('/api/services')
+
+    assert response.status_code == 500
+    assert response.json == {'error': 'Failed to load service catalog'}
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from api_helpers import decode_cursor, encode_cursor, paginate
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+
+
+def make_services(orgs=3, per_org=4):
+    services = [
+        Service(f'svc-{org}-{i}', f'http://host-{org}-{i}:9100/metrics', f'org-{org}', f'Service {org}-{i}')
+        for org in range(orgs)
+        for i in range(per_org)
+    ]
+    return sorted(services, key=catalog_order)
+
+
+def test_cursor_round_trip():
+    key = ('org-1', 'svc-1-2')
+    assert decode_cursor(encode_cursor(key)) == key
+
+
+@pytest.mark.parametrize('token', ['not-base64!', encode_cursor(()), 'bnVsbA', encode_cursor((1, 2))])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError, match='cursor is malformed'):
+        decode_cursor(token)
+
+
+def test_keyset_pages_cover_every_record_once():
+    services = make_services()
+    seen = []
+    after = None
+    while True:
+        page, next_cursor = paginate(services, catalog_order, 5, after)
+        seen.extend(page)
+        if next_cursor is None:
+            break
+        after = decode_cursor(next_cursor)
+
+    assert seen == services
+
+
+def test_cursor_stays_valid_when_records_are_inserted_before_it():
+    services = make_services()
+    page, next_cursor = paginate(services, catalog_order, 4)
+    # A service sorting before the cursor position must not shift the next page
+    grown = sorted(services + [Service('svc-0-00', 'http://new:9100', 'org-0', 'New')], key=catalog_order)
+
+    next_page, _ = paginate(grown, catalog_order, 4, decode_cursor(next_cursor))
+
+    assert next_page == services[4:8]
+
+
+def test_last_page_has_no_cursor():
+    services = make_services(orgs=1, per_org=3)
+    page, next_cursor = paginate(services, catalog_order, 3)
+    assert page == services
+    assert next_cursor is None
+
+
+@pytest.fixture
+def services_client(app_module, monkeypatch):
+    services = make_services()
+    snapshot = CatalogSnapshot(services, format_hash(services_hash_value(services)), 7)
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+    return app_module.app.test_client(), services
+
+
+def test_services_api_pages_with_cursor(services_client):
+    client, services = services_client
+    ids = []
+    url = '/api/services?limit=5&fields=service_id'
+    while url:
+        body = json.loads(client.get(url).data)
+        assert body['limit'] == 5
+        ids.extend(record['service_id'] for record in body['services'])
+        url = f"/api/services?limit=5&fields=service_id&cursor={body['next_cursor']}" if body['next_cursor'] else None
+
+    assert ids == [service.service_id for service in services]
+
+
+def test_services_api_rejects_bad_cursor(services_client):
+    client, _ = services_client
+    response = client.get('/api/services?cursor=garbage!')
+    assert response.status_code == 400
+    assert 'cursor' in response.json['error']
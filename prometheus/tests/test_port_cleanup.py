@@ -0,0 +1,92 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import kill_prometheus_port
+from port_cleanup import free_port, port_owner_pids
+
+# Listens on an ephemeral port, prints it, and (with 'stubborn') ignores SIGTERM
+LISTENER = """
+import signal, socket, sys, time
+if sys.argv[1] == 'stubborn':
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+server = socket.socket()
+server.bind(('127.0.0.1', 0))
+server.listen()
+print(server.getsockname()[1], flush=True)
+time.sleep(60)
+"""
+
+
+@pytest.fixture
+def listener():
+    started = []
+
+    def start(mode='polite'):
+        process = subprocess.Popen([sys.executable, '-c', LISTENER, mode], stdout=subprocess.PIPE, text=True)
+        started.append(process)
+        return process, int(process.stdout.readline())
+
+    yield start
+    for process in started:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def test_listener_is_found_and_terminated(listener):
+    process, port = listener()
+    assert port_owner_pids(port) == {process.pid}
+
+    started = time.monotonic()
+    assert free_port(port, timeout=5)
+
+    process.wait(1)
+    assert time.monotonic() - started < 2  # Returns when the process exits, not after the timeout
+    assert port_owner_pids(port) == set()
+
+
+def test_process_ignoring_sigterm_is_killed(listener, capsys):
+    process, port = listener('stubborn')
+
+    assert free_port(port, timeout=0.5)
+
+    # psutil reaps the child, so its exit status isn't visible through Popen
+    process.wait(1)
+    assert f'Force killed process {process.pid}' in capsys.readouterr().out
+
+
+def test_clients_of_the_port_are_not_owners(listener):
+    process, port = listener()
+    with socket.create_connection(('127.0.0.1', port)):
+        assert port_owner_pids(port) == {process.pid}
+
+
+def test_free_port_is_left_alone():
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    assert free_port(port)
+
+
+def test_standalone_script_frees_every_instance_port(monkeypatch):
+    freed = []
+
+    def free_port(port, timeout, verbose=False):
+        freed.append(port)
+        return port != 9092
+
+    monkeypatch.setattr(kill_prometheus_port, 'free_port', free_port)
+    monkeypatch.setattr(kill_prometheus_port, 'PROMETHEUS_SHARDS', 3)
+    monkeypatch.setattr(kill_prometheus_port, 'PROMETHEUS_FEDERATION_ENABLED', True)
+    monkeypatch.setattr(kill_prometheus_port, 'PROMETHEUS_FEDERATION_PORT', 9100)
+
+    assert not kill_prometheus_port.main()
+
+    assert freed == [9090, 9091, 9092, 9100]
@@ -0,0 +1,77 @@
+import hashlib
+
+from prometheus_instances import build_instances, federation_job, shard_job
+
+
+def prometheus_hashmod(value, modulus):
+    """Prometheus' hashmod relabel action: the low 8 bytes of the md5 as a big-endian integer, mod modulus"""
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[8:], 'big') % modulus
+
+
+def test_single_instance_keeps_the_plain_paths():
+    (instance,) = build_instances('/etc/prometheus.yml', '/data', 9090)
+    assert (instance.name, instance.port, instance.config_path, instance.data_dir) == \
+        ('prometheus', 9090, '/etc/prometheus.yml', '/data')
+    assert (instance.shard, instance.role) == (0, 'shard')
+
+
+def test_shards_and_aggregator_get_their_own_ports_and_files():
+    instances = build_instances('/etc/prometheus.yml', '/data', 9090, shards=3, federation=True)
+
+    assert [(i.name, i.port, i.role) for i in instances] == [
+        ('shard-0', 9090, 'shard'), ('shard-1', 9091, 'shard'), ('shard-2', 9092, 'shard'),
+        ('federation', 9093, 'federation'),
+    ]
+    assert instances[1].config_path == '/etc/prometheus.shard-1.yml'
+    assert instances[1].data_dir == '/data/shard-1'
+    assert instances[3].config_path == '/etc/prometheus.federation.yml'
+
+
+def test_shard_job_keeps_only_its_hashmod_bucket():
+    job = {'job_name': 'org_a', 'relabel_configs': [{'action': 'labeldrop', 'regex': 'tmp'}],
+           'static_configs': [{'targets': ['a:9100']}]}
+
+    sharded = shard_job(job, 1, 3)
+
+    assert job['relabel_configs'] == [{'action': 'labeldrop', 'regex': 'tmp'}]
+    hashmod, keep = sharded['relabel_configs'][1:]
+    assert (hashmod['action'], hashmod['source_labels'], hashmod['modulus']) == ('hashmod', ['__address__'], 3)
+    assert (keep['action'], keep['source_labels'], keep['regex']) == ('keep', [hashmod['target_label']], '1')
+    assert shard_job(job, 0, 1) is job
+
+
+def test_every_target_is_kept_by_exactly_one_shard():
+    shards = 4
+    targets = [f'host-{i}.example.com:9100' for i in range(200)]
+    kept = {}
+    for shard in range(shards):
+        keep = shard_job({'job_name': 'j'}, shard, shards)['relabel_configs'][1]
+        kept[shard] = [t for t in targets if str(prometheus_hashmod(t, shards)) == keep['regex']]
+
+    assert sorted(t for bucket in kept.values() for t in bucket) == sorted(targets)
+    assert all(kept.values())
+
+
+def test_federation_job_pulls_every_shard():
+    instances = build_instances('/p.yml', '/data', 9090, shards=2, federation=True)
+
+    job = federation_job(instances[:2], '{job=~".+"}')
+
+    assert job['metrics_path'] == '/federate'
+    assert job['honor_labels']
+    assert job['params'] == {'match[]': ['{job=~".+"}']}
+    assert job['static_configs'] == [{'targets': ['localhost:9090', 'localhost:9091']}]
+
+
+def test_shard_configs_carry_a_shard_external_label(app_module, monkeypatch):
+    instances = build_instances('/p.yml', '/data', 9090, shards=2, federation=True)
+    monkeypatch.setattr(app_module, 'PROMETHEUS_SHARDS', 2)
+    monkeypatch.setattr(app_module, 'shard_instances', instances[:2])
+
+    shard_config = app_module.base_prometheus_config(instances[1])
+    federation_config = app_module.federation_prometheus_config(instances[2])
+
+    assert shard_config['global']['external_labels'] == {'shard': '1'}
+    assert 'external_labels' not in federation_config['global']
+    assert [job['job_name'] for job in federation_config['scrape_configs']] == ['prometheus', 'federate']
+
@@ -0,0 +1,209 @@
+import itertools
+import subprocess
+import time
+
+import pytest
+
+import prometheus_supervisor
+from log_pump import LogPump
+from prometheus_supervisor import Supervisor, exit_reason
+
+pids = itertools.count(1000)
+
+
+class FakeTimer:
+    """threading.Timer that only records its delay; fire() runs it"""
+    started = []
+
+    def __init__(self, delay, function, args=()):
+        self.delay = delay
+        self.function = function
+        self.args = args
+        self.daemon = False
+        self.cancelled = False
+
+    def start(self):
+        FakeTimer.started.append(self)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fire(self):
+        self.function(*self.args)
+
+
+class FakeProcess:
+    def __init__(self, returncode=1):
+        self.pid = next(pids)
+        self.returncode = returncode
+
+    def wait(self):
+        return self.returncode
+
+
+class FakeInstance:
+    def __init__(self):
+        self.name = 'prometheus-1'
+        self.process = None
+        self.stop_requested = False
+        self.was_ready = True
+        self.started_at = time.time()
+        self.logs = LogPump('prometheus-1')
+
+    def is_running(self):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def fake_timers(monkeypatch):
+    FakeTimer.started = []
+    monkeypatch.setattr(prometheus_supervisor.threading, 'Timer', FakeTimer)
+    return FakeTimer.started
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def supervised():
+    """A supervisor whose restart launches a fresh (crashing) process for the instance"""
+    instance = FakeInstance()
+    restarted = []
+
+    def launch(instance, returncode=1):
+        instance.process = FakeProcess(returncode)
+        supervisor.watch(instance, instance.process)
+
+    def restart(instance):
+        restarted.append(instance.process.pid)
+        launch(instance)
+
+    supervisor = Supervisor(restart, initial_backoff=1, max_backoff=8, crash_loop_limit=5, crash_loop_window=300)
+    return supervisor, instance, launch, restarted
+
+
+def test_crashes_are_restarted_with_doubling_backoff(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    launch(instance)
+
+    for crash in range(1, 6):
+        wait_for(lambda: len(fake_timers) == crash)
+        fake_timers[-1].fire()
+
+    assert [timer.delay for timer in fake_timers] == [1, 2, 4, 8, 8]
+    assert all(timer.daemon for timer in fake_timers)
+    assert len(restarted) == 5
+    assert supervisor.status(instance)['restarts'] == 5
+
+
+def test_crash_loop_stops_restarting(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    launch(instance)
+    for crash in range(1, 6):
+        wait_for(lambda: len(fake_timers) == crash)
+        fake_timers[-1].fire()
+
+    # The sixth crash within the window exceeds crash_loop_limit
+    wait_for(lambda: supervisor.status(instance)['crash_loop'])
+    status = supervisor.status(instance)
+    assert status['recent_crashes'] == 6
+    assert status['next_restart_at'] is None
+    assert len(fake_timers) == 5
+
+    supervisor.reset(instance)
+    assert not supervisor.status(instance)['crash_loop']
+    assert supervisor.status(instance)['recent_crashes'] == 0
+
+
+def test_requested_stop_is_not_restarted(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    instance.stop_requested = True
+    launch(instance, returncode=0)
+
+    time.sleep(0.05)
+    assert fake_timers == []
+    assert supervisor.status(instance)['last_exit'] is None
+
+
+def test_instance_that_never_became_ready_is_not_restarted(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    instance.was_ready = False
+    launch(instance, returncode=2)
+
+    wait_for(lambda: supervisor.status(instance)['last_exit'])
+    assert supervisor.status(instance)['last_exit']['reason'] == 'exited with code 2'
+    assert fake_timers == []
+
+
+def test_restart_is_skipped_when_started_by_hand_meanwhile(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    launch(instance)
+    wait_for(lambda: fake_timers)
+
+    instance.process = FakeProcess()  # Manual start before the timer fired
+    fake_timers[0].fire()
+
+    assert restarted == []
+
+
+def test_stop_cancels_pending_restart(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    launch(instance)
+    wait_for(lambda: fake_timers)
+
+    supervisor.stop()
+
+    assert fake_timers[0].cancelled
+    assert supervisor.status(instance)['next_restart_at'] is None
+
+
+def test_last_exit_records_the_last_error_line(supervised, fake_timers):
+    supervisor, instance, launch, restarted = supervised
+    process = FakeProcess(-9)
+    instance.process = process
+    instance.logs.append('level=error msg="opening storage failed"', pid=process.pid, level='error',
+                         fields={'level': 'error', 'msg': 'opening storage failed'})
+    supervisor.watch(instance, process)
+
+    wait_for(lambda: fake_timers)
+    last_exit = supervisor.status(instance)['last_exit']
+    assert last_exit['reason'] == 'killed by SIGKILL'
+    assert last_exit['last_error'] == 'opening storage failed'
+
+
+@pytest.mark.parametrize('returncode, reason', [
+    (0, 'exited with code 0'),
+    (1, 'exited with code 1'),
+    (-9, 'killed by SIGKILL'),
+    (-15, 'killed by SIGTERM'),
+    (-200, 'killed by signal 200'),
+])
+def test_exit_reason(returncode, reason):
+    assert exit_reason(returncode) == reason
+
+
+def test_kill_port_stops_managed_prometheus_without_a_restart(app_module, monkeypatch):
+    instance = app_module.prometheus_instances[0]
+    process = subprocess.Popen(['sleep', '30'], start_new_session=True)
+    monkeypatch.setattr(instance, 'process', process)
+    monkeypatch.setattr(instance, 'was_ready', True)
+    monkeypatch.setattr(instance, 'stop_requested', False)
+    freed = []
+    monkeypatch.setattr(app_module, 'free_port', lambda port, timeout: freed.append(instance.stop_requested) or True)
+    app_module.supervisor.watch(instance, process)
+
+    response = app_module.app.test_client().post('/api/prometheus/kill-port')
+
+    assert response.status_code == 200
+    assert process.poll() is not None
+    # Stopped before the port sweep, so the supervisor treats the exit as requested
+    assert freed[0] is True
+    time.sleep(0.1)
+    status = app_module.supervisor.status(instance)
+    assert status['next_restart_at'] is None
+    assert status['last_exit'] is None
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from config_stream import write_config_atomic
+from reload_scheduler import ReloadScheduler
+
+
+@pytest.fixture
+def runs():
+    return []
+
+
+@pytest.fixture
+def make_scheduler(runs):
+    schedulers = []
+
+    def make(**timing):
+        scheduler = ReloadScheduler(lambda: runs.append(time.monotonic()) or True, **timing)
+        scheduler.start()
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+def test_burst_is_debounced_into_one_reload(make_scheduler, runs):
+    scheduler = make_scheduler(debounce=0.1, min_interval=0, max_delay=5)
+    for _ in range(5):
+        scheduler.request('catalog change')
+        last_request = time.monotonic()
+        time.sleep(0.02)
+
+    wait_for(lambda: runs)
+    time.sleep(0.2)
+
+    assert len(runs) == 1
+    assert runs[0] - last_request > 0.09
+    stats = scheduler.stats()
+    assert stats['requested'] == 5
+    assert stats['coalesced'] == 4
+    assert not stats['pending']
+
+
+def test_constant_churn_reloads_after_max_delay(make_scheduler, runs):
+    scheduler = make_scheduler(debounce=0.2, min_interval=0, max_delay=0.3)
+    started = time.monotonic()
+    while time.monotonic() - started < 1:
+        # Never quiet for the debounce period, so only max_delay can trigger a reload
+        scheduler.request('catalog change')
+        time.sleep(0.05)
+
+    assert len(runs) >= 2
+    assert runs[0] - started == pytest.approx(0.3, abs=0.15)
+
+
+def test_min_interval_spaces_reloads(make_scheduler, runs):
+    scheduler = make_scheduler(debounce=0, min_interval=0.3, max_delay=5)
+    scheduler.request()
+    wait_for(lambda: len(runs) == 1)
+    scheduler.request()
+    wait_for(lambda: len(runs) == 2)
+
+    assert runs[1] - runs[0] >= 0.3
+
+
+def test_run_now_absorbs_pending_request(runs):
+    scheduler = ReloadScheduler(lambda: runs.append(time.monotonic()) or True, debounce=0.1, min_interval=0)
+    scheduler.request('catalog change')
+
+    assert scheduler.run_now('api') is True
+    stats = scheduler.stats()
+    assert not stats['pending']
+    assert stats['coalesced'] == 1
+    assert stats['runs'] == 1
+
+    # The scheduler thread isn't running: run_now still works and nothing else fires
+    time.sleep(0.2)
+    assert len(runs) == 1
+
+
+def test_failed_reload_is_counted():
+    calls = threading.Event()
+
+    def fail():
+        calls.set()
+        raise RuntimeError('reload endpoint unreachable')
+
+    scheduler = ReloadScheduler(fail)
+    assert scheduler.run_now() is False
+    assert calls.is_set()
+    stats = scheduler.stats()
+    assert stats['failures'] == 1
+    assert stats['last_result'] is False
+
+
+def test_unchanged_config_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'prometheus.yml')
+    header = {'global': {'scrape_interval': '15s'}}
+    jobs = [{'job_name': 'prometheus', 'static_configs': [{'targets': ['localhost:9090']}]}]
+
+    first = write_config_atomic(path, header, jobs)
+    second = write_config_atomic(path, header, jobs, unchanged_digest=first['digest'])
+
+    assert not first['unchanged']
+    assert second['unchanged']
+    assert second['digest'] == first['digest']
+    assert list(tmp_path.iterdir()) == [tmp_path / 'prometheus.yml']
@@ -0,0 +1,122 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from duration_histogram import DurationHistogram
+from prometheus_instances import PrometheusInstance
+
+
+class FakePrometheus(BaseHTTPRequestHandler):
+    """/-/reload and the prometheus_config_last_reload_* metrics of a Prometheus server"""
+
+    def do_POST(self):
+        state = self.server.state
+        if self.path != '/-/reload':
+            self.send_error(404)
+            return
+        if state['reload_error']:
+            body = state['reload_error'].encode()
+            self.send_response(500)
+        else:
+            if state['applies']:
+                state['reloaded_at'] = time.time()
+            body = b''
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        body = (
+            '# TYPE prometheus_config_last_reload_successful gauge\n'
+            f"prometheus_config_last_reload_successful {state['successful']}\n"
+            f"prometheus_config_last_reload_success_timestamp_seconds {state['reloaded_at']:.3f}\n"
+        ).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def prometheus(app_module, monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakePrometheus)
+    server.state = {'reload_error': None, 'applies': True, 'successful': 1, 'reloaded_at': 0.0}
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True).start()
+    instance = PrometheusInstance('prometheus', server.server_address[1], str(tmp_path / 'p.yml'), str(tmp_path))
+    histogram = DurationHistogram('reload_seconds', 'Reload time', ('instance', 'result'))
+    monkeypatch.setattr(app_module, 'reload_durations', histogram)
+    yield server.state, instance, histogram
+    server.shutdown()
+    server.server_close()
+
+
+def test_confirmed_reload_is_timed_as_a_success(app_module, prometheus):
+    state, instance, histogram = prometheus
+
+    assert app_module.reload_instance(instance) is None
+
+    assert instance.last_reload['success']
+    assert instance.last_reload['seconds'] >= 0
+    (series,) = histogram.snapshot()
+    assert series['labels'] == {'instance': 'prometheus', 'result': 'success'}
+    assert series['count'] == 1
+
+
+def test_rejected_reload_reports_prometheus_error(app_module, prometheus):
+    state, instance, histogram = prometheus
+    state['reload_error'] = 'failed to reload config: parsing YAML file p.yml: bad target'
+
+    error = app_module.reload_instance(instance)
+
+    assert 'parsing YAML file p.yml: bad target' in error
+    assert (instance.last_reload['success'], instance.last_reload['error']) == (False, error)
+    assert histogram.snapshot()[0]['labels']['result'] == 'failure'
+
+
+def test_reload_that_left_the_old_config_is_a_failure(app_module, prometheus):
+    state, instance, _ = prometheus
+    state['successful'] = 0
+
+    assert app_module.reload_instance(instance) == 'prometheus_config_last_reload_successful is not 1'
+
+
+def test_reload_whose_timestamp_did_not_advance_is_a_failure(app_module, prometheus):
+    state, instance, _ = prometheus
+    state['applies'] = False  # Answers 200 but keeps the config it loaded an hour ago
+    state['reloaded_at'] = time.time() - 3600
+
+    assert 'did not advance' in app_module.reload_instance(instance)
+
+
+def test_unreachable_prometheus_is_a_failure(app_module, prometheus):
+    _, instance, _ = prometheus
+    instance.port = 1
+
+    assert 'Reload on port 1 failed' in app_module.reload_instance(instance)
+
+
+def test_histogram_buckets_are_cumulative_and_rendered_in_exposition_format():
+    histogram = DurationHistogram('reload_seconds', 'Reload time', ('instance',), buckets=(0.5, 1, 5))
+    for seconds in (0.2, 0.5, 0.7, 12):
+        histogram.observe(seconds, 'shard-0')
+
+    (series,) = histogram.snapshot()
+    assert series['buckets'] == {'0.5': 2, '1': 3, '5': 3, '+Inf': 4}
+    assert (series['count'], series['sum']) == (4, 13.4)
+    assert histogram.render().splitlines() == [
+        '# HELP reload_seconds Reload time',
+        '# TYPE reload_seconds histogram',
+        'reload_seconds_bucket{instance="shard-0",le="0.5"} 2',
+        'reload_seconds_bucket{instance="shard-0",le="1"} 3',
+        'reload_seconds_bucket{instance="shard-0",le="5"} 3',
+        'reload_seconds_bucket{instance="shard-0",le="+Inf"} 4',
+        'reload_seconds_sum{instance="shard-0"} 13.4',
+        'reload_seconds_count{instance="shard-0"} 4',
+    ]
@@ -0,0 +1,112 @@
+import pytest
+
+from catalog import Service
+from scrape_policy import DEFAULT_TIERS, PolicyResolver, job_suffix, load_tiers, parse_duration, policy_job_fields
+
+
+@pytest.fixture
+def resolver():
+    return PolicyResolver(load_tiers())
+
+
+def service(entity_type='service', interval=None, timeout=None, sample_limit=None, label_limit=None,
+            url='http://host:9100/metrics'):
+    return Service('svc', url, 'org', 'Service', entity_type, interval, timeout, sample_limit, label_limit)
+
+
+def test_every_tier_defaults_to_the_global_interval_and_timeout(resolver):
+    policies = {resolver.resolve(service(tier)) for tier in DEFAULT_TIERS}
+    assert [(p.scrape_interval, p.scrape_timeout) for p in policies] == [('30s', '10s')]
+
+    tiers = load_tiers(scrape_interval='1m', scrape_timeout='20s')
+    assert {(t['scrape_interval'], t['scrape_timeout']) for t in tiers.values()} == {('1m', '20s')}
+
+
+def test_tier_comes_from_entity_type():
+    resolver = PolicyResolver(load_tiers('{"database": {"scrape_interval": "60s", "scrape_timeout": "30s"}}'))
+    policy = resolver.resolve(service('database'))
+    assert (policy.scrape_interval, policy.scrape_timeout) == ('60s', '30s')
+    assert resolver.resolve(service('api')).scrape_interval == '30s'
+
+
+def test_unknown_entity_type_uses_default_tier(resolver):
+    assert resolver.resolve(service('mainframe')) == resolver.tier_policies['service']
+
+
+def test_valid_overrides_win(resolver):
+    policy = resolver.resolve(service('database', '2m', '45s', 5000, 40))
+    assert (policy.scrape_interval, policy.scrape_timeout, policy.sample_limit, policy.label_limit) == \
+        ('2m', '45s', 5000, 40)
+
+
+@pytest.mark.parametrize('interval, timeout, sample_limit', [
+    ('often', None, None),
+    ('0s', '-5s', None),
+    (None, None, -1),
+    (None, '10', True),
+])
+def test_invalid_overrides_fall_back_to_the_tier(resolver, interval, timeout, sample_limit):
+    assert resolver.resolve(service('database', interval, timeout, sample_limit)) == \
+        resolver.tier_policies['database']
+
+
+def test_timeout_is_capped_at_interval(resolver):
+    policy = resolver.resolve(service('database', interval='5s'))
+    assert policy.scrape_timeout == '5s'
+
+
+def test_unlimited_limits_are_left_out_of_the_job(resolver):
+    fields = policy_job_fields(resolver.resolve(service()))
+    assert fields == {'scrape_interval': '30s', 'scrape_timeout': '10s', 'metrics_path': '/metrics'}
+
+    limited = policy_job_fields(resolver.resolve(service(sample_limit=200, label_limit=30)))
+    assert (limited['sample_limit'], limited['label_limit']) == (200, 30)
+
+
+def test_equal_policies_are_interned(resolver):
+    first = resolver.resolve(service(interval='1m', url='http://a:9100/metrics'))
+    second = resolver.resolve(service(interval='1m', url='http://b:9200'))
+    assert first is second
+
+
+def test_metric_url_endpoint_is_part_of_the_policy(resolver):
+    policy = resolver.resolve(service(url='https://host/probe?module=http_2xx&target=x'))
+
+    assert (policy.scheme, policy.metrics_path) == ('https', '/probe')
+    fields = policy_job_fields(policy)
+    assert fields['scheme'] == 'https'
+    assert fields['params'] == {'module': ['http_2xx'], 'target': ['x']}
+    assert job_suffix(policy) != job_suffix(resolver.tier_policies['service'])
+
+
+def test_tier_overrides_are_merged():
+    tiers = load_tiers('{"database": {"scrape_interval": "2m"}, "batch": {"sample_limit": 1000}}')
+
+    assert tiers['database'] == {**DEFAULT_TIERS['database'], 'scrape_interval': '2m'}
+    assert tiers['batch'] == {**DEFAULT_TIERS['service'], 'sample_limit': 1000}
+
+
+@pytest.mark.parametrize('overrides', [
+    '{"database": {"scrape_interval": "soon"}}',
+    '{"database": {"sample_limit": -5}}',
+    '{"database": {"metrics_path": "/x"}}',
+    'not json',
+])
+def test_bad_tier_overrides_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        load_tiers(overrides)
+
+
+def test_bad_global_interval_is_rejected():
+    with pytest.raises(ValueError):
+        load_tiers(scrape_interval='soon')
+
+
+def test_unknown_default_tier_is_rejected():
+    with pytest.raises(ValueError, match='Unknown default'):
+        PolicyResolver(load_tiers(), default_tier='nope')
+
+
+@pytest.mark.parametrize('text, seconds', [('30s', 30), ('1m30s', 90), ('500ms', 0.5), ('1h', 3600), ('30', None)])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
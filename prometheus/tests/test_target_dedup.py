@@ -0,0 +1,111 @@
+import pytest
+
+from catalog import CatalogSnapshot, Service, catalog_order, format_hash, services_hash_value
+from scrape_policy import PolicyResolver, load_tiers
+from target_dedup import DedupPlan, SharedService, owner_label
+
+POLICY = PolicyResolver(load_tiers()).tier_policies['service']
+
+
+def make_snapshot():
+    services = sorted([
+        Service('node-a', 'http://node:9100/metrics', 'org-a', 'Node (A)'),
+        Service('node-a2', 'http://node:9100/metrics', 'org-a', 'Node (A, again)'),
+        Service('node-b', 'http://node:9100/metrics', 'org-b', 'Node (B)'),
+        Service('node-c', 'http://node:9100', 'org-c', 'Node (C)'),
+        Service('db-a', 'http://db:9187', 'org-a', 'DB'),
+    ], key=catalog_order)
+    return CatalogSnapshot(services, format_hash(services_hash_value(services)), None)
+
+
+def endpoint_of(service):
+    return (service.metric_url.split('/')[2], POLICY)
+
+
+def test_shared_endpoint_is_kept_once_per_organization():
+    plan = DedupPlan(make_snapshot(), endpoint_of)
+
+    keeper = plan.by_organization['org-a'][1]
+    assert isinstance(keeper, SharedService)
+    assert (keeper.service_id, keeper.owner_services) == ('node-a', ('node-a', 'node-a2'))
+    # Other tenants keep their own scrape, so their series keep their organization_id
+    assert [s.service_id for s in plan.by_organization['org-b']] == ['node-b']
+    assert [s.service_id for s in plan.by_organization['org-c']] == ['node-c']
+    assert (plan.services, plan.endpoints) == (5, 4)
+
+
+def test_non_participants_keep_their_own_target():
+    plan = DedupPlan(make_snapshot(), endpoint_of, lambda s: s.organization_id != 'org-a')
+
+    assert [s.service_id for s in plan.by_organization['org-a']] == ['db-a', 'node-a', 'node-a2']
+    assert plan.endpoints == 5
+
+
+def test_services_without_an_endpoint_are_left_out():
+    plan = DedupPlan(make_snapshot(), lambda s: None if s.service_id == 'db-a' else endpoint_of(s))
+
+    assert [s.service_id for s in plan.by_organization['org-a']] == ['node-a']
+    assert plan.endpoints == 3
+
+
+def test_report_counts_scrapes_saved_and_cross_tenant_duplicates():
+    report = DedupPlan(make_snapshot(), endpoint_of).report({'node:9100': 1000})
+
+    assert report['shared_endpoints'] == 1
+    assert (report['scrapes_saved'], report['series_saved']) == (1, 1000)
+    assert (report['cross_tenant_scrapes'], report['cross_tenant_series']) == (2, 2000)
+    (entry,) = report['top_shared']
+    assert (entry['owners'], entry['scrapes']) == (4, 3)
+    assert entry['organizations'] == ['org-a', 'org-b', 'org-c']
+
+
+def test_owner_label_can_be_matched_per_organization():
+    assert owner_label(('org-a', 'org-b')) == ',org-a,org-b,'
+
+
+@pytest.fixture
+def dedup_client(app_module, monkeypatch):
+    snapshot = make_snapshot()
+    monkeypatch.setattr(app_module, 'get_catalog_snapshot', lambda: snapshot)
+    monkeypatch.setattr(app_module, 'samples_per_target', lambda: None)
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ORGS', set())
+    return app_module.app.test_client()
+
+
+def test_report_shows_potential_savings_while_dedup_is_off(app_module, monkeypatch, dedup_client):
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ENABLED', False)
+
+    report = dedup_client.get('/api/targets/dedup').json
+
+    assert not report['enabled']
+    assert report['shared_endpoints'] == 1
+    assert (report['scrapes_saved'], report['cross_tenant_scrapes']) == (1, 2)
+
+
+def test_report_shows_only_opted_in_sharing_while_dedup_is_on(app_module, monkeypatch, dedup_client):
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ENABLED', True)
+
+    report = dedup_client.get('/api/targets/dedup').json
+
+    assert report['enabled']
+    assert report['shared_endpoints'] == 0
+    assert report['scrapes_saved'] == 0
+
+
+def test_shared_target_keeps_its_organization_label(app_module, monkeypatch, dedup_client):
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ENABLED', True)
+    monkeypatch.setattr(app_module, 'TARGET_DEDUP_ORGS', {'*'})
+    monkeypatch.setattr(app_module, 'PROMETHEUS_JOB_LAYOUT', 'per_org')
+    monkeypatch.setattr(app_module, 'dedup_cache', {})
+    monkeypatch.setattr(app_module, 'scrape_view_cache', (None, None, {}))
+
+    config = app_module.generate_prometheus_config(make_snapshot())
+
+    node_groups = [
+        (job['job_name'], group['labels'])
+        for job in config['scrape_configs'][1:] for group in job['static_configs']
+        if 'node:9100' in group['targets']
+    ]
+    assert [job_name for job_name, _ in node_groups] == ['org_org-a', 'org_org-b', 'org_org-c']
+    org_a_labels = node_groups[0][1]
+    assert org_a_labels == {'organization_id': 'org-a', 'owner_services': ',node-a,node-a2,'}